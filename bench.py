@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Pomiar wydajności renderowania stron kart pracy.
+
+Skrypt generuje zestaw zadań tymi samymi opcjami co main.py, a następnie mierzy
+czas rysowania i zapisu pojedynczych stron (draw_page + savefig do pamięci) oraz
+liczbę obiektów (artystów) Matplotlib na stronie.
+
+Przykład:
+python bench.py --pages 20 -- --cols 3 --rows 6 --answer-lines 3 --digit-guides --result-guide-style line
+python bench.py --pages 200 -- --backend native
+python bench.py --parity --pages 5 -- --mode mixed --answer-lines 2 --digit-guides
+python bench.py --reproducible -- -n 60 --answer-lines 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+import main as worksheet
+
+
+def _page_kwargs(args: argparse.Namespace) -> dict[str, object]:
+    """Parametry stylu draw_page odczytane z opcji CLI main.py."""
+    return dict(
+        problem_fontsize=args.problem_fontsize,
+        number_fontsize=args.number_fontsize,
+        title_fontsize=args.title_fontsize,
+        subtitle_fontsize=args.subtitle_fontsize,
+        show_subtitle=not args.no_subtitle,
+        answer_lines=args.answer_lines,
+        answer_line_spacing=args.answer_line_spacing,
+        answer_line_width=args.answer_line_width,
+        answer_line_color=args.answer_line_color,
+        answer_line_thickness=args.answer_line_thickness,
+        compact_layout=args.compact_layout,
+        answer_line_spacing_mm=args.answer_line_spacing_mm,
+        addition_gap_mm=args.addition_gap_mm,
+        post_bar_gap_factor=args.post_bar_gap_factor,
+        operation_bar_style=args.operation_bar_style,
+        result_guide_style=args.result_guide_style,
+        result_guide_color=args.result_guide_color,
+        result_guide_thickness=args.result_guide_thickness,
+        digit_guides=args.digit_guides,
+        digit_guides_color=args.digit_guides_color,
+        digit_guides_alpha=args.digit_guides_alpha,
+        number_color=args.number_color,
+        hide_numbers=args.hide_numbers,
+        text_mode=args.text_mode,
+        autoscale=args.bbox == "tight",
+        carries=args.carries,
+        carry_columns=args.carry_columns or (),
+    )
+
+
+def _figsize(args: argparse.Namespace) -> tuple[float, float]:
+    if args.paper == "custom":
+        return (args.custom_width, args.custom_height)
+    return (8.27, 11.69) if args.paper.lower() == "a4" else (8.5, 11.0)
+
+
+def _artist_count(fig: Figure) -> int:
+    """Liczba artystów narysowanych na stronie (bez samych osi i tła)."""
+    return sum(len(ax.lines) + len(ax.collections) + len(ax.texts) + len(ax.patches) for ax in fig.axes)
+
+
+def _problems(args: argparse.Namespace, pages: int) -> list[worksheet.Problem]:
+    return worksheet.generate_problems(
+        n=args.cols * args.rows * pages,
+        min_value=args.min_value,
+        max_digits=args.max_digits,
+        seed=args.seed,
+        mode=args.mode,
+        mixed_ratio=args.mixed_ratio,
+    )
+
+
+def _page_specs(
+    args: argparse.Namespace, pages: int, problems: Sequence[worksheet.Problem] | None = None
+) -> Iterator[worksheet._PageSpec]:
+    per_page = args.cols * args.rows
+    if problems is None:
+        problems = _problems(args, pages)
+    style = _page_kwargs(args)
+    del style["text_mode"]
+    for p in range(pages):
+        start = p * per_page
+        yield worksheet._page_spec(
+            problems[start : start + per_page],
+            title=args.title,
+            page_index=p + 1,
+            cols=args.cols,
+            rows=args.rows,
+            figsize=_figsize(args),
+            start_number=start + 1,
+            **style,
+        )
+
+
+def bench_native(args: argparse.Namespace, pages: int) -> dict[str, float]:
+    """Jak bench_pages, ale dla backendu native (układ strony + zapis strumienia PDF)."""
+    problems = _problems(args, pages)
+    t0 = time.perf_counter()
+    specs = list(_page_specs(args, pages, problems))
+    t1 = time.perf_counter()
+    buffer = io.BytesIO()
+    writer = worksheet._NativePdfWriter(buffer, template=args.page_template, bbox=args.bbox)
+    for spec in specs:
+        writer.add_page(spec)
+    writer.close()
+    t2 = time.perf_counter()
+    return {
+        "draw_ms": 1000 * (t1 - t0) / pages,
+        "save_ms": 1000 * (t2 - t1) / pages,
+        "total_ms": 1000 * (t2 - t0) / pages,
+        "artists": sum(len(s.texts) + len(s.lines) for s in specs) / pages,
+        "pdf_kb": buffer.tell() / 1024,
+    }
+
+
+def _text_spans(data: bytes) -> list[list[tuple[str, float, float]]]:
+    """
+    Napisy na kolejnych stronach PDF jako (tekst, lewa krawędź, prawa krawędź) w punktach,
+    odczytane przez PyMuPDF – zasięg wynika z szerokości glifów zapisanych w czcionkach pliku.
+    """
+    import pymupdf
+
+    with pymupdf.open(stream=data, filetype="pdf") as doc:
+        return [
+            [
+                (span["text"], span["bbox"][0], span["bbox"][2])
+                for block in page.get_text("dict")["blocks"]
+                for line in block.get("lines", ())
+                for span in line["spans"]
+            ]
+            for page in doc
+        ]
+
+
+def check_parity(args: argparse.Namespace, pages: int, tolerance: float = 0.5) -> float:
+    """
+    Porównuje układ backendu native z Matplotlib: punkty zaczepienia napisów (wg ha/va),
+    końce kresek i obszar strony (wg --bbox), wszystko w punktach. Zasięg napisów w poziomie
+    sprawdza PyMuPDF na obu plikach PDF: napis native musi zajmować dokładnie szerokość
+    policzoną z tablic _text_width i nie może wychodzić poza napis Matplotlib (DejaVu jest
+    szersza od Helvetiki, więc węższy napis nie nachodzi na sąsiednie elementy).
+    Zwraca największą odchyłkę i wypisuje elementy przekraczające tolerancję.
+    """
+    worst = 0.0
+    specs = list(_page_specs(args, pages))
+    # Oba pliki w obszarze "fixed" (współrzędne strony = współrzędne figury), Matplotlib z napisami
+    # jako tekst – tryb glyphs zamienia cyfry na ścieżki, których PyMuPDF nie odczyta
+    buffer = io.BytesIO()
+    writer = worksheet._NativePdfWriter(buffer, bbox="fixed")
+    for spec in specs:
+        writer.add_page(spec)
+    writer.close()
+    native_spans = _text_spans(buffer.getvalue())
+    ref_spans = _text_spans(worksheet._matplotlib_document(specs, "text", "fixed", None))
+
+    for page, spec in enumerate(specs, start=1):
+        fig = worksheet._render_figure(spec)
+        fig.set_dpi(72)
+        renderer = FigureCanvasAgg(fig).get_renderer()
+        ax = fig.axes[0]
+        to_page = worksheet._page_transform(spec)
+        deviations: list[tuple[float, str]] = []
+
+        for t, artist in zip(spec.texts, ax.texts):
+            bb = artist.get_window_extent(renderer)
+            x, y, width = worksheet._place_text(t, to_page)
+            ref_x = {"left": bb.x0, "center": (bb.x0 + bb.x1) / 2, "right": bb.x1}[t.ha]
+            ref_y = {"top": bb.y1, "bottom": bb.y0}.get(t.va, (bb.y0 + bb.y1) / 2)
+            own_x = {"left": x, "center": x + width / 2, "right": x + width}[t.ha]
+            own_y = {"top": y + worksheet._TEXT_ASCENT * t.size, "bottom": y - worksheet._TEXT_DESCENT * t.size}.get(
+                t.va, y + (worksheet._TEXT_ASCENT - worksheet._TEXT_DESCENT) * t.size / 2
+            )
+            # Wysokość ramki napisu sprawdza stałe _TEXT_ASCENT/_TEXT_DESCENT (położenie linii bazowej)
+            own_h = (worksheet._TEXT_ASCENT + worksheet._TEXT_DESCENT) * t.size
+            dev = max(abs(ref_x - own_x), abs(ref_y - own_y), abs(bb.height - own_h))
+            deviations.append((dev, f"napis {t.text!r}"))
+
+        own_spans = native_spans[page - 1]
+        drawn_spans = ref_spans[page - 1]
+        if [s[0] for s in own_spans] != [t.text for t in spec.texts] or len(drawn_spans) != len(own_spans):
+            deviations.append((math.inf, f"napisy odczytane z PDF ({len(own_spans)}/{len(drawn_spans)}) nie pasują do strony"))
+        else:
+            for t, (_, nx0, nx1), (_, mx0, mx1) in zip(spec.texts, own_spans, drawn_spans):
+                x, _, width = worksheet._place_text(t, to_page)
+                deviations.append((max(abs(nx0 - x), abs(nx1 - x - width)), f"szerokość napisu {t.text!r}"))
+                deviations.append((max(0.0, mx0 - nx0, nx1 - mx1), f"napis {t.text!r} poza zasięgiem Matplotlib"))
+
+        sx, ox, sy, oy = to_page
+        for group, collection in zip(spec.lines, ax.collections):
+            for seg, ref in zip(group.segments, collection.get_segments()):
+                ref_pts = ax.transData.transform(ref)
+                own_pts = [(px * sx + ox, py * sy + oy) for px, py in seg]
+                dev = max(abs(a - b) for p, q in zip(ref_pts, own_pts) for a, b in zip(p, q))
+                deviations.append((dev, f"kreska {seg}"))
+
+        if args.bbox == "tight":
+            ref_box = fig.get_tightbbox(renderer).transformed(fig.dpi_scale_trans).padded(7.2)
+        else:
+            ref_box = fig.bbox
+        x0, y0, x1, y1 = worksheet._prepare_native_page(spec, bbox=args.bbox).box
+        # Prawą krawędź wyznacza figura lub napis o innej szerokości czcionki – porównujemy lewą, dół i górę
+        deviations.append((max(abs(ref_box.x0 - x0), abs(ref_box.y0 - y0), abs(ref_box.y1 - y1)), "obszar strony"))
+
+        for dev, what in deviations:
+            worst = max(worst, dev)
+            if dev > tolerance:
+                print(f"  strona {page}: {what} – odchyłka {dev:.3f} pt", file=sys.stderr)
+    return worst
+
+
+# Warianty sprawdzane przez --reproducible: oba backendy, renderowanie sekwencyjne i równoległe
+REPRO_VARIANTS = (
+    ("--backend", "matplotlib"),
+    ("--backend", "matplotlib", "--jobs", "2"),
+    ("--backend", "matplotlib", "--text-mode", "glyphs"),
+    ("--backend", "native"),
+    ("--backend", "native", "--jobs", "2"),
+)
+
+
+def reproducible_digests(worksheet_argv: Sequence[str], variant: Sequence[str]) -> list[str]:
+    """
+    Buduje wariant dwa razy w osobnych procesach main.py z --reproducible (inny PYTHONHASHSEED,
+    inna sekunda zegara) i zwraca skróty SHA-256 obu plików.
+    """
+    script = Path(worksheet.__file__).resolve()
+    digests = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for attempt, hash_seed in enumerate(("1", "2")):
+            if attempt:
+                time.sleep(1.1)  # bieżąca data w metadanych dałaby już inne bajty
+            out = Path(tmp) / f"proba{attempt}.pdf"
+            cmd = [sys.executable, str(script), *worksheet_argv, *variant, "--reproducible", "--no-cache"]
+            subprocess.run(
+                [*cmd, "-o", str(out)],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                env={**os.environ, "PYTHONHASHSEED": hash_seed},
+            )
+            digests.append(hashlib.sha256(out.read_bytes()).hexdigest())
+    return digests
+
+
+def check_reproducible(worksheet_argv: Sequence[str]) -> int:
+    """
+    Sprawdza reproducible_digests dla każdego wariantu z REPRO_VARIANTS. Zwraca liczbę
+    wariantów, w których bajty się różnią.
+    """
+    failed = 0
+    for variant in REPRO_VARIANTS:
+        digests = reproducible_digests(worksheet_argv, variant)
+        same = digests[0] == digests[1]
+        failed += not same
+        print(f"  {' '.join(variant):<42} {'OK' if same else 'RÓŻNE BAJTY'}  {digests[0][:16]}")
+    return failed
+
+
+def bench_pages(args: argparse.Namespace, pages: int) -> dict[str, float]:
+    """Renderuje `pages` stron i zwraca średnie czasy (ms) oraz liczbę artystów na stronę."""
+    if args.backend == "native":
+        return bench_native(args, pages)
+    per_page = args.cols * args.rows
+    problems = _problems(args, pages)
+    figsize = _figsize(args)
+    style = _page_kwargs(args)
+
+    draw_s = save_s = 0.0
+    artists = 0
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        for p in range(pages):
+            start = p * per_page
+            t0 = time.perf_counter()
+            fig = worksheet.draw_page(
+                problems[start : start + per_page],
+                title=args.title,
+                page_index=p + 1,
+                cols=args.cols,
+                rows=args.rows,
+                figsize=figsize,
+                start_number=start + 1,
+                **style,
+            )
+            t1 = time.perf_counter()
+            pdf.savefig(fig, **worksheet._save_kwargs(args.bbox))
+            t2 = time.perf_counter()
+            artists += _artist_count(fig)
+            draw_s += t1 - t0
+            save_s += t2 - t1
+
+    return {
+        "draw_ms": 1000 * draw_s / pages,
+        "save_ms": 1000 * save_s / pages,
+        "total_ms": 1000 * (draw_s + save_s) / pages,
+        "artists": artists / pages,
+        "pdf_kb": buffer.tell() / 1024,
+    }
+
+
+def parse_args(argv: Sequence[str]) -> tuple[argparse.Namespace, argparse.Namespace]:
+    parser = argparse.ArgumentParser(
+        description="Benchmark renderowania stron (opcje po '--' trafiają do parsera main.py)."
+    )
+    parser.add_argument("--pages", type=int, default=20, help="Liczba mierzonych stron.")
+    parser.add_argument("--repeat", type=int, default=3, help="Liczba powtórzeń (raportowany jest najlepszy wynik).")
+    parser.add_argument(
+        "--parity",
+        action="store_true",
+        help="Zamiast pomiaru sprawdź zgodność układu backendu native z Matplotlib (kod wyjścia 1 przy rozbieżności).",
+    )
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="Zamiast pomiaru sprawdź, czy --reproducible daje identyczne bajty w kolejnych uruchomieniach "
+        "(kod wyjścia 1 przy różnicy).",
+    )
+    parser.add_argument("worksheet_args", nargs=argparse.REMAINDER, help="Opcje przekazywane do main.py.")
+    args = parser.parse_args(argv)
+    extra = args.worksheet_args
+    if extra and extra[0] == "--":
+        extra = extra[1:]
+    return args, worksheet.parse_args(extra)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    bench_args, args = parse_args(argv if argv is not None else sys.argv[1:])
+    if bench_args.reproducible:
+        extra = bench_args.worksheet_args
+        failed = check_reproducible(extra[1:] if extra[:1] == ["--"] else extra)
+        print(f"Powtarzalność PDF: {len(REPRO_VARIANTS) - failed}/{len(REPRO_VARIANTS)} wariantów bez różnic")
+        return 0 if not failed else 1
+
+    if bench_args.pages <= 0 or bench_args.repeat <= 0:
+        print("--pages i --repeat muszą być dodatnie.", file=sys.stderr)
+        return 1
+
+    if bench_args.parity:
+        worst = check_parity(args, bench_args.pages)
+        print(f"Zgodność native/matplotlib: {bench_args.pages} stron, największa odchyłka {worst:.4f} pt")
+        return 0 if worst <= 0.5 else 1
+
+    # Rozgrzewka: import fontów i cache Matplotlib nie powinny wpływać na pomiar
+    bench_pages(args, 1)
+    best: dict[str, float] = {"total_ms": math.inf}
+    for _ in range(bench_args.repeat):
+        result = bench_pages(args, bench_args.pages)
+        if result["total_ms"] < best["total_ms"]:
+            best = result
+
+    print(f"Strony: {bench_args.pages} × {args.cols}x{args.rows} zadań (najlepszy z {bench_args.repeat})")
+    print(f"  rysowanie : {best['draw_ms']:8.2f} ms/stronę")
+    print(f"  zapis     : {best['save_ms']:8.2f} ms/stronę")
+    print(f"  razem     : {best['total_ms']:8.2f} ms/stronę")
+    print(f"  artyści   : {best['artists']:8.1f} na stronę")
+    print(f"  PDF       : {best['pdf_kb']:8.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -58,44 +58,89 @@ numpy
 from __future__ import annotations
 
 import argparse
+import io
+import json
 import math
 import os
 import random
+import re
+import shutil
+import signal
+import sqlite3
 import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, closing, contextmanager, redirect_stderr, redirect_stdout, suppress
+from multiprocessing.shared_memory import SharedMemory
 from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import cache, lru_cache, partial
+from itertools import chain, islice
 from pathlib import Path
-from collections.abc import Sequence
+from collections.abc import Callable, Iterable, Iterator, Sequence
 
-# --- Przygotowanie backendu Matplotlib (ważne dla macOS / środowisk bez GUI) ---
-try:
-    import matplotlib
+# --- Matplotlib ładowany leniwie ---
+# Import Matplotlib (zwłaszcza backend_pdf) to większość czasu startu programu, a do
+# generowania zadań, --dry-run czy --build-bank nie jest potrzebny. Funkcje rysujące
+# importują potrzebne klasy lokalnie; tu są tylko nazwy dla adnotacji typów. Strony są
+# samodzielnymi obiektami Figure z płótnem PDF/Agg, więc pyplot nie jest używany wcale.
+import numpy as np
+import hashlib
+from typing import TYPE_CHECKING, BinaryIO, TextIO, Tuple, TypeVar, overload
 
-    if "MPLBACKEND" not in os.environ:
-        current_backend = matplotlib.get_backend().lower()
-        if not current_backend.startswith("agg"):
-            matplotlib.use("Agg")
-except Exception as _e:  # pragma: no cover
-    print(f"[WARN] Nie udało się wstępnie ustawić backendu Matplotlib: {_e}", file=sys.stderr)
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.figure import Figure
-import hashlib
-from typing import Tuple
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+    from matplotlib.font_manager import FontProperties
+    from matplotlib.path import Path as MplPath
 
 
 # --- Dane konfiguracyjne / struktury --- #
+__version__ = "0.1.0"
+
 __all__ = [
     "Problem",
+    "ProblemSet",
     "has_carry",
     "has_borrow",
+    "count_carries",
+    "count_borrows",
+    "carry_mask",
+    "borrow_mask",
+    "PairSpace",
+    "build_bank",
     "generate_problems",
+    "generate_problem_set",
+    "ProblemStream",
     "format_problem",
     "infer_width",
     "draw_page",
     "draw_answers_page",
     "build_pdf",
+    "build_answers_pdf",
+    "build_variants_pdf",
+    "variant_seeds",
+    "iter_pages",
+    "PageLayout",
+    "page_layout",
+    "BACKENDS",
+    "BBOX_MODES",
+    "OutputCache",
+    "DUMP_FORMATS",
+    "dump_problems",
+    "warm_font_cache",
     "parse_args",
+    "run",
+    "run_manifest",
+    "WorksheetService",
+    "make_server",
+    "serve_main",
     "main",
 ]
 @dataclass(frozen=True)
@@ -103,6 +148,7 @@ class Problem:
     a: int
     b: int
     op: str = "+"  # '+' albo '-'
+    carries: int | None = None  # liczba przeniesień ('+') lub pożyczek ('-'), jeśli znana
 
     def answer(self) -> int:
         if self.op == "+":
@@ -112,6 +158,143 @@ class Problem:
         raise ValueError(f"Nieznany operator: {self.op}")
 
 
+class ProblemSet(Sequence[Problem]):
+    """
+    Zwarty zestaw zadań w układzie „struktura tablic” zamiast listy obiektów Problem:
+      a, b    – int64 (albo object dla liczb nie mieszczących się w 64 bitach),
+      op      – uint8: indeks w OPS (0 = '+', 1 = '-'),
+      carries – int16: liczba przeniesień/pożyczek, -1 = nieznana.
+
+    Zachowuje się jak Sequence[Problem] (draw_page, draw_answers_page i build_pdf przyjmują go
+    bezpośrednio), ale wycinek ps[i:j] jest widokiem na te same tablice (bez kopiowania),
+    answers() i width() liczą się wektorowo, a share() przenosi dane do pamięci współdzielonej –
+    tak udostępniony zestaw trafia do innych procesów (pickle) jako sama nazwa bloku pamięci.
+    """
+
+    OPS = ("+", "-")
+
+    def __init__(self, a: np.ndarray, b: np.ndarray, op: np.ndarray, carries: np.ndarray | None = None) -> None:
+        if not (len(a) == len(b) == len(op)) or (carries is not None and len(carries) != len(a)):
+            raise ValueError("Tablice ProblemSet muszą mieć tę samą długość.")
+        self.a = a
+        self.b = b
+        self.op = op
+        self.carries = carries if carries is not None else np.full(len(a), -1, dtype=np.int16)
+        # Blok pamięci współdzielonej (share/attach) i położenie tego widoku w nim
+        self._shm: SharedMemory | None = None
+        self._shm_owner = False
+        self._shm_span = (0, len(a), len(a))
+
+    @classmethod
+    def from_problems(cls, problems: Sequence[Problem]) -> ProblemSet:
+        a_vals = [p.a for p in problems]
+        b_vals = [p.b for p in problems]
+        big = any(abs(v) >= 2**63 for v in a_vals + b_vals)
+        dtype = object if big else np.int64
+        return cls(
+            np.array(a_vals, dtype=dtype),
+            np.array(b_vals, dtype=dtype),
+            np.array([cls.OPS.index(p.op) for p in problems], dtype=np.uint8),
+            np.array([-1 if p.carries is None else p.carries for p in problems], dtype=np.int16),
+        )
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    @overload
+    def __getitem__(self, index: int) -> Problem: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> ProblemSet: ...
+
+    def __getitem__(self, index: int | slice) -> Problem | ProblemSet:
+        if isinstance(index, slice):
+            view = ProblemSet(self.a[index], self.b[index], self.op[index], self.carries[index])
+            start, stop, step = index.indices(len(self))
+            if self._shm is not None and step == 1:
+                base = self._shm_span[0]
+                view._shm = self._shm
+                view._shm_span = (base + start, base + max(start, stop), self._shm_span[2])
+            return view
+        k = int(self.carries[index])
+        return Problem(int(self.a[index]), int(self.b[index]), self.OPS[self.op[index]], None if k < 0 else k)
+
+    def __iter__(self) -> Iterator[Problem]:
+        ops = self.OPS
+        for a, b, op, k in zip(self.a.tolist(), self.b.tolist(), self.op.tolist(), self.carries.tolist()):
+            yield Problem(a, b, ops[op], None if k < 0 else k)
+
+    def to_problems(self) -> list[Problem]:
+        return list(self)
+
+    def answers(self) -> np.ndarray:
+        """Wyniki wszystkich zadań naraz."""
+        return np.where(self.op == 0, self.a + self.b, self.a - self.b)
+
+    def width(self) -> int:
+        """Wektorowy odpowiednik infer_width."""
+        return len(str(int(np.maximum(self.a, self.b).max())))
+
+    # --- Pamięć współdzielona --- #
+    def share(self) -> ProblemSet:
+        """
+        Kopia zestawu w pamięci współdzielonej (tylko int64). Właściciel zwalnia blok przez release();
+        procesy, do których trafi (pickle), tylko się do niego podłączają.
+        """
+        if self.a.dtype == object:
+            raise ValueError("Pamięć współdzielona obsługuje tylko liczby mieszczące się w int64.")
+        n = len(self)
+        shm = SharedMemory(create=True, size=max(1, n * 19))
+        shared = ProblemSet._from_buffer(shm, 0, n, n)
+        shared.a[:] = self.a
+        shared.b[:] = self.b
+        shared.op[:] = self.op
+        shared.carries[:] = self.carries
+        shared._shm_owner = True
+        return shared
+
+    @staticmethod
+    def _from_buffer(shm: SharedMemory, start: int, stop: int, total: int) -> ProblemSet:
+        # Układ bloku: a (int64) | b (int64) | carries (int16) | op (uint8)
+        buf = shm.buf
+        a = np.ndarray((total,), dtype=np.int64, buffer=buf, offset=0)
+        b = np.ndarray((total,), dtype=np.int64, buffer=buf, offset=8 * total)
+        carries = np.ndarray((total,), dtype=np.int16, buffer=buf, offset=16 * total)
+        op = np.ndarray((total,), dtype=np.uint8, buffer=buf, offset=18 * total)
+        ps = ProblemSet(a[start:stop], b[start:stop], op[start:stop], carries[start:stop])
+        ps._shm = shm
+        ps._shm_span = (start, stop, total)
+        return ps
+
+    @classmethod
+    def _attach(cls, name: str, start: int, stop: int, total: int) -> ProblemSet:
+        # Procesy potomne dzielą resource_tracker z właścicielem, więc podłączenie nie przejmuje bloku
+        shm = SharedMemory(name=name)
+        return cls._from_buffer(shm, start, stop, total)
+
+    def __reduce__(self) -> tuple[object, ...]:
+        if self._shm is not None:
+            return (ProblemSet._attach, (self._shm.name, *self._shm_span))
+        return (ProblemSet, (self.a, self.b, self.op, self.carries))
+
+    def release(self) -> None:
+        """Odłącza zestaw od pamięci współdzielonej (właściciel dodatkowo usuwa blok)."""
+        if self._shm is None:
+            return
+        shm, owner = self._shm, self._shm_owner
+        self._shm = None
+        self.a = self.a.copy()
+        self.b = self.b.copy()
+        self.op = self.op.copy()
+        self.carries = self.carries.copy()
+        try:
+            shm.close()
+        except BufferError:
+            pass  # istnieją jeszcze widoki na blok; pamięć zostanie zwolniona razem z nimi
+        if owner:
+            shm.unlink()
+
+
 # --- Logika generowania --- #
 def has_carry(a: int, b: int) -> bool:
     """
@@ -149,6 +332,580 @@ def has_borrow(a: int, b: int) -> bool:
     return False
 
 
+# Relacja młodszych cyfr składnika do młodszych cyfr min_value (lub drugiego składnika),
+# porównanie od jedności w górę
+_LT, _EQ, _GT = 0, 1, 2
+
+# Stan programowania dynamicznego PairSpace: (przeniesienie/pożyczka, relacja a do min, relacja b
+# do min, licznik przeniesień, relacja a do b) oraz ruch: (waga bloku, waga stanu, pary cyfr, stan)
+_State = Tuple[int, int, int, int, int]
+_Move = Tuple[int, int, Tuple[Tuple[int, int], ...], _State]
+
+
+def _rel(x: int, y: int) -> int:
+    return _GT if x > y else (_LT if x < y else _EQ)
+
+
+@cache
+def _digit_classes(
+    op: str, c: int, m: int, ordered: bool = False
+) -> tuple[tuple[int, int, int, int, tuple[tuple[int, int], ...]], ...]:
+    """
+    Grupuje 100 par cyfr (da, db) jednej kolumny według skutku: wyjściowe przeniesienie/pożyczka nc,
+    relacja da do cyfry m (min_value), relacja db do m oraz (gdy ordered) relacja da do db.
+    Zwraca krotki (nc, rel_a, rel_b, rel_ab, pary).
+    c – przeniesienie (dodawanie) lub pożyczka (odejmowanie) wchodzące do kolumny.
+    """
+    groups: dict[tuple[int, int, int, int], list[tuple[int, int]]] = {}
+    for da in range(10):
+        for db in range(10):
+            if op == "+":
+                nc = 1 if da + db + c >= 10 else 0
+            else:
+                nc = 1 if da - c < db else 0
+            rel_ab = _rel(da, db) if ordered else _EQ
+            groups.setdefault((nc, _rel(da, m), _rel(db, m), rel_ab), []).append((da, db))
+    return tuple((nc, ra, rb, rab, tuple(pairs)) for (nc, ra, rb, rab), pairs in sorted(groups.items()))
+
+
+def _splitmix64(z: int) -> int:
+    """Mieszanie 64-bitowe (SplitMix64) – szybka funkcja rundy dla małych przestrzeni."""
+    z = (z + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+
+def _permute_index(index: int, size: int, key: int) -> int:
+    """
+    Pseudolosowa bijekcja [0, size) -> [0, size) zależna od klucza (sieć Feistela + „cycle walking”).
+    Pozwala przejść przestrzeń par w losowej kolejności bez zapamiętywania wylosowanych numerów.
+    """
+    bits = max(2, (size - 1).bit_length())
+    bits += bits & 1
+    half = bits // 2
+    mask = (1 << half) - 1
+    nbytes = (half + 7) // 8
+    x = index
+    while True:
+        left, right = x >> half, x & mask
+        for rnd in range(4):
+            if half <= 64:
+                f = _splitmix64((key + rnd) * 0x9E3779B97F4A7C15 ^ right)
+            else:
+                digest = hashlib.shake_256(f"{key}:{rnd}:{right}".encode()).digest(nbytes)
+                f = int.from_bytes(digest, "big")
+            left, right = right, left ^ (f & mask)
+        x = (left << half) | right
+        # Dziedzina ma co najwyżej 4*size elementów, więc średnio wystarczają 1–4 przejścia
+        if x < size:
+            return x
+
+
+class PairSpace:
+    """
+    Przestrzeń poprawnych par (a, b) dla jednego operatora budowana cyfra po cyfrze (od jedności).
+
+    Programowanie dynamiczne po kolumnach liczy, ile uzupełnień starszych cyfr prowadzi do pary
+    spełniającej warunki: min_value <= a, b <= 10**max_digits - 1, liczba przeniesień (dodawanie)
+    albo pożyczek (odejmowanie, wtedy też a >= b) w zakresie min_carries..max_carries (None = bez
+    górnej granicy) oraz przeniesienie/pożyczka w każdej kolumnie z carry_columns (1 = jedności).
+    unordered=True liczy pary bez względu na kolejność składników (tylko a <= b) – przestrzeń
+    dla unikalnych zadań dodawania. Dzięki temu:
+      - count    – dokładna liczba poprawnych par,
+      - unrank   – para o zadanym numerze 0..count-1,
+      - sample   – jednostajne losowanie pary bez odrzucania; koszt liniowy względem liczby cyfr,
+                   więc działa także dla liczb o dziesiątkach i setkach cyfr.
+    """
+
+    def __init__(
+        self,
+        op: str,
+        min_value: int,
+        max_digits: int,
+        min_carries: int = 1,
+        max_carries: int | None = None,
+        carry_columns: frozenset[int] = frozenset(),
+        unordered: bool = False,
+    ) -> None:
+        if op not in {"+", "-"}:
+            raise ValueError(f"Nieznany operator: {op}")
+        if min_carries < 0 or (max_carries is not None and max_carries < min_carries):
+            raise ValueError("Niepoprawny zakres liczby przeniesień/pożyczek.")
+        self.op = op
+        self.min_value = max(min_value, 0)
+        self.max_digits = max_digits
+        self.min_carries = min_carries
+        self.max_carries = max_carries
+        self.carry_columns = carry_columns
+        self.unordered = unordered
+        # Licznik przeniesień obcinany do najmniejszej wartości, która jeszcze rozróżnia wynik
+        self._cap = min_carries if max_carries is None else max_carries + 1
+        self._min_digits = [(self.min_value // 10 ** i) % 10 for i in range(max_digits)]
+        self._moves: list[dict[_State, list[_Move]]] = []
+        self._ways = self._count_table()
+        start = (0, _EQ, _EQ, 0, _EQ)
+        self.count = 0 if self.min_value > 10 ** max_digits - 1 else self._ways[0].get(start, 0)
+
+    def _accepts(self, state: _State) -> bool:
+        c, ca, cb, k, ab = state
+        if ca == _LT or cb == _LT or ab == _GT:
+            return False
+        if self.op == "-" and c:
+            return False  # pożyczka z najstarszej kolumny oznaczałaby a < b
+        return k >= self.min_carries and (self.max_carries is None or k <= self.max_carries)
+
+    def _next_state(
+        self, state: _State, nc: int, ra: int, rb: int, rab: int
+    ) -> _State:
+        _, ca, cb, k, ab = state
+        return (
+            nc,
+            ca if ra == _EQ else ra,
+            cb if rb == _EQ else rb,
+            min(k + nc, self._cap),
+            ab if rab == _EQ else rab,
+        )
+
+    def _count_table(self) -> list[dict[_State, int]]:
+        states = [
+            (c, ca, cb, k, ab)
+            for c in (0, 1)
+            for ca in (_LT, _EQ, _GT)
+            for cb in (_LT, _EQ, _GT)
+            for k in range(self._cap + 1)
+            for ab in ((_LT, _EQ, _GT) if self.unordered else (_EQ,))
+        ]
+        ways: list[dict[_State, int]] = [{} for _ in range(self.max_digits + 1)]
+        ways[self.max_digits] = {st: 1 for st in states if self._accepts(st)}
+        # Dla każdej kolumny i stanu: dozwolone ruchy (waga bloku, waga stanu docelowego, pary cyfr, stan)
+        self._moves = [{} for _ in range(self.max_digits)]
+        for i in range(self.max_digits - 1, -1, -1):
+            after = ways[i + 1]
+            here = ways[i]
+            required = (i + 1) in self.carry_columns
+            for st in states:
+                total = 0
+                moves: list[_Move] = []
+                for nc, ra, rb, rab, pairs in _digit_classes(
+                    self.op, st[0], self._min_digits[i], self.unordered
+                ):
+                    if required and not nc:
+                        continue
+                    nxt = self._next_state(st, nc, ra, rb, rab)
+                    w = after.get(nxt)
+                    if w:
+                        total += w * len(pairs)
+                        moves.append((w * len(pairs), w, pairs, nxt))
+                if total:
+                    here[st] = total
+                    self._moves[i][st] = moves
+        return ways
+
+    def unrank(self, index: int) -> tuple[int, int]:
+        """Zwraca parę (a, b) o numerze index (0 <= index < count)."""
+        if not (0 <= index < self.count):
+            raise IndexError("Numer pary poza zakresem przestrzeni.")
+        state = (0, _EQ, _EQ, 0, _EQ)
+        digits_a: list[str] = []
+        digits_b: list[str] = []
+        for i in range(self.max_digits):
+            for block, w, pairs, nxt in self._moves[i][state]:
+                if index < block:
+                    da, db = pairs[index // w]
+                    index %= w
+                    state = nxt
+                    break
+                index -= block
+            digits_a.append(str(da))
+            digits_b.append(str(db))
+        return int("".join(reversed(digits_a))), int("".join(reversed(digits_b)))
+
+    def sample(self, rng: random.Random) -> tuple[int, int]:
+        """Jednostajnie losuje poprawną parę (a, b)."""
+        return self.unrank(rng.randrange(self.count))
+
+    def iter_unique(self, n: int, rng: random.Random) -> Iterator[tuple[int, int]]:
+        """
+        n różnych par w losowej kolejności (losowanie bez zwracania): numery 0..n-1 przechodzą
+        przez losową permutację przestrzeni i są zamieniane na pary. Koszt O(n), bez ponawiania.
+        W przestrzeni unordered kolejność składników jest losowana osobno.
+        """
+        if n > self.count:
+            raise ValueError(
+                f"Nie da się wygenerować {n} unikalnych zadań '{self.op}': "
+                f"przy tych ustawieniach istnieje tylko {self.count} różnych par."
+            )
+        return self._unique_pairs(n, rng.getrandbits(64), rng)
+
+    def _unique_pairs(self, n: int, key: int, rng: random.Random) -> Iterator[tuple[int, int]]:
+        for k in range(n):
+            a, b = self.unrank(_permute_index(k, self.count, key))
+            if self.unordered and rng.random() < 0.5:
+                a, b = b, a
+            yield a, b
+
+
+@lru_cache(maxsize=64)
+def _pair_space(
+    op: str,
+    min_value: int,
+    max_digits: int,
+    min_carries: int = 1,
+    max_carries: int | None = None,
+    carry_columns: frozenset[int] = frozenset(),
+    unordered: bool = False,
+) -> PairSpace:
+    return PairSpace(op, min_value, max_digits, min_carries, max_carries, carry_columns, unordered)
+
+
+def _require_pairs(space: PairSpace) -> PairSpace:
+    """
+    Zwraca space albo zgłasza ValueError, gdy nie ma w niej żadnej pary – losowanie
+    z odrzucaniem (silniki python/numpy) nie skończyłoby się wtedy nigdy.
+    """
+    if space.count == 0:
+        raise ValueError(
+            f"Brak par spełniających warunki dla '{space.op}' "
+            f"(min_value={space.min_value}, max_digits={space.max_digits})."
+        )
+    return space
+
+
+def count_carries(a: int, b: int) -> int:
+    """
+    Liczba przeniesień w dodawaniu pisemnym a + b (kolumny, z których przechodzi 1 do następnej).
+    """
+    carry = 0
+    count = 0
+    x, y = a, b
+    while x > 0 or y > 0:
+        carry = 1 if x % 10 + y % 10 + carry >= 10 else 0
+        count += carry
+        x //= 10
+        y //= 10
+    return count
+
+
+def count_borrows(a: int, b: int) -> int:
+    """
+    Liczba pożyczek w odejmowaniu pisemnym a - b (a >= b).
+    """
+    borrow = 0
+    count = 0
+    x, y = a, b
+    while x > 0 or y > 0:
+        borrow = 1 if x % 10 - borrow < y % 10 else 0
+        count += borrow
+        x //= 10
+        y //= 10
+    return count
+
+
+def _carry_counts(a: np.ndarray, b: np.ndarray, max_digits: int) -> np.ndarray:
+    x = a.copy()
+    y = b.copy()
+    carry = np.zeros(x.shape, dtype=np.int64)
+    counts = np.zeros(x.shape, dtype=np.int64)
+    for _ in range(max_digits):
+        carry = (x % 10 + y % 10 + carry) // 10
+        counts += carry
+        x //= 10
+        y //= 10
+    return counts
+
+
+def _borrow_counts(a: np.ndarray, b: np.ndarray, max_digits: int) -> np.ndarray:
+    x = a.copy()
+    y = b.copy()
+    borrow = np.zeros(x.shape, dtype=np.int64)
+    counts = np.zeros(x.shape, dtype=np.int64)
+    for _ in range(max_digits):
+        borrow = ((x % 10 - borrow) < (y % 10)).astype(np.int64)
+        counts += borrow
+        x //= 10
+        y //= 10
+    return counts
+
+
+def carry_mask(a: np.ndarray, b: np.ndarray, max_digits: int) -> np.ndarray:
+    """
+    Wektorowy odpowiednik has_carry: maska wierszy, w których a + b ma co najmniej jedno przeniesienie.
+    a, b – tablice int64 o wartościach < 10**max_digits.
+    """
+    return _carry_counts(a, b, max_digits) > 0
+
+
+def borrow_mask(a: np.ndarray, b: np.ndarray, max_digits: int) -> np.ndarray:
+    """
+    Wektorowy odpowiednik has_borrow: maska wierszy, w których a - b (a >= b) ma co najmniej jedną pożyczkę.
+    """
+    return _borrow_counts(a, b, max_digits) > 0
+
+
+def _numpy_pairs(
+    rng: np.random.Generator,
+    op: str,
+    count: int,
+    min_value: int,
+    max_digits: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Losuje paczkami kandydackie pary (a, b) i zostawia tylko poprawne wiersze, aż uzbiera `count` par.
+    Dla odejmowania zamienia składniki tak, aby a >= b. Zwraca (a, b, liczba przeniesień/pożyczek).
+    """
+    upper = 10 ** max_digits - 1
+    out_a = np.empty(0, dtype=np.int64)
+    out_b = np.empty(0, dtype=np.int64)
+    out_k = np.empty(0, dtype=np.int64)
+    while out_a.size < count:
+        missing = count - out_a.size
+        # Nadmiarowa paczka: pojedyncze losowanie i tak kosztuje mniej niż kolejna iteracja pętli
+        size = min(max(2 * missing, 1024), 1 << 20)
+        a = rng.integers(min_value, upper + 1, size=size, dtype=np.int64)
+        b = rng.integers(min_value, upper + 1, size=size, dtype=np.int64)
+        if op == "+":
+            k = _carry_counts(a, b, max_digits)
+        else:
+            a, b = np.maximum(a, b), np.minimum(a, b)
+            k = _borrow_counts(a, b, max_digits)
+        ok = k > 0
+        a = a[ok]
+        b = b[ok]
+        k = k[ok]
+        out_a = np.concatenate([out_a, a[:missing]])
+        out_b = np.concatenate([out_b, b[:missing]])
+        out_k = np.concatenate([out_k, k[:missing]])
+    return out_a, out_b, out_k
+
+
+def _generate_problems_numpy(
+    target_add: int,
+    target_sub: int,
+    min_value: int,
+    max_digits: int,
+    rng: np.random.Generator,
+    shuffle: bool,
+) -> ProblemSet:
+    """
+    Silnik wsadowy (NumPy) dla generate_problems – te same gwarancje co silnik 'python',
+    ale inna sekwencja losowań (ten sam seed daje inny, choć równie powtarzalny zestaw).
+    Wynik powstaje od razu jako tablice (ProblemSet), bez pośrednich obiektów Problem.
+    """
+    parts = []
+    for op, count in (("+", target_add), ("-", target_sub)):
+        if count <= 0:
+            continue
+        a, b, k = _numpy_pairs(rng, op, count, min_value, max_digits)
+        parts.append((a, b, np.full(count, ProblemSet.OPS.index(op), dtype=np.uint8), k))
+    if not parts:
+        return ProblemSet.from_problems([])
+    a, b, ops, k = (np.concatenate(cols) for cols in zip(*parts))
+    if shuffle:
+        order = rng.permutation(len(a))
+        a, b, ops, k = a[order], b[order], ops[order], k[order]
+    return ProblemSet(a, b, ops, k.astype(np.int16))
+
+
+# --- Bank zadań (SQLite) --- #
+# Maksymalna liczba cyfr przechowywana w banku (kolumny INTEGER w SQLite są 64-bitowe)
+BANK_MAX_DIGITS = 18
+
+_BANK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    id INTEGER PRIMARY KEY,
+    op TEXT NOT NULL,
+    digits INTEGER NOT NULL,
+    carries INTEGER NOT NULL,
+    lo INTEGER NOT NULL,
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_problems_lookup ON problems (op, digits, carries, lo, a, b);
+CREATE TABLE IF NOT EXISTS coverage (
+    op TEXT NOT NULL,
+    digits INTEGER NOT NULL,
+    min_value INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (op, digits)
+);
+"""
+
+
+def build_bank(
+    path: str | Path,
+    digits: Sequence[int],
+    size: int = 100_000,
+    min_value: int = 0,
+    seed: int | None = None,
+) -> int:
+    """
+    Buduje lub odświeża bank zadań: dla każdego operatora i każdej liczby cyfr z `digits` zapisuje
+    do pliku SQLite `size` różnych, poprawnych par (mniej, jeśli tylu nie ma) z liczbą
+    przeniesień/pożyczek. Wcześniejsze wiersze dla tych samych (op, cyfry) są zastępowane.
+    Zwraca łączną liczbę zapisanych wierszy.
+    """
+    if size <= 0:
+        raise ValueError("Rozmiar banku musi być dodatni.")
+    for d in digits:
+        if not (2 <= d <= BANK_MAX_DIGITS):
+            raise ValueError(f"Bank obsługuje liczby od 2 do {BANK_MAX_DIGITS} cyfr (podano {d}).")
+    rng = random.Random(seed)
+    total = 0
+    with closing(sqlite3.connect(str(path))) as conn, conn:
+        conn.executescript(_BANK_SCHEMA)
+        for d in digits:
+            for op in ("+", "-"):
+                space = _pair_space(op, min_value, d, 1, None, frozenset(), op == "+")
+                count_fn = count_carries if op == "+" else count_borrows
+                rows = [
+                    (op, d, count_fn(a, b), min(a, b), a, b)
+                    for a, b in space.iter_unique(min(size, space.count), rng)
+                ]
+                conn.execute("DELETE FROM problems WHERE op = ? AND digits = ?", (op, d))
+                conn.executemany(
+                    "INSERT INTO problems (op, digits, carries, lo, a, b) VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO coverage (op, digits, min_value, rows) VALUES (?, ?, ?, ?)",
+                    (op, d, min_value, len(rows)),
+                )
+                total += len(rows)
+    return total
+
+
+def _draw_from_bank(
+    path: str | Path,
+    targets: Sequence[tuple[str, int]],
+    min_value: int,
+    max_digits: int,
+    min_carries: int,
+    max_carries: int | None,
+    unique: bool,
+    rng: random.Random,
+) -> list[Problem] | None:
+    """
+    Losuje zadania z banku zapytaniem po indeksie (op, cyfry, przeniesienia, zakres wartości).
+    Zwraca None, gdy bank nie pokrywa parametrów (brak pliku, inna liczba cyfr, zbyt wysokie
+    min_value w banku albo za mało pasujących wierszy) – wtedy generator liczy zadania sam.
+
+    Pasujące wiersze nie są wczytywane: COUNT(*) daje ich liczbę, rng wybiera numery wierszy
+    (w porządku indeksu), a _bank_rows pobiera tylko te wiersze.
+    """
+    if not Path(path).is_file():
+        return None
+    hi = max_carries if max_carries is not None else max_digits
+    problems: list[Problem] = []
+    with closing(sqlite3.connect(str(path))) as conn:
+        picks: list[tuple[str, list[int]]] = []
+        for op, count in targets:
+            covered = conn.execute(
+                "SELECT 1 FROM coverage WHERE op = ? AND digits = ? AND min_value <= ?",
+                (op, max_digits, min_value),
+            ).fetchone()
+            if covered is None:
+                return None
+            total = conn.execute(
+                "SELECT COUNT(*) FROM problems" + _BANK_FILTER, (op, max_digits, min_carries, hi, min_value)
+            ).fetchone()[0]
+            if total < (count if unique else 1):
+                return None
+            picks.append((op, rng.sample(range(total), count) if unique else rng.choices(range(total), k=count)))
+        for op, offsets in picks:
+            rows = _bank_rows(conn, (op, max_digits, min_carries, hi, min_value), offsets)
+            problems.extend(Problem(a, b, op, k) for a, b, k in (rows[i] for i in offsets))
+    return problems
+
+
+# Wiersze pasujące do parametrów (COUNT) oraz pobieranie kolejnego z nich w porządku indeksu
+# ix_problems_lookup: porównanie krotek (carries, lo, a, b) jest zakresem indeksu, więc zapytanie
+# zaczyna od poprzednio pobranego wiersza, a nie od początku przedziału
+_BANK_FILTER = " WHERE op = ? AND digits = ? AND carries BETWEEN ? AND ? AND lo >= ?"
+_BANK_SEEK = (
+    "SELECT carries, lo, a, b FROM problems"
+    " WHERE op = ? AND digits = ? AND (carries, lo, a, b) > (?, ?, ?, ?) AND carries <= ? AND lo >= ?"
+    " ORDER BY carries, lo, a, b LIMIT 1 OFFSET ?"
+)
+
+
+def _bank_rows(
+    conn: sqlite3.Connection, params: tuple[str, int, int, int, int], offsets: Iterable[int]
+) -> dict[int, tuple[int, int, int]]:
+    """
+    Wiersze (a, b, przeniesienia) o podanych numerach w porządku indeksu (params jak w _BANK_FILTER).
+    Numery są odwiedzane rosnąco, każde zapytanie pomija tylko wiersze od poprzedniego numeru,
+    więc łącznie indeks jest przechodzony najwyżej raz, a w pamięci są tylko wybrane wiersze.
+    """
+    op, digits, min_carries, max_carries, min_value = params
+    rows: dict[int, tuple[int, int, int]] = {}
+    # Krotka mniejsza od każdego wiersza z carries >= min_carries (lo, a, b są nieujemne)
+    last: tuple[int, int, int, int] = (min_carries, -1, -1, -1)
+    position = -1
+    for offset in sorted(set(offsets)):
+        last = conn.execute(
+            _BANK_SEEK, (op, digits, *last, max_carries, min_value, offset - position - 1)
+        ).fetchone()
+        position = offset
+        rows[offset] = (last[2], last[3], last[0])
+    return rows
+
+
+def _check_rejection_sampling(target_add: int, target_sub: int, min_value: int, max_digits: int) -> None:
+    """
+    Silniki python/numpy losują pary z odrzucaniem (co najmniej jedno przeniesienie/pożyczka);
+    PairSpace liczy z góry, czy taka para w ogóle istnieje, więc niemożliwe warunki dają ValueError.
+    """
+    for op, count in (("+", target_add), ("-", target_sub)):
+        if count > 0:
+            _require_pairs(_pair_space(op, min_value, max_digits))
+
+
+def _python_rng(seed: int | None, rng: random.Random | np.random.Generator | None) -> random.Random:
+    """Generator random.Random dla jednego wywołania: przekazany, pochodny od numpy.Generator lub z seed."""
+    if isinstance(rng, random.Random):
+        return rng
+    if rng is not None:
+        return random.Random(int(rng.integers(0, 2**63)))
+    return random.Random(seed)
+
+
+def _numpy_rng(seed: int | None, rng: random.Random | np.random.Generator | None) -> np.random.Generator:
+    """Generator numpy dla jednego wywołania: przekazany, pochodny od random.Random lub z seed."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is not None:
+        return np.random.default_rng(rng.getrandbits(64))
+    return np.random.default_rng(seed)
+
+
+def _resolve_engine(
+    engine: str,
+    max_digits: int,
+    mode: str,
+    mixed_ratio: float,
+    unique: bool,
+    carries: tuple[int, int | None] | None,
+    carry_columns: Sequence[int],
+) -> str:
+    """Sprawdza parametry generate_problems i zwraca faktycznie używany silnik."""
+    if engine not in {"auto", "python", "numpy", "digits", "counter"}:
+        raise ValueError("engine musi być: auto | python | numpy | digits | counter")
+    targeted = carries is not None or bool(carry_columns)
+    if engine == "auto":
+        engine = "python" if max_digits <= 9 and not targeted else "digits"
+    if targeted and engine not in {"digits", "counter"}:
+        raise ValueError("carries / carry_columns wymagają silnika digits (lub auto).")
+    if max_digits < 2 or (engine in {"python", "numpy"} and max_digits > 9):
+        raise ValueError("max_digits powinno być w zakresie 2..9 (większe wartości: engine digits).")
+    if mode not in {"addition", "subtraction", "mixed"}:
+        raise ValueError("mode musi być: addition | subtraction | mixed")
+    if mode == "mixed" and not (0.0 <= mixed_ratio <= 1.0):
+        raise ValueError("mixed_ratio musi być w zakresie 0..1")
+    if unique and engine != "counter":
+        engine = "digits"
+    return engine
+
+
 def generate_problems(
     n: int,
     min_value: int = 12,
@@ -157,69 +914,254 @@ def generate_problems(
     seed: int | None = None,
     mode: str = "addition",
     mixed_ratio: float = 0.5,
+    engine: str = "auto",
+    carries: tuple[int, int | None] | None = None,
+    carry_columns: Sequence[int] = (),
+    bank: str | Path | None = None,
+    rng: random.Random | np.random.Generator | None = None,
 ) -> list[Problem]:
     """
     Generuje listę Problem zgodnie z trybem:
       addition    : dodawanie z co najmniej jednym przeniesieniem
       subtraction : odejmowanie z co najmniej jedną pożyczką
       mixed       : miks; liczba zadań dodawania = round(n * mixed_ratio)
-    """
-    if not (2 <= max_digits <= 9):
-        raise ValueError("max_digits powinno być w zakresie 2..9.")
-    if mode not in {"addition", "subtraction", "mixed"}:
-        raise ValueError("mode musi być: addition | subtraction | mixed")
-    if mode == "mixed" and not (0.0 <= mixed_ratio <= 1.0):
-        raise ValueError("mixed_ratio musi być w zakresie 0..1")
 
-    if seed is not None:
-        random.seed(seed)
+    engine:
+      python : losowanie po jednej parze (random.randint) – zgodne z wcześniejszymi wersjami
+      numpy  : losowanie paczkami w tablicach NumPy z wektorowym sprawdzaniem przeniesień/pożyczek;
+               dla dużych zestawów wielokrotnie szybsze. Ten sam seed zawsze daje ten sam zestaw
+               (numpy.random.default_rng(seed)), ale inny niż silnik python.
+      digits : budowa a i b cyfra po cyfrze (PairSpace) – przeniesienie/pożyczka jest gwarantowana
+               konstrukcyjnie, bez ponawiania losowań; obsługuje dowolnie długie liczby (max_digits > 9).
+      auto   : python dla max_digits <= 9, w przeciwnym razie digits (domyślnie).
+      counter: tryb licznikowy – lista(ProblemStream(...)); zadanie i zależy tylko od (seed, i, parametry).
+
+    Poziom trudności (tylko silnik digits/auto – losowanie jednostajne spośród par spełniających warunki):
+      carries       : (min, max) liczby przeniesień/pożyczek w zadaniu; max=None – bez górnej granicy.
+                      Domyślnie (1, None), czyli „co najmniej jedno”.
+      carry_columns : kolumny (1 = jedności, 2 = dziesiątki, ...), w których przeniesienie/pożyczka
+                      musi wystąpić.
+    Każdy zwrócony Problem ma wypełnione pole carries.
+
+    unique: pary bez powtórzeń (dodawanie bez względu na kolejność, odejmowanie z zachowaniem
+    kolejności). Zawsze realizowane przez numerowanie par w PairSpace i losową permutację numerów
+    (niezależnie od silnika): koszt O(n) bez ponawiania, a gdy n przekracza liczbę możliwych par,
+    od razu zgłaszany jest ValueError.
+
+    bank: ścieżka do banku zadań (build_bank). Jeśli bank pokrywa parametry, zadania są losowane
+    z niego zapytaniem po indeksie; w przeciwnym razie (także przy carry_columns) działa zwykły silnik.
+
+    Losowość: każde wywołanie korzysta z własnego generatora – przekazanego jako rng
+    (random.Random albo numpy.random.Generator) lub tworzonego z seed. Globalny stan modułu random
+    nie jest używany, więc równoległe wywołania (wątki, asyncio) nie wpływają na siebie.
+    Dla tego samego seed wynik jest identyczny jak we wcześniejszych wersjach (random.seed).
+    """
+    if engine == "counter":
+        return list(
+            ProblemStream(n, min_value, max_digits, unique, seed, mode, mixed_ratio, carries, carry_columns)
+        )
+    engine = _resolve_engine(engine, max_digits, mode, mixed_ratio, unique, carries, carry_columns)
+    min_carries, max_carries = carries if carries is not None else (1, None)
 
     upper = 10 ** max_digits - 1
     target_add = n if mode == "addition" else (0 if mode == "subtraction" else round(n * mixed_ratio))
     target_sub = n - target_add
 
+    py_rng = _python_rng(seed, rng)
+    if engine in {"python", "numpy"}:
+        _check_rejection_sampling(target_add, target_sub, min_value, max_digits)
+
+    if bank is not None and not carry_columns:
+        targets = [(op, count) for op, count in (("+", target_add), ("-", target_sub)) if count > 0]
+        from_bank = _draw_from_bank(
+            bank, targets, min_value, max_digits, min_carries, max_carries, unique, py_rng
+        )
+        if from_bank is not None:
+            if mode == "mixed":
+                py_rng.shuffle(from_bank)
+            return from_bank
+
+    if engine == "numpy":
+        return _generate_problems_numpy(
+            target_add, target_sub, min_value, max_digits, _numpy_rng(seed, rng), shuffle=mode == "mixed"
+        ).to_problems()
+
+    add_space = sub_space = None
+    if engine == "digits":
+        columns = frozenset(carry_columns)
+        if target_add:
+            add_space = _pair_space("+", min_value, max_digits, min_carries, max_carries, columns, unique)
+        if target_sub:
+            sub_space = _pair_space("-", min_value, max_digits, min_carries, max_carries, columns)
+        for space in (add_space, sub_space):
+            if space is not None:
+                _require_pairs(space)
+
     problems: list[Problem] = []
-    seen_add: set[tuple[int, int]] = set()
-    seen_sub: set[tuple[int, int]] = set()
+    add_pairs = add_space.iter_unique(target_add, py_rng) if unique and add_space is not None else None
+    sub_pairs = sub_space.iter_unique(target_sub, py_rng) if unique and sub_space is not None else None
 
     # Dodawanie
     add_count = 0
     while add_count < target_add:
-        a = random.randint(min_value, upper)
-        b = random.randint(min_value, upper)
-        if not has_carry(a, b):
-            continue
-        if unique:
-            key = (a, b) if a <= b else (b, a)
-            if key in seen_add:
+        if add_pairs is not None:
+            a, b = next(add_pairs)
+        elif add_space is not None:
+            a, b = add_space.sample(py_rng)
+        else:
+            a = py_rng.randint(min_value, upper)
+            b = py_rng.randint(min_value, upper)
+            if not has_carry(a, b):
                 continue
-            seen_add.add(key)
-        problems.append(Problem(a, b, op="+"))
+        problems.append(Problem(a, b, "+", count_carries(a, b)))
         add_count += 1
 
     # Odejmowanie
     sub_count = 0
     while sub_count < target_sub:
-        a = random.randint(min_value, upper)
-        b = random.randint(min_value, upper)
-        if a < b:
-            a, b = b, a
-        if not has_borrow(a, b):
-            continue
-        if unique:
-            key = (a, b)
-            if key in seen_sub:
+        if sub_pairs is not None:
+            a, b = next(sub_pairs)
+        elif sub_space is not None:
+            a, b = sub_space.sample(py_rng)
+        else:
+            a = py_rng.randint(min_value, upper)
+            b = py_rng.randint(min_value, upper)
+            if a < b:
+                a, b = b, a
+            if not has_borrow(a, b):
                 continue
-            seen_sub.add(key)
-        problems.append(Problem(a, b, op="-"))
+        problems.append(Problem(a, b, "-", count_borrows(a, b)))
         sub_count += 1
 
     if mode == "mixed":
-        random.shuffle(problems)
+        py_rng.shuffle(problems)
 
     return problems
 
 
+def generate_problem_set(
+    n: int,
+    min_value: int = 12,
+    max_digits: int = 4,
+    unique: bool = False,
+    seed: int | None = None,
+    mode: str = "addition",
+    mixed_ratio: float = 0.5,
+    engine: str = "auto",
+    carries: tuple[int, int | None] | None = None,
+    carry_columns: Sequence[int] = (),
+    bank: str | Path | None = None,
+    rng: random.Random | np.random.Generator | None = None,
+) -> ProblemSet:
+    """
+    Jak generate_problems (te same parametry i ten sam zestaw), ale zwraca zwarty ProblemSet.
+    Silnik numpy (bez banku) buduje tablice bezpośrednio, bez obiektów Problem – szybka i oszczędna
+    pamięciowo ścieżka dla pul z milionami zadań.
+    """
+    resolved = _resolve_engine(engine, max_digits, mode, mixed_ratio, unique, carries, carry_columns)
+    if resolved == "numpy" and bank is None:
+        target_add = n if mode == "addition" else (0 if mode == "subtraction" else round(n * mixed_ratio))
+        _check_rejection_sampling(target_add, n - target_add, min_value, max_digits)
+        return _generate_problems_numpy(
+            target_add, n - target_add, min_value, max_digits, _numpy_rng(seed, rng), shuffle=mode == "mixed"
+        )
+    return ProblemSet.from_problems(
+        generate_problems(
+            n, min_value, max_digits, unique, seed, mode, mixed_ratio, engine, carries, carry_columns, bank, rng
+        )
+    )
+
+
+class ProblemStream(Sequence[Problem]):
+    """
+    Zestaw zadań o dostępie swobodnym (tryb licznikowy, engine="counter").
+
+    Zadanie i jest czystą funkcją (seed, i, parametry): rodzaj działania wynika z losowej permutacji
+    pozycji (w trybie mixed dokładnie round(n * mixed_ratio) dodawań), a para – z numeru w PairSpace
+    (przy unique: numer po permutacji, czyli bez powtórzeń) lub z generatora zasianego (seed, i).
+    Dowolną stronę albo fragment można więc policzyć niezależnie i równolegle, bez liczenia
+    zadań 0..i-1, a wynik zgadza się z pełnym przebiegiem list(ProblemStream(...)).
+    Parametry i gwarancje jak w generate_problems (silnik digits).
+    """
+
+    def __init__(
+        self,
+        n: int,
+        min_value: int = 12,
+        max_digits: int = 4,
+        unique: bool = False,
+        seed: int | None = None,
+        mode: str = "addition",
+        mixed_ratio: float = 0.5,
+        carries: tuple[int, int | None] | None = None,
+        carry_columns: Sequence[int] = (),
+    ) -> None:
+        if max_digits < 2:
+            raise ValueError("max_digits powinno być >= 2.")
+        if mode not in {"addition", "subtraction", "mixed"}:
+            raise ValueError("mode musi być: addition | subtraction | mixed")
+        if mode == "mixed" and not (0.0 <= mixed_ratio <= 1.0):
+            raise ValueError("mixed_ratio musi być w zakresie 0..1")
+        self.n = n
+        self.mode = mode
+        self.unique = unique
+        self.target_add = n if mode == "addition" else (0 if mode == "subtraction" else round(n * mixed_ratio))
+        min_carries, max_carries = carries if carries is not None else (1, None)
+        # Klucze permutacji i strumieni losowych wyprowadzone raz z seed
+        master = random.Random(seed)
+        self._op_key = master.getrandbits(64)
+        self._keys = {"+": master.getrandbits(64), "-": master.getrandbits(64)}
+        self._spaces: dict[str, PairSpace] = {}
+        for op, count in (("+", self.target_add), ("-", n - self.target_add)):
+            if count <= 0:
+                continue
+            space = _pair_space(
+                op, min_value, max_digits, min_carries, max_carries, frozenset(carry_columns), unique and op == "+"
+            )
+            _require_pairs(space)
+            if unique and count > space.count:
+                raise ValueError(
+                    f"Nie da się wygenerować {count} unikalnych zadań '{op}': "
+                    f"przy tych ustawieniach istnieje tylko {space.count} różnych par."
+                )
+            self._spaces[op] = space
+
+    def __len__(self) -> int:
+        return self.n
+
+    @overload
+    def __getitem__(self, index: int) -> Problem: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Problem]: ...
+
+    def __getitem__(self, index: int | slice) -> Problem | list[Problem]:
+        if isinstance(index, slice):
+            return [self._problem_at(i) for i in range(*index.indices(self.n))]
+        if index < 0:
+            index += self.n
+        if not (0 <= index < self.n):
+            raise IndexError("Numer zadania poza zakresem zestawu.")
+        return self._problem_at(index)
+
+    def _problem_at(self, index: int) -> Problem:
+        slot = _permute_index(index, self.n, self._op_key) if self.mode == "mixed" else index
+        if slot < self.target_add:
+            op, rank = "+", slot
+        else:
+            op, rank = "-", slot - self.target_add
+        space = self._spaces[op]
+        key = self._keys[op]
+        rng = random.Random((key << 64) | index)
+        if self.unique:
+            a, b = space.unrank(_permute_index(rank, space.count, key))
+            if space.unordered and rng.random() < 0.5:
+                a, b = b, a
+        else:
+            a, b = space.sample(rng)
+        return Problem(a, b, op, count_carries(a, b) if op == "+" else count_borrows(a, b))
+
+
 # --- Formatowanie tekstu zadania --- #
 def format_problem(a: int, b: int, width: int, op: str) -> Tuple[str, str, str]:
     """
@@ -238,80 +1180,233 @@ def infer_width(problems: Sequence[Problem]) -> int:
     """
     Określa ile znaków potrzeba do wyrównywania (na podstawie największego składnika).
     """
+    if isinstance(problems, ProblemSet):
+        return problems.width()
     max_val = max(max(p.a, p.b) for p in problems)
     return len(str(max_val))
 
 
-# --- Rysowanie stron --- #
-def draw_page(
-    problems: Sequence[Problem],
-    title: str,
-    page_index: int,
-    cols: int,
-    rows: int,
-    figsize: Tuple[float, float],
-    start_number: int,
-    *,
-    problem_fontsize: int,
-    number_fontsize: int,
-    title_fontsize: int,
-    subtitle_fontsize: int,
-    show_subtitle: bool,
-    answer_lines: int,
-    answer_line_spacing: float,
-    answer_line_width: float,
-    answer_line_color: str,
-    answer_line_thickness: float,
-    compact_layout: bool,
-    answer_line_spacing_mm: float,
-    addition_gap_mm: float,
-    post_bar_gap_factor: float,
-    operation_bar_style: str,
-    result_guide_style: str,
-    result_guide_color: str,
-    result_guide_thickness: float,
-    digit_guides: bool,
-    digit_guides_color: str,
-    digit_guides_alpha: float,
-    number_color: str,
-    hide_numbers: bool,
-) -> Figure:
+# --- Tryb glifów: tekst monospace jako gotowe ścieżki --- #
+TEXT_MODES = ("text", "glyphs")
+
+
+@cache
+def _mono_font(size: float) -> FontProperties:
+    from matplotlib.font_manager import FontProperties
+
+    return FontProperties(family="monospace", size=size)
+
+
+@cache
+def _mono_metrics(size: float) -> tuple[float, float]:
     """
-    Rysuje pojedynczą stronę z siatką zadań.
+    Zwraca (szerokość znaku, wysokość nad linią bazową) czcionki monospace w punktach.
 
-    answer_line_spacing – wielkość w jednostkach osi (0..1) jeśli > 0.
-    answer_line_spacing_mm – jeżeli > 0, ignoruje answer_line_spacing i używa wartości w milimetrach.
-    addition_gap_mm – jeżeli > 0, pionowy odstęp między pierwszym (a) i drugim (b) składnikiem w mm.
-    post_bar_gap_factor – mnożnik zwiększający odstęp między kreską a pierwszą linią odpowiedzi.
-    Gdy answer_line_spacing <= 0 i answer_line_spacing_mm <= 0, odstęp jest wyliczany automatycznie
-    tak, aby linie wypełniły dostępne miejsce i na siebie nie nachodziły.
+    Wysokość odpowiada temu, jak ax.text(va="top") ustawia linię bazową, więc zadania
+    w trybie glifów stoją dokładnie tam, gdzie w trybie tekstowym.
     """
-    fig = plt.figure(figsize=figsize)
-    ax = fig.add_axes([0, 0, 1, 1])
-    ax.axis("off")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.textpath import TextPath
 
-    digits = infer_width(problems)
-    if show_subtitle:
-        subtitle = f"Dodawanie sposobem pisemnym (do {digits} cyfr) — każde zadanie ma przeniesienie."
-    else:
-        subtitle = ""
+    prop = _mono_font(size)
+    advance = TextPath((0, 0), "00", prop=prop).get_extents().x1 - TextPath((0, 0), "0", prop=prop).get_extents().x1
+    fig = Figure(dpi=72)
+    renderer = FigureCanvasAgg(fig).get_renderer()
+    probe = fig.text(0, 0, "0123456789+-=_.[]p", fontproperties=prop, va="baseline")
+    ascent = probe.get_window_extent(renderer).y1
+    return advance, ascent
 
-    # Górne tytuły
-    ax.text(
-        0.5,
-        0.965,
-        title,
-        ha="center",
-        va="top",
-        fontsize=title_fontsize,
-        fontweight="bold",
-    )
-    if show_subtitle:
-        ax.text(0.5, 0.94, subtitle, ha="center", va="top", fontsize=subtitle_fontsize)
 
-    # Marginesy (osie w norm. współrzędnych 0..1)
-    left = 0.08
-    right = 0.92
+@lru_cache(maxsize=1024)
+def _glyph_path(char: str, size: float) -> MplPath:
+    """Kontur pojedynczego znaku (punkty, linia bazowa w y=0), liczony raz na znak i rozmiar."""
+    from matplotlib.textpath import TextPath
+
+    return TextPath((0, 0), char, prop=_mono_font(size))
+
+
+@lru_cache(maxsize=8192)
+def _text_path(text: str, size: float) -> MplPath | None:
+    """
+    Składa napis ze ścieżek glifów z pamięci podręcznej; (0, 0) to lewy górny róg jak
+    przy ax.text(ha="left", va="top"). Zwraca None dla napisu złożonego z samych spacji.
+    """
+    from matplotlib.path import Path as MplPath
+    from matplotlib.transforms import Affine2D
+
+    advance, ascent = _mono_metrics(size)
+    glyphs = [
+        _glyph_path(ch, size).transformed(Affine2D().translate(i * advance, -ascent))
+        for i, ch in enumerate(text)
+        if not ch.isspace()
+    ]
+    return MplPath.make_compound_path(*glyphs) if glyphs else None
+
+
+def _add_glyph_runs(ax: Axes, runs: dict[tuple[float, str], list[tuple[float, float, str]]]) -> None:
+    """
+    Dodaje napisy zebrane jako {(rozmiar, kolor): [(x, y, tekst), ...]} – jedna PathCollection
+    na styl. Pozycje są w jednostkach osi, kształty w punktach (niezależnie od DPI zapisu).
+    """
+    from matplotlib.collections import PathCollection
+    from matplotlib.transforms import Affine2D
+
+    glyph_transform = Affine2D().scale(1 / 72) + ax.get_figure().dpi_scale_trans
+    for (size, color), items in runs.items():
+        paths, offsets = [], []
+        for x, y, text in items:
+            path = _text_path(text, size)
+            if path is not None:
+                paths.append(path)
+                offsets.append((x, y))
+        if not paths:
+            continue
+        collection = PathCollection(
+            paths,
+            offsets=offsets,
+            offset_transform=ax.transData,
+            transform=glyph_transform,
+            facecolors=color,
+            edgecolors="none",
+            linewidths=0,
+            zorder=3,
+        )
+        # Napisy nie wpływają na zakres osi (tak jak obiekty Text)
+        ax.add_collection(collection, autolim=False)
+
+
+# --- Opis strony niezależny od backendu --- #
+Segment = Tuple[Tuple[float, float], Tuple[float, float]]
+
+
+@dataclass(frozen=True)
+class _Text:
+    """Napis strony w jednostkach osi (jak argumenty ax.text)."""
+
+    x: float
+    y: float
+    text: str
+    size: float
+    ha: str = "left"
+    va: str = "top"
+    mono: bool = False
+    bold: bool = False
+    color: str | None = None
+    alpha: float | None = None
+    # Element stały strony (nie zależy od zadań na niej) – trafia do wspólnego szablonu PDF
+    static: bool = False
+
+
+@dataclass(frozen=True)
+class _Lines:
+    """Grupa odcinków o wspólnym stylu (jedna LineCollection / jeden blok w strumieniu PDF)."""
+
+    segments: Tuple[Segment, ...]
+    color: str
+    width: float
+    alpha: float | None
+    capstyle: str
+
+
+@dataclass(frozen=True)
+class _PageSpec:
+    """
+    Kompletny opis strony: napisy, kreski i zakres osi. Rysują go zarówno Matplotlib
+    (_render_figure), jak i natywny zapis PDF (_native_page_content), więc oba backendy
+    mają ten sam układ.
+    """
+
+    figsize: Tuple[float, float]
+    texts: Tuple[_Text, ...]
+    lines: Tuple[_Lines, ...]
+    xlim: Tuple[float, float] = (0.0, 1.0)
+    ylim: Tuple[float, float] = (0.0, 1.0)
+
+
+def _autoscale_limits(lo: float, hi: float, margin: float = 0.05) -> Tuple[float, float]:
+    """Zakres osi, jaki Matplotlib wylicza z danych (nonsingular + margines 5%)."""
+    if hi - lo < 1e-12:
+        if hi == 0:
+            lo, hi = -margin, margin
+        else:
+            lo, hi = lo - margin * abs(lo), hi + margin * abs(hi)
+    delta = (hi - lo) * margin
+    return lo - delta, hi + delta
+
+
+@dataclass(frozen=True)
+class PageLayout:
+    """
+    Geometria strony z siatką zadań w jednostkach osi (0..1), wyliczona raz dla danej
+    konfiguracji (siatka, papier, szerokość liczb, styl) i wspólna dla wszystkich stron.
+
+    Pola per-komórka to krotki długości cols*rows (kolejność wierszami, od lewej górnej
+    komórki): punkty zaczepienia numeru, składników i kresek, końce kresek oraz x prowadnic
+    cyfr i y linii odpowiedzi dla każdej komórki.
+    """
+
+    cols: int
+    rows: int
+    figsize: Tuple[float, float]
+    digits: int
+    cell_w: float
+    cell_h: float
+    line_gap: float
+    number_x: Tuple[float, ...]
+    number_y: Tuple[float, ...]
+    text_x: Tuple[float, ...]
+    a_y: Tuple[float, ...]
+    b_y: Tuple[float, ...]
+    bar_y: Tuple[float, ...]
+    result_y: Tuple[float, ...]
+    underline_y: Tuple[float, ...]
+    line_x1: Tuple[float, ...]
+    guide_x: Tuple[Tuple[float, ...], ...]
+    guide_y0: Tuple[float, ...]
+    guide_y1: Tuple[float, ...]
+    answer_y: Tuple[Tuple[float, ...], ...]
+
+    @property
+    def cells(self) -> int:
+        return self.cols * self.rows
+
+    def to_dict(self) -> dict[str, object]:
+        """Układ jako słownik z listami (np. do json.dumps w testach i porównaniach)."""
+        return {
+            name: [list(v) if isinstance(v, tuple) else v for v in value] if isinstance(value, tuple) else value
+            for name, value in vars(self).items()
+        }
+
+
+# Pola PageLayout wspólne dla całej strony (pozostałe są per-komórka)
+_LAYOUT_SCALARS = frozenset({"cols", "rows", "figsize", "digits", "cell_w", "cell_h", "line_gap"})
+
+
+@lru_cache(maxsize=64)
+def page_layout(
+    cols: int,
+    rows: int,
+    figsize: Tuple[float, float],
+    digits: int,
+    *,
+    compact_layout: bool = False,
+    show_subtitle: bool = True,
+    addition_gap_mm: float = 0.0,
+    post_bar_gap_factor: float = 1.0,
+    answer_line_width: float = 0.8,
+    answer_lines: int = 0,
+    answer_line_spacing: float = 0.0,
+    answer_line_spacing_mm: float = 0.0,
+) -> PageLayout:
+    """
+    Wylicza (i zapamiętuje) PageLayout dla konfiguracji strony – koszt O(cols*rows) raz na
+    konfigurację, a nie na stronę. Parametry jak w draw_page; digits – szerokość liczb
+    (infer_width) wyznaczająca liczbę prowadnic cyfr.
+    """
+    # Marginesy (osie w norm. współrzędnych 0..1)
+    left = 0.08
+    right = 0.92
     if compact_layout:
         top = 0.885 if show_subtitle else 0.93
     else:
@@ -320,7 +1415,6 @@ def draw_page(
 
     cell_w = (right - left) / cols
     cell_h = (top - bottom) / rows
-    width = digits
 
     # Wysokość figury w mm (dla przeliczenia spacing_mm i addition_gap_mm)
     fig_height_mm = figsize[1] * 25.4
@@ -340,30 +1434,13 @@ def draw_page(
     else:
         line_gap = default_line_gap
 
-    for idx, problem in enumerate(problems):
+    cells: dict[str, list] = {name: [] for name in PageLayout.__dataclass_fields__ if name not in _LAYOUT_SCALARS}
+    for idx in range(cols * rows):
         r = idx // cols
         c = idx % cols
-        if r >= rows:
-            break
-
-        top_s, mid_s, line_s = format_problem(problem.a, problem.b, width, problem.op)
-
         x0 = left + c * cell_w
         y0 = top - r * cell_h  # górna krawędź komórki
 
-        number = start_number + idx
-        if not hide_numbers:
-            ax.text(
-                x0 + 0.005 * cell_w,
-                y0 - 0.03 * cell_h,
-                f"{number}.",
-                ha="left",
-                va="top",
-                fontsize=number_fontsize,
-                color=number_color,
-                alpha=0.65 if number_color.lower() in {"#666666", "#777777", "#888888", "grey", "gray"} else 1.0,
-            )
-
         # Pozycje linii dodawania
         text_x = x0 + 0.17 * cell_w
         a_y = y0 - offset_text_top
@@ -373,68 +1450,249 @@ def draw_page(
         # Zwiększamy dystans między kreską a obszarem odpowiedzi (konfigurowalny mnożnik)
         first_answer_gap = line_gap * post_bar_gap_factor
         base_answer_y = bar_y - first_answer_gap
+        # Pozycja linii wyniku w połowie przerwy między kreską a pierwszą linią odpowiedzi.
+        result_y = bar_y - (line_gap * 0.5)
+        span_w = cell_w * answer_line_width
 
-        ax.text(
-            text_x,
-            a_y,
-            top_s,
-            ha="left",
-            va="top",
-            fontsize=problem_fontsize,
-            family="monospace",
-        )
-        ax.text(
-            text_x,
-            b_y,
-            mid_s,
-            ha="left",
-            va="top",
-            fontsize=problem_fontsize,
-            family="monospace",
+        cells["number_x"].append(x0 + 0.005 * cell_w)
+        cells["number_y"].append(y0 - 0.03 * cell_h)
+        cells["text_x"].append(text_x)
+        cells["a_y"].append(a_y)
+        cells["b_y"].append(b_y)
+        cells["bar_y"].append(bar_y)
+        cells["result_y"].append(result_y)
+        cells["underline_y"].append(result_y + 0.01 * cell_h)
+        cells["line_x1"].append(text_x + span_w)
+        # Pionowe prowadnice cyfr - jedna na środku każdej kolumny cyfr
+        cells["guide_x"].append(tuple(text_x + (i + 0.5) * (span_w / max(digits, 1)) for i in range(digits)))
+        cells["guide_y0"].append(bar_y - line_gap * 0.2)
+        cells["guide_y1"].append(result_y + line_gap * 0.2)
+        cells["answer_y"].append(
+            _answer_line_ys(
+                base_answer_y,
+                y0 - cell_h + 0.030 * cell_h,  # dno obszaru na odpowiedzi
+                cell_h,
+                fig_height_mm,
+                answer_lines,
+                answer_line_spacing,
+                answer_line_spacing_mm,
+            )
         )
-        if operation_bar_style == "ascii":
-            ax.text(
-                text_x,
-                bar_y,
-                line_s,
-                ha="left",
-                va="top",
-                fontsize=problem_fontsize,
-                family="monospace",
+
+    return PageLayout(
+        cols=cols,
+        rows=rows,
+        figsize=figsize,
+        digits=digits,
+        cell_w=cell_w,
+        cell_h=cell_h,
+        line_gap=line_gap,
+        **{name: tuple(values) for name, values in cells.items()},
+    )
+
+
+def _answer_line_ys(
+    base_answer_y: float,
+    bottom_limit: float,
+    cell_h: float,
+    fig_height_mm: float,
+    answer_lines: int,
+    answer_line_spacing: float,
+    answer_line_spacing_mm: float,
+) -> Tuple[float, ...]:
+    """Wysokości linii odpowiedzi w komórce (z obcięciem, jeśli zabraknie miejsca)."""
+    if answer_lines <= 0:
+        return ()
+    available_space = base_answer_y - bottom_limit
+    if available_space <= 0:
+        return ()  # brak miejsca, pomijamy
+
+    # Wylicz spacing
+    if answer_line_spacing_mm > 0:
+        # przeliczenie mm na jednostki osi
+        spacing = (answer_line_spacing_mm / fig_height_mm)
+        # ograniczenia
+        spacing = max(spacing, 0.02 * cell_h)
+    elif answer_line_spacing > 0:
+        spacing = answer_line_spacing
+    else:
+        # Automatyczne: rozkład równomierny między górą a dołem
+        if answer_lines == 1:
+            spacing = available_space * 0.5  # pojedyncza linia pośrodku
+        else:
+            spacing = available_space / (answer_lines - 1)
+        # Minimalne i maksymalne widełki
+        min_spacing = 0.038 * cell_h
+        max_spacing = 0.070 * cell_h
+        if spacing < min_spacing:
+            spacing = min_spacing
+        elif spacing > max_spacing:
+            spacing = max_spacing
+
+    ys: list[float] = []
+    for li in range(answer_lines):
+        y_line = base_answer_y - li * spacing
+        if y_line < bottom_limit:
+            break
+        ys.append(y_line)
+    return tuple(ys)
+
+
+_COLUMN_NAMES = ("jedności", "dziesiątek", "setek", "tysięcy")
+
+
+def _carries_noun(count: int) -> str:
+    """Odmiana po liczebniku: 1 przeniesienie, 2–4 przeniesienia, 5 (i 12–14) przeniesień."""
+    if count == 1:
+        return "przeniesienie"
+    if count % 10 in (2, 3, 4) and count % 100 not in (12, 13, 14):
+        return "przeniesienia"
+    return "przeniesień"
+
+
+def _subtitle(digits: int, carries: tuple[int, int | None] | None, carry_columns: Sequence[int]) -> str:
+    """Podtytuł strony opisujący poziom trudności zgodnie z carries / carry_columns generatora."""
+    lo, hi = carries if carries is not None else (1, None)
+    lo = max(lo, len(carry_columns))
+    if hi == 0:
+        rule = "zadania bez przeniesienia"
+    elif hi is None:
+        if lo == 0:
+            rule = "zadania z przeniesieniem i bez przeniesienia"
+        elif lo == 1:
+            rule = "każde zadanie ma przeniesienie"
+        else:
+            rule = f"każde zadanie ma co najmniej {lo} {_carries_noun(lo)}"
+    elif lo == hi:
+        rule = f"każde zadanie ma dokładnie {lo} {_carries_noun(lo)}"
+    elif lo == 0:
+        rule = f"każde zadanie ma najwyżej {hi} {_carries_noun(hi)}"
+    else:
+        rule = f"każde zadanie ma od {lo} do {hi} przeniesień"
+    if carry_columns:
+        names = [_COLUMN_NAMES[c - 1] if c <= len(_COLUMN_NAMES) else f"nr {c}" for c in carry_columns]
+        joined = names[0] if len(names) == 1 else ", ".join(names[:-1]) + " i " + names[-1]
+        rule += f", zawsze w {'kolumnie' if len(names) == 1 else 'kolumnach'} {joined}"
+    return f"Dodawanie sposobem pisemnym (do {digits} cyfr) — {rule}."
+
+
+def _page_spec(
+    problems: Sequence[Problem],
+    title: str,
+    page_index: int,
+    cols: int,
+    rows: int,
+    figsize: Tuple[float, float],
+    start_number: int,
+    *,
+    problem_fontsize: int,
+    number_fontsize: int,
+    title_fontsize: int,
+    subtitle_fontsize: int,
+    show_subtitle: bool,
+    answer_lines: int,
+    answer_line_spacing: float,
+    answer_line_width: float,
+    answer_line_color: str,
+    answer_line_thickness: float,
+    compact_layout: bool,
+    answer_line_spacing_mm: float,
+    addition_gap_mm: float,
+    post_bar_gap_factor: float,
+    operation_bar_style: str,
+    result_guide_style: str,
+    result_guide_color: str,
+    result_guide_thickness: float,
+    digit_guides: bool,
+    digit_guides_color: str,
+    digit_guides_alpha: float,
+    number_color: str,
+    hide_numbers: bool,
+    autoscale: bool = True,
+    carries: tuple[int, int | None] | None = None,
+    carry_columns: Sequence[int] = (),
+) -> _PageSpec:
+    """
+    Układ strony z siatką zadań (parametry jak w draw_page).
+    """
+    texts: list[_Text] = []
+
+    digits = infer_width(problems)
+    subtitle = _subtitle(digits, carries, carry_columns) if show_subtitle else ""
+
+    # Górne tytuły
+    texts.append(_Text(0.5, 0.965, title, title_fontsize, ha="center", bold=True, static=True))
+    if show_subtitle:
+        texts.append(_Text(0.5, 0.94, subtitle, subtitle_fontsize, ha="center", static=True))
+
+    width = digits
+    layout = page_layout(
+        cols,
+        rows,
+        tuple(figsize),
+        digits,
+        compact_layout=compact_layout,
+        show_subtitle=show_subtitle,
+        addition_gap_mm=addition_gap_mm,
+        post_bar_gap_factor=post_bar_gap_factor,
+        answer_line_width=answer_line_width,
+        answer_lines=answer_lines,
+        answer_line_spacing=answer_line_spacing,
+        answer_line_spacing_mm=answer_line_spacing_mm,
+    )
+
+    # Odcinki zbierane w trakcie pętli i rysowane na końcu jako kilka grup (jedna na styl)
+    # zamiast osobnego obiektu dla każdej kreski.
+    guide_segments: list[Segment] = []
+    digit_segments: list[Segment] = []
+    answer_segments: list[Segment] = []
+    number_alpha = 0.65 if number_color.lower() in {"#666666", "#777777", "#888888", "grey", "gray"} else 1.0
+    underline_str = "  " + "_" * width
+
+    for idx, problem in enumerate(problems):
+        if idx >= layout.cells:
+            break
+
+        top_s, mid_s, line_s = format_problem(problem.a, problem.b, width, problem.op)
+        text_x = layout.text_x[idx]
+        bar_y = layout.bar_y[idx]
+        line_x1 = layout.line_x1[idx]
+
+        if not hide_numbers:
+            texts.append(
+                _Text(
+                    layout.number_x[idx],
+                    layout.number_y[idx],
+                    f"{start_number + idx}.",
+                    number_fontsize,
+                    color=number_color,
+                    alpha=number_alpha,
+                )
             )
+
+        texts.append(_Text(text_x, layout.a_y[idx], top_s, problem_fontsize, mono=True))
+        texts.append(_Text(text_x, layout.b_y[idx], mid_s, problem_fontsize, mono=True))
+        if operation_bar_style == "ascii":
+            texts.append(_Text(text_x, bar_y, line_s, problem_fontsize, mono=True, static=True))
         elif operation_bar_style == "vector":
-            ax.plot(
-                [text_x, text_x + (cell_w * answer_line_width)],
-                [bar_y, bar_y],
-                color=result_guide_color,
-                linewidth=result_guide_thickness,
-                solid_capstyle="round",
-            )
+            guide_segments.append(((text_x, bar_y), (line_x1, bar_y)))
         # 'none' -> pomijamy kreskę całkowicie
 
         # --- Rezultat: wskazanie miejsca na wynik ---
-        # Pozycja linii wyniku w połowie przerwy między kreską a pierwszą linią odpowiedzi.
-        result_y = bar_y - (line_gap * 0.5)
-
         if result_guide_style == "line":
-            ax.plot(
-                [text_x, text_x + cell_w * answer_line_width],
-                [result_y, result_y],
-                color=result_guide_color,
-                linewidth=result_guide_thickness,
-                solid_capstyle="round",
-            )
+            result_y = layout.result_y[idx]
+            guide_segments.append(((text_x, result_y), (line_x1, result_y)))
         elif result_guide_style == "underline":
-            underline_str = "  " + "_" * width
-            ax.text(
-                text_x,
-                result_y + 0.01 * cell_h,
-                underline_str,
-                ha="left",
-                va="top",
-                fontsize=problem_fontsize,
-                family="monospace",
-                color=result_guide_color,
+            texts.append(
+                _Text(
+                    text_x,
+                    layout.underline_y[idx],
+                    underline_str,
+                    problem_fontsize,
+                    mono=True,
+                    color=result_guide_color,
+                    static=True,
+                )
             )
         elif result_guide_style == "none":
             # Brak dodatkowego oznaczenia miejsca na wynik
@@ -442,105 +1700,65 @@ def draw_page(
 
         # Opcjonalne pionowe prowadnice cyfr (digit guides) - delikatne linie
         if digit_guides and result_guide_style != "boxes":
-            span_w = cell_w * answer_line_width
-            for i in range(width):
-                guide_x = text_x + (i + 0.5) * (span_w / max(width, 1))
-                ax.plot(
-                    [guide_x, guide_x],
-                    [bar_y - line_gap * 0.2, result_y + line_gap * 0.2],
-                    color=digit_guides_color,
-                    alpha=digit_guides_alpha,
-                    linewidth=0.6,
-                )
+            y0, y1 = layout.guide_y0[idx], layout.guide_y1[idx]
+            digit_segments.extend(((gx, y0), (gx, y1)) for gx in layout.guide_x[idx])
 
         # Linie odpowiedzi
-        if answer_lines <= 0:
-            continue
-
-        # Szerokość linii
-        line_start_x = text_x
-        usable_w = cell_w * answer_line_width
-
-        bottom_limit = y0 - cell_h + 0.030 * cell_h  # dno obszaru na odpowiedzi
-        available_space = base_answer_y - bottom_limit
-        if available_space <= 0:
-            continue  # brak miejsca, pomijamy
-
-        # Wylicz spacing
-        if answer_line_spacing_mm > 0:
-            # przeliczenie mm na jednostki osi
-            spacing = (answer_line_spacing_mm / fig_height_mm)
-            # ograniczenia
-            spacing = max(spacing, 0.02 * cell_h)
-        elif answer_line_spacing > 0:
-            spacing = answer_line_spacing
-        else:
-            # Automatyczne: rozkład równomierny między górą a dołem
-            if answer_lines == 1:
-                spacing = available_space * 0.5  # pojedyncza linia pośrodku
-            else:
-                spacing = available_space / (answer_lines - 1)
-            # Minimalne i maksymalne widełki
-            min_spacing = 0.038 * cell_h
-            max_spacing = 0.070 * cell_h
-            if spacing < min_spacing:
-                spacing = min_spacing
-            elif spacing > max_spacing:
-                spacing = max_spacing
-
-        # Rysowanie linii z obcięciem jeśli zabraknie miejsca
-        for li in range(answer_lines):
-            y_line = base_answer_y - li * spacing
-            if y_line < bottom_limit:
-                break
-            ax.plot(
-                [line_start_x, line_start_x + usable_w],
-                [y_line, y_line],
-                color=answer_line_color,
-                linewidth=answer_line_thickness,
-                solid_capstyle="round",
-            )
+        answer_segments.extend(((text_x, y), (line_x1, y)) for y in layout.answer_y[idx])
 
     # Stopka
-    ax.text(
-        0.5,
-        0.02,
-        f"Strona {page_index}",
-        ha="center",
-        va="bottom",
-        fontsize=9,
-        alpha=0.7,
-    )
+    texts.append(_Text(0.5, 0.02, f"Strona {page_index}", 9, va="bottom", ha="center", alpha=0.7))
 
-    return fig
+    # Style zakończeń odpowiadają dawnym Line2D: "round" tam, gdzie był solid_capstyle,
+    # domyślny "projecting" dla prowadnic cyfr.
+    groups = [
+        (guide_segments, result_guide_color, result_guide_thickness, None, "round"),
+        (digit_segments, digit_guides_color, 0.6, digit_guides_alpha, "projecting"),
+        (answer_segments, answer_line_color, answer_line_thickness, None, "round"),
+    ]
+    lines = tuple(_Lines(tuple(seg), color, lw, alpha, cap) for seg, color, lw, alpha, cap in groups if seg)
+    if not lines or not autoscale:
+        return _PageSpec(figsize, tuple(texts), lines)
+
+    # Kreski przeskalowują osie do zakresu danych (jak ax.plot/autoscale w Matplotlib)
+    xs = [x for group in lines for seg in group.segments for x, _ in seg]
+    ys = [y for group in lines for seg in group.segments for _, y in seg]
+    return _PageSpec(
+        figsize,
+        tuple(texts),
+        lines,
+        xlim=_autoscale_limits(min(xs), max(xs)),
+        ylim=_autoscale_limits(min(ys), max(ys)),
+    )
 
 
-def draw_answers_page(
+def _answers_spec(
     problems: Sequence[Problem],
     title: str,
     figsize: Tuple[float, float],
     *,
     title_fontsize: int,
-) -> Figure:
+    show_carries: bool = False,
+    start_number: int = 1,
+    cols: int = 2,
+    rows: int | None = None,
+    page: int = 1,
+    pages: int = 1,
+) -> _PageSpec:
     """
-    Generuje stronę z odpowiedziami (uwzględnia operator + / -).
+    Układ strony z odpowiedziami (parametry jak w draw_answers_page).
+
+    rows – wierszy w kolumnie (domyślnie tyle, by zmieścić wszystkie zadania); page/pages –
+    numer strony klucza i liczba jego stron (dopisywane do podtytułu, gdy stron jest więcej).
     """
-    fig = plt.figure(figsize=figsize)
-    ax = fig.add_axes([0, 0, 1, 1])
-    ax.axis("off")
-    ax.text(
-        0.5,
-        0.965,
-        title,
-        ha="center",
-        va="top",
-        fontsize=title_fontsize,
-        fontweight="bold",
-    )
-    ax.text(0.5, 0.94, "Odpowiedzi", ha="center", va="top", fontsize=12)
+    subtitle = "Odpowiedzi" if pages == 1 else f"Odpowiedzi ({page}/{pages})"
+    texts = [
+        _Text(0.5, 0.965, title, title_fontsize, ha="center", bold=True, static=True),
+        _Text(0.5, 0.94, subtitle, 12, ha="center", static=True),
+    ]
 
-    cols = 2
-    rows = int(math.ceil(len(problems) / cols))
+    if rows is None:
+        rows = int(math.ceil(len(problems) / cols))
     left = 0.08
     right = 0.92
     top = 0.90
@@ -553,30 +1771,70 @@ def draw_answers_page(
         c = idx // rows
         x = left + c * col_w
         y = top - r * row_h
-        s = f"{idx+1:>3}. {pr.a} {pr.op} {pr.b} = {pr.answer()}"
-        ax.text(
-            x,
-            y - 0.02,
-            s,
-            ha="left",
-            va="top",
-            fontsize=11,
-            family="monospace",
-        )
+        s = f"{start_number + idx:>3}. {pr.a} {pr.op} {pr.b} = {pr.answer()}"
+        if show_carries and pr.carries is not None:
+            s += f"  [p={pr.carries}]"
+        texts.append(_Text(x, y - 0.02, s, 11, mono=True))
+
+    return _PageSpec(figsize, tuple(texts), ())
+
+
+# --- Rysowanie stron (Matplotlib) --- #
+def _render_figure(spec: _PageSpec, text_mode: str = "text") -> Figure:
+    """
+    Rysuje opis strony jako figurę Matplotlib (osie na całą stronę, bez ramek).
+
+    Figura jest samodzielna (płótno PDF, bez pyplot), więc nie trafia do globalnego menedżera
+    figur: nie trzeba jej zamykać, a strony można rysować równolegle w wątkach.
+    """
+    import matplotlib
+    from matplotlib.backends.backend_pdf import FigureCanvasPdf
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec.figsize)
+    FigureCanvasPdf(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.axis("off")
+
+    glyph_runs: dict[tuple[float, str], list[tuple[float, float, str]]] = {}
+    for t in spec.texts:
+        if t.mono and text_mode == "glyphs":
+            key = (t.size, t.color or matplotlib.rcParams["text.color"])
+            glyph_runs.setdefault(key, []).append((t.x, t.y, t.text))
+            continue
+        kwargs: dict[str, object] = {}
+        if t.mono:
+            kwargs["family"] = "monospace"
+        if t.bold:
+            kwargs["fontweight"] = "bold"
+        ax.text(t.x, t.y, t.text, ha=t.ha, va=t.va, fontsize=t.size, color=t.color, alpha=t.alpha, **kwargs)
 
+    for group in spec.lines:
+        ax.add_collection(
+            LineCollection(
+                group.segments,
+                colors=group.color,
+                linewidths=group.width,
+                alpha=group.alpha,
+                capstyle=group.capstyle,
+                zorder=2,
+            )
+        )
+    ax.set_xlim(*spec.xlim)
+    ax.set_ylim(*spec.ylim)
+    _add_glyph_runs(ax, glyph_runs)
     return fig
 
 
-# --- Budowa PDF --- #
-def build_pdf(
+def draw_page(
     problems: Sequence[Problem],
-    output_path: Path,
+    title: str,
+    page_index: int,
     cols: int,
     rows: int,
-    include_answers: bool,
-    paper: str,
-    custom_size: Tuple[float, float] | None,
-    title: str,
+    figsize: Tuple[float, float],
+    start_number: int,
     *,
     problem_fontsize: int,
     number_fontsize: int,
@@ -601,78 +1859,1713 @@ def build_pdf(
     digit_guides_alpha: float,
     number_color: str,
     hide_numbers: bool,
-) -> None:
+    text_mode: str = "text",
+    autoscale: bool = True,
+    carries: tuple[int, int | None] | None = None,
+    carry_columns: Sequence[int] = (),
+) -> Figure:
     """
-    Tworzy dokument PDF zawierający karty pracy i (opcjonalnie) stronę z odpowiedziami.
+    Rysuje pojedynczą stronę z siatką zadań.
+
+    answer_line_spacing – wielkość w jednostkach osi (0..1) jeśli > 0.
+    answer_line_spacing_mm – jeżeli > 0, ignoruje answer_line_spacing i używa wartości w milimetrach.
+    addition_gap_mm – jeżeli > 0, pionowy odstęp między pierwszym (a) i drugim (b) składnikiem w mm.
+    post_bar_gap_factor – mnożnik zwiększający odstęp między kreską a pierwszą linią odpowiedzi.
+    Gdy answer_line_spacing <= 0 i answer_line_spacing_mm <= 0, odstęp jest wyliczany automatycznie
+    tak, aby linie wypełniły dostępne miejsce i na siebie nie nachodziły.
+    text_mode – "glyphs" rysuje składniki (i kreski ascii/underline) ze ścieżek glifów
+    zamiast osobnych obiektów tekstowych; "text" (domyślnie) – zwykłe ax.text.
+    autoscale – kreski rozciągają zakres osi do swoich końców (jak ax.plot; dotychczasowy wygląd
+    przy bbox "tight"); False – osie 0..1, układ mieści się w marginesach strony ("fixed").
+    carries / carry_columns – ustawienia generatora (jak w generate_problems) opisane w podtytule.
     """
-    if paper.lower() == "a4":
-        figsize = (8.27, 11.69)
-    elif paper.lower() == "letter":
-        figsize = (8.5, 11.0)
-    elif paper.lower() == "custom":
-        if not custom_size:
-            raise ValueError("Dla 'custom' trzeba podać custom_size.")
-        figsize = custom_size
-    else:
-        raise ValueError("Nieznany format papieru (użyj: A4, Letter, custom).")
+    spec = _page_spec(
+        problems,
+        title,
+        page_index,
+        cols,
+        rows,
+        figsize,
+        start_number,
+        problem_fontsize=problem_fontsize,
+        number_fontsize=number_fontsize,
+        title_fontsize=title_fontsize,
+        subtitle_fontsize=subtitle_fontsize,
+        show_subtitle=show_subtitle,
+        answer_lines=answer_lines,
+        answer_line_spacing=answer_line_spacing,
+        answer_line_width=answer_line_width,
+        answer_line_color=answer_line_color,
+        answer_line_thickness=answer_line_thickness,
+        compact_layout=compact_layout,
+        answer_line_spacing_mm=answer_line_spacing_mm,
+        addition_gap_mm=addition_gap_mm,
+        post_bar_gap_factor=post_bar_gap_factor,
+        operation_bar_style=operation_bar_style,
+        result_guide_style=result_guide_style,
+        result_guide_color=result_guide_color,
+        result_guide_thickness=result_guide_thickness,
+        digit_guides=digit_guides,
+        digit_guides_color=digit_guides_color,
+        digit_guides_alpha=digit_guides_alpha,
+        number_color=number_color,
+        hide_numbers=hide_numbers,
+        autoscale=autoscale,
+        carries=carries,
+        carry_columns=carry_columns,
+    )
+    return _render_figure(spec, text_mode)
 
-    per_page = cols * rows
-    total = len(problems)
-    pages = math.ceil(total / per_page)
-
-    with PdfPages(output_path) as pdf:
-        for p in range(pages):
-            start = p * per_page
-            chunk = problems[start : start + per_page]
-            fig = draw_page(
-                chunk,
-                title=title,
-                page_index=p + 1,
-                cols=cols,
-                rows=rows,
-                figsize=figsize,
-                start_number=start + 1,
-                problem_fontsize=problem_fontsize,
-                number_fontsize=number_fontsize,
-                title_fontsize=title_fontsize,
-                subtitle_fontsize=subtitle_fontsize,
-                show_subtitle=show_subtitle,
-                answer_lines=answer_lines,
-                answer_line_spacing=answer_line_spacing,
-                answer_line_width=answer_line_width,
-                answer_line_color=answer_line_color,
-                answer_line_thickness=answer_line_thickness,
-                compact_layout=compact_layout,
-                answer_line_spacing_mm=answer_line_spacing_mm,
-                addition_gap_mm=addition_gap_mm,
-                post_bar_gap_factor=post_bar_gap_factor,
-                operation_bar_style=operation_bar_style,
-                result_guide_style=result_guide_style,
-                result_guide_color=result_guide_color,
-                result_guide_thickness=result_guide_thickness,
-                digit_guides=digit_guides,
-                digit_guides_color=digit_guides_color,
-                digit_guides_alpha=digit_guides_alpha,
-                number_color=number_color,
-                hide_numbers=hide_numbers,
-            )
-            pdf.savefig(fig, bbox_inches="tight")
-            plt.close(fig)
-
-        if include_answers:
-            ans_fig = draw_answers_page(
-                problems,
-                title=f"{title} (klucz)",
-                figsize=figsize,
-                title_fontsize=title_fontsize,
-            )
-            pdf.savefig(ans_fig, bbox_inches="tight")
-            plt.close(ans_fig)
+
+def draw_answers_page(
+    problems: Sequence[Problem],
+    title: str,
+    figsize: Tuple[float, float],
+    *,
+    title_fontsize: int,
+    show_carries: bool = False,
+    text_mode: str = "text",
+    cols: int = 2,
+) -> Figure:
+    """
+    Generuje stronę z odpowiedziami (uwzględnia operator + / -).
+    show_carries – dopisuje liczbę przeniesień (p) lub pożyczek (p) przy każdym zadaniu.
+    text_mode – "glyphs" składa wiersze odpowiedzi ze ścieżek glifów (jak w draw_page).
+    cols – liczba kolumn odpowiedzi. Wszystkie zadania trafiają na tę jedną stronę; klucz
+    podzielony na strony tworzą build_pdf / build_answers_pdf (answers_per_page).
+    """
+    spec = _answers_spec(
+        problems, title, figsize, title_fontsize=title_fontsize, show_carries=show_carries, cols=cols
+    )
+    return _render_figure(spec, text_mode)
 
 
-# --- Parser argumentów --- #
-def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+# --- Natywny zapis PDF (bez Matplotlib) --- #
+BACKENDS = ("matplotlib", "native")
+# Obszar strony: "fixed" – dokładnie format papieru, "tight" – dopasowany do treści (savefig bbox_inches="tight")
+BBOX_MODES = ("fixed", "tight")
+
+# Położenie linii bazowej jak w Matplotlib: ax.text liczy górę/dół napisu z metryk OS/2
+# czcionki DejaVu (sTypoAscender 1556, sTypoDescender -492 przy 2048 jednostkach na em).
+_TEXT_ASCENT = 1556 / 2048
+_TEXT_DESCENT = 492 / 2048
+
+# Szerokości znaków ASCII 32..126 czcionek base-14 (jednostki 1/1000 em, pliki AFM Adobe).
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556,
+    556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667,
+    611, 778, 722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667,
+    667, 611, 278, 278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500,
+    222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556,
+    556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611, 975, 722, 722, 722, 722, 667,
+    611, 778, 722, 278, 556, 722, 611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667,
+    667, 611, 333, 278, 333, 584, 556, 333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556,
+    278, 889, 611, 611, 611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+_COURIER_WIDTH = 600
+
+# Kodowanie czcionek: WinAnsi + polskie litery na pozycjach z Windows-1250 (/Differences).
+_POLISH_GLYPHS = {
+    "ą": (0xB9, "aogonek"), "Ą": (0xA5, "Aogonek"), "ć": (0xE6, "cacute"), "Ć": (0xC6, "Cacute"),
+    "ę": (0xEA, "eogonek"), "Ę": (0xCA, "Eogonek"), "ł": (0xB3, "lslash"), "Ł": (0xA3, "Lslash"),
+    "ń": (0xF1, "nacute"), "Ń": (0xD1, "Nacute"), "ś": (0x9C, "sacute"), "Ś": (0x8C, "Sacute"),
+    "ź": (0x9F, "zacute"), "Ź": (0x8F, "Zacute"), "ż": (0xBF, "zdotaccent"), "Ż": (0xAF, "Zdotaccent"),
+}
+
+
+def _build_pdf_encoding() -> dict[str, int]:
+    table: dict[str, int] = {}
+    for code in range(32, 256):
+        try:
+            table[bytes([code]).decode("cp1252")] = code
+        except UnicodeDecodeError:
+            pass
+    taken = {code for code, _ in _POLISH_GLYPHS.values()}
+    table = {ch: code for ch, code in table.items() if code not in taken}
+    table.update({ch: code for ch, (code, _) in _POLISH_GLYPHS.items()})
+    return table
+
+
+_PDF_ENCODING = _build_pdf_encoding()
+# Szerokości znaków o kodach 128..255 w kodowaniu _PDF_ENCODING (polskie litery na pozycjach
+# Windows-1250, reszta z WinAnsi; 0 – kod nieużywany). Wartości z plików AFM Adobe.
+_HELVETICA_HIGH_WIDTHS = (
+    556, 0, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 667, 0, 611, 611, 0, 222, 222,
+    333, 333, 350, 556, 1000, 333, 1000, 500, 333, 500, 0, 500, 500, 278, 333, 556, 556, 556, 667,
+    260, 556, 333, 737, 370, 556, 584, 333, 737, 611, 400, 584, 333, 222, 333, 556, 537, 278, 333,
+    556, 365, 556, 834, 834, 834, 500, 667, 667, 667, 667, 667, 667, 722, 722, 667, 667, 667, 667,
+    278, 278, 278, 278, 722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667,
+    611, 556, 556, 556, 556, 556, 556, 500, 500, 556, 556, 556, 556, 278, 278, 278, 278, 556, 556,
+    556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+_HELVETICA_BOLD_HIGH_WIDTHS = (
+    556, 0, 278, 556, 500, 1000, 556, 556, 333, 1000, 667, 333, 667, 0, 611, 611, 0, 278, 278,
+    500, 500, 350, 556, 1000, 333, 1000, 556, 333, 556, 0, 500, 500, 278, 333, 556, 611, 556, 722,
+    280, 556, 333, 737, 370, 556, 584, 333, 737, 611, 400, 584, 333, 278, 333, 611, 556, 278, 333,
+    556, 365, 556, 834, 834, 834, 500, 722, 722, 722, 722, 722, 722, 722, 722, 667, 667, 667, 667,
+    278, 278, 278, 278, 722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667,
+    611, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 278, 278, 611, 611,
+    611, 611, 611, 611, 611, 584, 611, 611, 611, 611, 611, 556, 611, 556,
+)
+
+
+def _char_width(ch: str, bold: bool) -> int:
+    """Szerokość glifu zapisanego dla znaku (jednostki 1/1000 em); znaki spoza kodowania jak '?'."""
+    code = _PDF_ENCODING.get(ch, 0x3F)
+    if code >= 128:
+        return (_HELVETICA_BOLD_HIGH_WIDTHS if bold else _HELVETICA_HIGH_WIDTHS)[code - 128]
+    if code > 126:
+        return 0
+    return (_HELVETICA_BOLD_WIDTHS if bold else _HELVETICA_WIDTHS)[code - 32]
+
+
+@lru_cache(maxsize=4096)
+def _text_units(text: str, bold: bool) -> int:
+    return sum(_char_width(ch, bold) for ch in text)
+
+
+def _text_width(text: str, size: float, *, mono: bool, bold: bool) -> float:
+    """Szerokość napisu w punktach dla czcionki base-14 używanej przez backend natywny."""
+    if mono:
+        return len(text) * _COURIER_WIDTH * size / 1000
+    return _text_units(text, bold) * size / 1000
+
+
+@lru_cache(maxsize=8192)
+def _pdf_date(when: datetime) -> str:
+    """Data w formacie PDF (D:RRRRMMDDGGmmSS, UTC), jak w metadanych zapisywanych przez Matplotlib."""
+    return "D:" + when.astimezone(timezone.utc).strftime("%Y%m%d%H%M%S") + "Z"
+
+
+def _source_date() -> datetime | None:
+    """
+    Data z SOURCE_DATE_EPOCH (sekundy od 1970-01-01 UTC, konwencja reproducible-builds.org)
+    albo None, gdy zmienna nie jest ustawiona – w trybie reproducible data jest wtedy pomijana.
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if not value:
+        return None
+    try:
+        return datetime.fromtimestamp(int(value), timezone.utc)
+    except (ValueError, OverflowError, OSError) as exc:
+        raise ValueError(f"SOURCE_DATE_EPOCH musi być liczbą sekund od 1970-01-01 (jest {value!r}).") from exc
+
+
+def _pdf_metadata(reproducible: bool) -> dict[str, object] | None:
+    """Metadane PdfPages: domyślne Matplotlib albo, w trybie reproducible, stała data utworzenia."""
+    if not reproducible:
+        return None
+    # None usuwa klucz z metadanych dokumentu
+    return {"CreationDate": _source_date()}
+
+
+def _pdf_string(text: str) -> bytes:
+    """Literał łańcucha PDF w kodowaniu _PDF_ENCODING (znaki spoza niego jako '?')."""
+    out = bytearray(b"(")
+    for ch in text:
+        code = _PDF_ENCODING.get(ch, 0x3F)
+        if code in (0x28, 0x29, 0x5C):
+            out += b"\\" + bytes([code])
+        elif code > 126:
+            out += b"\\%03o" % code
+        else:
+            out.append(code)
+    out += b")"
+    return bytes(out)
+
+
+@lru_cache(maxsize=256)
+def _pdf_rgb(color: str | None) -> tuple[float, float, float]:
+    """Kolor jako RGB 0..1; hex parsowany lokalnie, nazwy (np. 'grey') przez matplotlib.colors."""
+    if color is None:
+        return (0.0, 0.0, 0.0)
+    text = color.strip()
+    if text.startswith("#") and len(text) in (4, 7, 9):
+        digits = text[1:]
+        if len(digits) == 3:
+            digits = "".join(d * 2 for d in digits)
+        try:
+            return tuple(int(digits[i : i + 2], 16) / 255 for i in (0, 2, 4))  # type: ignore[return-value]
+        except ValueError:
+            pass
+    from matplotlib.colors import to_rgb
+
+    return to_rgb(text)
+
+
+def _fmt(value: float) -> bytes:
+    """Liczba w strumieniu PDF (punkty z dokładnością 0,01)."""
+    return b"%.2f" % value
+
+
+_PDF_FONTS = {(False, False): b"F1", (False, True): b"F2", (True, False): b"F3", (True, True): b"F4"}
+_PDF_CAPS = {"butt": b"0", "round": b"1", "projecting": b"2"}
+
+
+def _place_text(t: _Text, to_page: tuple[float, float, float, float]) -> tuple[float, float, float]:
+    """
+    Zwraca (x lewej krawędzi, y linii bazowej, szerokość) napisu na stronie PDF w punktach,
+    z wyrównaniem ha/va liczonym tak jak w ax.text.
+    """
+    sx, ox, sy, oy = to_page
+    x = t.x * sx + ox
+    y = t.y * sy + oy
+    width = _text_width(t.text, t.size, mono=t.mono, bold=t.bold)
+    if t.ha == "center":
+        x -= width / 2
+    elif t.ha == "right":
+        x -= width
+    if t.va == "top":
+        y -= _TEXT_ASCENT * t.size
+    elif t.va == "bottom":
+        y += _TEXT_DESCENT * t.size
+    elif t.va == "center":
+        y -= (_TEXT_ASCENT - _TEXT_DESCENT) * t.size / 2
+    return x, y, width
+
+
+def _page_transform(spec: _PageSpec) -> tuple[float, float, float, float]:
+    """Przekształcenie jednostek osi na punkty PDF: (skala x, przesunięcie x, skala y, przesunięcie y)."""
+    width_pt, height_pt = spec.figsize[0] * 72, spec.figsize[1] * 72
+    (x0, x1), (y0, y1) = spec.xlim, spec.ylim
+    sx = width_pt / (x1 - x0)
+    sy = height_pt / (y1 - y0)
+    return sx, -x0 * sx, sy, -y0 * sy
+
+
+def _page_box(spec: _PageSpec, pad: float = 7.2) -> tuple[float, float, float, float]:
+    """
+    Obszar strony w punktach (x0, y0, x1, y1) jak przy savefig(bbox_inches="tight"): figura
+    razem z wystającymi poza nią napisami, z marginesem 0,1 cala.
+    """
+    to_page = _page_transform(spec)
+    x0, y0, x1, y1 = 0.0, 0.0, spec.figsize[0] * 72, spec.figsize[1] * 72
+    # Kreski zawsze mieszczą się w figurze (zakres osi to ich zakres + margines), liczą się tylko napisy
+    for t in spec.texts:
+        x, y, width = _place_text(t, to_page)
+        x0, x1 = min(x0, x), max(x1, x + width)
+        y0, y1 = min(y0, y - _TEXT_DESCENT * t.size), max(y1, y + _TEXT_ASCENT * t.size)
+    return x0 - pad, y0 - pad, x1 + pad, y1 + pad
+
+
+def _native_page_content(spec: _PageSpec, alpha_states: dict[float, bytes]) -> bytes:
+    """
+    Strumień treści strony PDF (w punktach figury). alpha_states zbiera użyte przezroczystości
+    (wartość -> nazwa ExtGState), które trafiają do zasobów strony.
+    """
+    sx, ox, sy, oy = to_page = _page_transform(spec)
+    out: list[bytes] = []
+
+    def alpha_op(alpha: float | None) -> bytes:
+        alpha = 1.0 if alpha is None else alpha
+        name = alpha_states.setdefault(alpha, b"GA%d" % len(alpha_states))
+        return b"/" + name + b" gs"
+
+    for group in spec.lines:
+        r, g, b = _pdf_rgb(group.color)
+        out.append(
+            b"q %s %s %s %s RG %s w %s J"
+            % (alpha_op(group.alpha), _fmt(r), _fmt(g), _fmt(b), _fmt(group.width), _PDF_CAPS[group.capstyle])
+        )
+        for (xa, ya), (xb, yb) in group.segments:
+            out.append(
+                b"%s %s m %s %s l S"
+                % (_fmt(xa * sx + ox), _fmt(ya * sy + oy), _fmt(xb * sx + ox), _fmt(yb * sy + oy))
+            )
+        out.append(b"Q")
+
+    state: tuple[object, ...] = ()
+    out.append(b"BT")
+    for t in spec.texts:
+        x, y, _ = _place_text(t, to_page)
+        style = (t.mono, t.bold, t.size, t.color, t.alpha)
+        if style != state:
+            r, g, b = _pdf_rgb(t.color)
+            out.append(
+                b"/%s %s Tf %s %s %s rg %s"
+                % (_PDF_FONTS[t.mono, t.bold], _fmt(t.size), _fmt(r), _fmt(g), _fmt(b), alpha_op(t.alpha))
+            )
+            state = style
+        out.append(b"1 0 0 1 %s %s Tm %s Tj" % (_fmt(x), _fmt(y), _pdf_string(t.text)))
+    out.append(b"ET")
+    return b"\n".join(out)
+
+
+@dataclass(frozen=True)
+class _NativePage:
+    """Strona gotowa do zapisu: obszar, skompresowana treść i ewentualny szablon elementów stałych."""
+
+    box: Tuple[float, float, float, float]
+    content: bytes
+    alpha_states: dict
+    template_name: bytes = b""
+    static: _PageSpec | None = None
+
+
+def _prepare_native_page(spec: _PageSpec, *, template: bool = False, bbox: str = "tight") -> _NativePage:
+    """
+    Przygotowuje treść strony PDF niezależnie od pisarza – może działać w procesie roboczym.
+
+    Nazwa szablonu to skrót jego zawartości, więc nie zależy od kolejności stron ani procesu,
+    który ją policzył; wynik zapisu jest taki sam przy --jobs 1 i --jobs N.
+    """
+    alpha_states: dict[float, bytes] = {}
+    if bbox == "tight":
+        x0, y0, x1, y1 = _page_box(spec)
+    else:
+        x0, y0, x1, y1 = 0.0, 0.0, spec.figsize[0] * 72.0, spec.figsize[1] * 72.0
+    # Obszar strony może wystawać poza figurę – przesuwamy jego lewy dolny róg do (0, 0)
+    prefix = b"1 0 0 1 %s %s cm\n" % (_fmt(-x0), _fmt(-y0)) if (x0, y0) != (0.0, 0.0) else b""
+    name, static = b"", None
+    if template:
+        static = _PageSpec(spec.figsize, tuple(t for t in spec.texts if t.static), spec.lines, spec.xlim, spec.ylim)
+        name = b"T" + hashlib.sha1(repr(static).encode("utf-8")).hexdigest()[:10].encode("ascii")
+        spec = _PageSpec(spec.figsize, tuple(t for t in spec.texts if not t.static), (), spec.xlim, spec.ylim)
+        prefix += b"/%s Do\n" % name
+    content = zlib.compress(prefix + _native_page_content(spec, alpha_states))
+    return _NativePage((x0, y0, x1, y1), content, alpha_states, name, static)
+
+
+class _NativePdfWriter:
+    """
+    Minimalny zapis PDF 1.4: czcionki base-14 (Helvetica, Helvetica-Bold, Courier,
+    Courier-Bold), skompresowane strumienie treści stron i tablica xref.
+    Obiekty są zapisywane od razu, więc pamięć nie rośnie z liczbą stron.
+
+    template=True – elementy stałe strony (tytuły, kreski, prowadnice) trafiają do wspólnego
+    obiektu Form XObject, zapisywanego raz dla każdej odmiany (np. ostatnia, niepełna strona);
+    strona zawiera wtedy tylko odwołanie do szablonu oraz numery i składniki zadań.
+    """
+
+    _BASE_FONTS = (b"Helvetica", b"Helvetica-Bold", b"Courier", b"Courier-Bold")
+
+    def __init__(
+        self,
+        fh: BinaryIO,
+        *,
+        template: bool = False,
+        bbox: str = "tight",
+        producer: str = "matematyka (main.py)",
+        creation_date: datetime | None = None,
+    ) -> None:
+        self._fh = fh
+        self._bbox = bbox
+        self._pos = 0
+        self._offsets: dict[int, int] = {}
+        self._next_id = 1
+        self._page_ids: list[int] = []
+        self._template = template
+        self._templates: dict[bytes, int] = {}
+        self._catalog_id = self._reserve()
+        self._pages_id = self._reserve()
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        differences = b" ".join(b"%d /%s" % (code, name.encode("ascii")) for code, name in sorted(_POLISH_GLYPHS.values()))
+        encoding_id = self._add(b"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [%s] >>" % differences)
+        font_ids = [
+            self._add(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding %d 0 R >>" % (name, encoding_id))
+            for name in self._BASE_FONTS
+        ]
+        self._fonts = b" ".join(b"/F%d %d 0 R" % (i + 1, fid) for i, fid in enumerate(font_ids))
+        info = b"/Producer %s" % _pdf_string(producer)
+        if creation_date is not None:
+            info += b" /CreationDate %s" % _pdf_string(_pdf_date(creation_date))
+        self._info_id = self._add(b"<< %s >>" % info)
+
+    def _reserve(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write(self, data: bytes) -> None:
+        self._fh.write(data)
+        self._pos += len(data)
+
+    def _add(self, body: bytes, obj_id: int | None = None) -> int:
+        obj_id = self._reserve() if obj_id is None else obj_id
+        self._offsets[obj_id] = self._pos
+        self._write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+        return obj_id
+
+    def _resources(self, alpha_states: dict[float, bytes], xobjects: bytes = b"") -> bytes:
+        gstates = b" ".join(b"/%s << /ca %s /CA %s >>" % (name, _fmt(a), _fmt(a)) for a, name in alpha_states.items())
+        extra = b" /XObject << %s >>" % xobjects if xobjects else b""
+        return b"<< /Font << %s >> /ExtGState << %s >>%s >>" % (self._fonts, gstates, extra)
+
+    def _stream(self, dictionary: bytes, content: bytes) -> int:
+        data = zlib.compress(content)
+        return self._add(b"<< %s /Length %d /Filter /FlateDecode >>\nstream\n" % (dictionary, len(data)) + data + b"\nendstream")
+
+    def _template_for(self, name: bytes, static: _PageSpec) -> int:
+        """Numer obiektu szablonu dla elementów stałych strony (tworzony przy pierwszym użyciu)."""
+        obj_id = self._templates.get(name)
+        if obj_id is None:
+            alpha_states: dict[float, bytes] = {}
+            content = _native_page_content(static, alpha_states)
+            x0, y0, x1, y1 = _page_box(static)
+            obj_id = self._templates[name] = self._stream(
+                b"/Type /XObject /Subtype /Form /BBox [%s %s %s %s] /Resources %s"
+                % (_fmt(x0), _fmt(y0), _fmt(x1), _fmt(y1), self._resources(alpha_states)),
+                content,
+            )
+        return obj_id
+
+    def add_page(self, spec: _PageSpec) -> None:
+        self.add_prepared(_prepare_native_page(spec, template=self._template, bbox=self._bbox))
+
+    def add_prepared(self, page: _NativePage) -> None:
+        """Dopisuje stronę przygotowaną przez _prepare_native_page (np. w procesie roboczym)."""
+        x0, y0, x1, y1 = page.box
+        xobjects = b""
+        if page.static is not None:
+            xobjects = b"/%s %d 0 R" % (page.template_name, self._template_for(page.template_name, page.static))
+        data = page.content
+        content_id = self._add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream")
+        page_id = self._add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R /Resources %s >>"
+            % (self._pages_id, _fmt(x1 - x0), _fmt(y1 - y0), content_id, self._resources(page.alpha_states, xobjects))
+        )
+        self._page_ids.append(page_id)
+
+    def close(self) -> None:
+        kids = b" ".join(b"%d 0 R" % pid for pid in self._page_ids)
+        self._add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)), self._pages_id)
+        self._add(b"<< /Type /Catalog /Pages %d 0 R >>" % self._pages_id, self._catalog_id)
+        xref_pos = self._pos
+        size = self._next_id
+        rows = [b"xref\n0 %d\n0000000000 65535 f \n" % size]
+        rows += [b"%010d 00000 n \n" % self._offsets[i] for i in range(1, size)]
+        self._write(b"".join(rows))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, self._catalog_id, self._info_id, xref_pos))
+
+
+# --- Równoległe renderowanie stron --- #
+# Zadanie strony: (numer strony od 1, numer pierwszego zadania, zadania strony, liczba stron klucza).
+# Ostatnie pole > 0 oznacza stronę klucza odpowiedzi (numer strony liczony wtedy w obrębie klucza).
+_PageTask = Tuple[int, int, Sequence[Problem], int]
+_T = TypeVar("_T")
+
+
+def _task_spec(task: _PageTask, page_style: dict, answers_style: dict) -> _PageSpec:
+    page_index, start_number, chunk, answer_pages = task
+    if answer_pages:
+        style = dict(answers_style)
+        per_page = style.pop("per_page")
+        # Strony wielostronicowego klucza mają wspólną siatkę (także ostatnia, niepełna)
+        rows = math.ceil(per_page / style["cols"]) if answer_pages > 1 else None
+        return _answers_spec(
+            chunk, start_number=start_number, rows=rows, page=page_index, pages=answer_pages, **style
+        )
+    return _page_spec(chunk, page_index=page_index, start_number=start_number, **page_style)
+
+
+def _native_chunk(
+    tasks: Sequence[_PageTask], page_style: dict, answers_style: dict, template: bool, bbox: str
+) -> list[_NativePage]:
+    """Proces roboczy backendu native: układ stron i skompresowane strumienie treści."""
+    return [
+        _prepare_native_page(_task_spec(t, page_style, answers_style), template=template, bbox=bbox) for t in tasks
+    ]
+
+
+def _save_kwargs(bbox: str) -> dict[str, str]:
+    """Argumenty savefig dla trybu obszaru strony; "fixed" pomija dodatkowy przebieg mierzący treść."""
+    return {"bbox_inches": "tight"} if bbox == "tight" else {}
+
+
+def _matplotlib_chunk(
+    tasks: Sequence[_PageTask], page_style: dict, answers_style: dict, text_mode: str, bbox: str, metadata: dict | None
+) -> bytes:
+    """Proces roboczy backendu Matplotlib: kolejne strony jako osobny, kompletny dokument PDF."""
+    return _matplotlib_document((_task_spec(t, page_style, answers_style) for t in tasks), text_mode, bbox, metadata)
+
+
+def _matplotlib_document(specs: Iterable[_PageSpec], text_mode: str, bbox: str, metadata: dict | None) -> bytes:
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    buffer = io.BytesIO()
+    with PdfPages(buffer, metadata=metadata) as pdf:
+        for spec in specs:
+            pdf.savefig(_render_figure(spec, text_mode), **_save_kwargs(bbox))
+    return buffer.getvalue()
+
+
+def _cached_matplotlib_chunk(
+    tasks: Sequence[_PageTask],
+    page_style: dict,
+    answers_style: dict,
+    text_mode: str,
+    bbox: str,
+    cache: OutputCache,
+) -> list[bytes]:
+    """
+    Proces roboczy --incremental: każda strona jako osobny jednostronicowy PDF – z pamięci
+    podręcznej albo renderowana i zapisywana. Klucz to skrót opisu strony (_PageSpec: zadania,
+    numeracja, styl), więc ponownie renderowane są tylko strony, których treść się zmieniła.
+    Strony nie mają daty utworzenia (dopisuje ją _merge_pdfs), żeby klucz od niej nie zależał.
+    """
+    pages = []
+    for task in tasks:
+        spec = _task_spec(task, page_style, answers_style)
+        key = cache.key(
+            {
+                "page": hashlib.sha256(repr(spec).encode("utf-8")).hexdigest(),
+                "text_mode": text_mode,
+                "bbox": bbox,
+                "matplotlib": _matplotlib_version(),
+            }
+        )
+        try:
+            data = cache.get(key)
+        except (OSError, sqlite3.Error):  # niedostępna pamięć: strona renderowana jak bez niej
+            data = None
+        if data is None:
+            data = _matplotlib_document([spec], text_mode, bbox, {"CreationDate": None})
+            with suppress(OSError, sqlite3.Error):
+                cache.put(key, data)
+        pages.append(data)
+    return pages
+
+
+def _map_chunks(fn: Callable[[list], _T], tasks: Iterable, chunk_size: int, jobs: int) -> Iterator[_T]:
+    """
+    Wywołuje fn na kolejnych paczkach po chunk_size zadań i zwraca wyniki w kolejności paczek.
+
+    Przy jobs > 1 paczki liczy pula procesów; w locie jest najwyżej 2*jobs paczek, więc
+    zadania (np. z ProblemStream) są pobierane na bieżąco, a nie wszystkie naraz.
+    """
+    items = iter(tasks)
+    chunks = iter(lambda: list(islice(items, chunk_size)), [])
+    if jobs <= 1:
+        yield from map(fn, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending: deque[Future[_T]] = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(fn, chunk))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+_PDF_XREF_ENTRY = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_PDF_REF = re.compile(rb"(\d+) 0 R\b")
+_PDF_STREAM = re.compile(rb"stream\r?\n")
+
+
+def _pdf_renumber(body: bytes, renumber: dict[int, int]) -> bytes:
+    """Przepisuje odwołania "N 0 R" według renumber w słowniku obiektu (strumień zostaje bez zmian)."""
+    stream = _PDF_STREAM.search(body)
+    split = stream.start() if stream else len(body)
+    return _PDF_REF.sub(lambda match: b"%d 0 R" % renumber[int(match.group(1))], body[:split]) + body[split:]
+
+
+def _pdf_objects(data: bytes) -> tuple[dict[int, bytes], dict[str, int], int]:
+    """
+    Dzieli PDF zapisany przez PdfPages/_NativePdfWriter (jedna sekcja xref, bez strumieni
+    obiektów) na obiekty: {numer: treść między "N 0 obj" a "endobj"}, odwołania z trailera
+    (Root, Info) i offset pierwszego obiektu (koniec nagłówka pliku).
+    """
+    xref_pos = int(data[data.rindex(b"startxref") + 9 :].split()[0])
+    trailer_pos = data.index(b"trailer", xref_pos)
+    entries = _PDF_XREF_ENTRY.findall(data, xref_pos, trailer_pos)
+    offsets = sorted((int(off), num) for num, (off, _gen, kind) in enumerate(entries) if kind == b"n")
+    objects: dict[int, bytes] = {}
+    for (start, num), (end, _next) in zip(offsets, offsets[1:] + [(xref_pos, -1)]):
+        body = data[start:end].rstrip()
+        body = body[body.index(b"obj") + 3 : body.rindex(b"endobj")]
+        objects[num] = body.strip(b"\r\n")
+    trailer = {key.decode(): int(num) for key, num in re.findall(rb"/(Root|Info) (\d+) 0 R", data[trailer_pos:])}
+    return objects, trailer, offsets[0][0]
+
+
+def _pdf_dict_refs(body: bytes) -> list[int]:
+    """Numery obiektów, do których odwołuje się słownik obiektu (bez treści strumienia)."""
+    stream = _PDF_STREAM.search(body)
+    return [int(num) for num in _PDF_REF.findall(body, 0, stream.start() if stream else len(body))]
+
+
+def _pdf_post_order(objects: dict[int, bytes], skipped: set[int]) -> list[int] | None:
+    """
+    Numery obiektów (poza skipped) w kolejności, w której każdy następuje po obiektach, do których
+    się odwołuje; None, gdy odwołania tworzą cykl.
+    """
+    order: list[int] = []
+    done: set[int] = set()
+    active: set[int] = set()
+    for root in objects:
+        if root in skipped or root in done:
+            continue
+        active.add(root)
+        stack = [(root, iter(_pdf_dict_refs(objects[root])))]
+        while stack:
+            num, refs = stack[-1]
+            for child in refs:
+                if child in skipped or child in done or child not in objects:
+                    continue
+                if child in active:
+                    return None
+                active.add(child)
+                stack.append((child, iter(_pdf_dict_refs(objects[child]))))
+                break
+            else:
+                stack.pop()
+                active.discard(num)
+                done.add(num)
+                order.append(num)
+    return order
+
+
+def _merge_pdfs(
+    parts: Iterable[bytes], fh: BinaryIO, creation_date: datetime | None = None, *, dedupe: bool = False
+) -> None:
+    """
+    Skleja kolejne dokumenty PDF w jeden, zachowując kolejność stron.
+
+    Obiekty każdej części dostają nowe numery (odwołania "N 0 R" są przepisywane tylko w
+    słownikach, nie w strumieniach), strony trafiają do wspólnego drzewa /Pages, a katalog
+    i metadane pierwszej części zastępują pozostałe. creation_date – data dopisywana do
+    metadanych (dla części zapisanych bez daty).
+
+    dedupe – obiekt identyczny (po przenumerowaniu) z zapisanym wcześniej nie jest powtarzany,
+    tylko odwołania wskazują pierwszy; części są wtedy przepisywane od liści (czcionki, obrazy)
+    do stron. Dla wielu części po jednej stronie osadzona czcionka trafia do pliku raz.
+    """
+    pages_id, catalog_id, info_id = 1, 2, 3
+    next_id = 4
+    offsets: dict[int, int] = {}
+    kids: list[int] = []
+    seen: dict[bytes, int] = {}
+    pos = 0
+    info = b"<< >>"
+
+    def write(data: bytes) -> None:
+        nonlocal pos
+        fh.write(data)
+        pos += len(data)
+
+    def add(obj_id: int, body: bytes) -> None:
+        offsets[obj_id] = pos
+        write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    for index, data in enumerate(parts):
+        objects, trailer, header_end = _pdf_objects(data)
+        root = trailer["Root"]
+        part_pages = int(re.search(rb"/Pages (\d+) 0 R", objects[root]).group(1))
+        dropped = {root, part_pages, trailer.get("Info", -1)}
+        renumber = {part_pages: pages_id}
+        if index == 0:
+            write(data[:header_end])
+            if "Info" in trailer:
+                info = objects[trailer["Info"]]
+        kids_list = re.search(rb"/Kids\s*\[([^\]]*)\]", objects[part_pages]).group(1)
+        part_kids = [int(num) for num in _PDF_REF.findall(kids_list)]
+
+        order = _pdf_post_order(objects, dropped) if dedupe else None
+        if order is None:
+            for num in objects:
+                if num not in dropped:
+                    renumber[num] = next_id
+                    next_id += 1
+            for num, body in objects.items():
+                if num not in dropped:
+                    add(renumber[num], _pdf_renumber(body, renumber))
+        else:
+            pages = set(part_kids)
+            for num in order:
+                body = _pdf_renumber(objects[num], renumber)
+                # Strony zawsze osobno – ta sama strona dwa razy w drzewie /Pages nie jest poprawna
+                digest = hashlib.sha256(body).digest()
+                if num not in pages and digest in seen:
+                    renumber[num] = seen[digest]
+                    continue
+                renumber[num] = next_id
+                next_id += 1
+                add(renumber[num], body)
+                if num not in pages:
+                    seen[digest] = renumber[num]
+        kids.extend(renumber[num] for num in part_kids)
+
+    if creation_date is not None:
+        info = info[: info.rindex(b">>")].rstrip() + b" /CreationDate " + _pdf_string(_pdf_date(creation_date)) + b" >>"
+    add(pages_id, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    add(catalog_id, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    add(info_id, info)
+    xref_pos = pos
+    rows = [b"xref\n0 %d\n0000000000 65535 f \n" % next_id]
+    rows.extend(b"%010d 00000 n \n" % offsets[i] for i in range(1, next_id))
+    write(b"".join(rows))
+    write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, catalog_id, info_id, xref_pos))
+
+
+# --- Budowa PDF --- #
+def _paper_figsize(paper: str, custom_size: Tuple[float, float] | None) -> Tuple[float, float]:
+    """Rozmiar figury (cale) dla formatu papieru."""
+    if paper.lower() == "a4":
+        return (8.27, 11.69)
+    if paper.lower() == "letter":
+        return (8.5, 11.0)
+    if paper.lower() == "custom":
+        if not custom_size:
+            raise ValueError("Dla 'custom' trzeba podać custom_size.")
+        return custom_size
+    raise ValueError("Nieznany format papieru (użyj: A4, Letter, custom).")
+
+
+def _answers_style(
+    title: str,
+    figsize: Tuple[float, float],
+    title_fontsize: int,
+    show_carries: bool,
+    answers_per_page: int,
+    answer_cols: int,
+) -> dict:
+    """Parametry stron klucza odpowiedzi (per_page – zadań na stronę, 0 = wszystkie na jednej)."""
+    if answers_per_page < 0 or answer_cols < 1:
+        raise ValueError("answers_per_page musi być >= 0, a answer_cols >= 1.")
+    return dict(
+        title=f"{title} (klucz)",
+        figsize=figsize,
+        title_fontsize=title_fontsize,
+        show_carries=show_carries,
+        cols=answer_cols,
+        per_page=answers_per_page,
+    )
+
+
+def _page_styles(
+    title: str,
+    cols: int,
+    rows: int,
+    figsize: Tuple[float, float],
+    bbox: str,
+    show_carries: bool,
+    style: dict,
+    *,
+    answers_per_page: int = 80,
+    answer_cols: int = 2,
+) -> tuple[dict, dict]:
+    """Parametry _page_spec i _answers_spec wspólne dla wszystkich stron dokumentu."""
+    if bbox not in BBOX_MODES:
+        raise ValueError(f"Nieznany tryb obszaru strony: {bbox} (dostępne: {', '.join(BBOX_MODES)}).")
+    page_style = dict(style, title=title, cols=cols, rows=rows, figsize=figsize, autoscale=bbox == "tight")
+    answers_style = _answers_style(
+        title, figsize, style["title_fontsize"], show_carries, answers_per_page, answer_cols
+    )
+    return page_style, answers_style
+
+
+def _iter_page_tasks(
+    problems: Iterable[Problem],
+    per_page: int,
+    only_pages: Sequence[int] | None,
+    include_answers: bool,
+    answers_per_page: int = 80,
+) -> Iterator[_PageTask]:
+    """
+    Zadania stron dokumentu po kolei, a na końcu (bez only_pages) strony klucza odpowiedzi.
+
+    Sequence (lista, ProblemSet, ProblemStream) jest czytana wycinkami stron – przy only_pages
+    tylko wybranymi, w podanej kolejności. Zwykły iterator jest czytany porcjami po per_page
+    zadań, więc w pamięci jest tylko bieżąca strona; zadania są zachowywane jedynie dla klucza
+    odpowiedzi, a only_pages wybiera strony w kolejności rosnącej (zakres sprawdzany na końcu).
+    """
+    if only_pages is not None:
+        include_answers = False
+    if isinstance(problems, Sequence):
+        # Zakres stron sprawdzany od razu, zanim powstanie plik wyjściowy
+        pages = math.ceil(len(problems) / per_page)
+        if only_pages is not None:
+            outside = [p for p in only_pages if not (1 <= p <= pages)]
+            if outside:
+                raise ValueError(f"Strony spoza zakresu 1..{pages}: {', '.join(map(str, outside))}.")
+        return _sequence_page_tasks(problems, per_page, pages, only_pages, include_answers, answers_per_page)
+    return _stream_page_tasks(iter(problems), per_page, only_pages, include_answers, answers_per_page)
+
+
+def _answer_tasks(problems: Sequence[Problem], per_page: int) -> Iterator[_PageTask]:
+    """Strony klucza odpowiedzi po per_page zadań (0 – wszystkie na jednej stronie)."""
+    total = len(problems)
+    per_page = per_page or total
+    pages = math.ceil(total / per_page) if total else 0
+    for k in range(pages):
+        start = k * per_page
+        yield (k + 1, start + 1, problems[start : start + per_page], pages)
+
+
+def _sequence_page_tasks(
+    problems: Sequence[Problem],
+    per_page: int,
+    pages: int,
+    only_pages: Sequence[int] | None,
+    include_answers: bool,
+    answers_per_page: int,
+) -> Iterator[_PageTask]:
+    for p in range(1, pages + 1) if only_pages is None else only_pages:
+        start = (p - 1) * per_page
+        yield (p, start + 1, problems[start : start + per_page], 0)
+    if include_answers:
+        yield from _answer_tasks(problems, answers_per_page)
+
+
+def _stream_page_tasks(
+    iterator: Iterator[Problem],
+    per_page: int,
+    only_pages: Sequence[int] | None,
+    include_answers: bool,
+    answers_per_page: int,
+) -> Iterator[_PageTask]:
+    wanted = None if only_pages is None else set(only_pages)
+    kept: list[Problem] | None = [] if include_answers else None
+    page = 0
+    while True:
+        chunk = list(islice(iterator, per_page))
+        if not chunk:
+            break
+        page += 1
+        if kept is not None:
+            kept.extend(chunk)
+        if wanted is None or page in wanted:
+            yield (page, (page - 1) * per_page + 1, chunk, 0)
+    outside = sorted(wanted - set(range(1, page + 1))) if wanted is not None else []
+    if outside:
+        raise ValueError(f"Strony spoza zakresu 1..{page}: {', '.join(map(str, outside))}.")
+    if kept is not None:
+        yield from _answer_tasks(kept, answers_per_page)
+
+
+def iter_pages(
+    problems: Iterable[Problem],
+    cols: int,
+    rows: int,
+    include_answers: bool,
+    paper: str,
+    custom_size: Tuple[float, float] | None,
+    title: str,
+    *,
+    show_carries: bool = False,
+    only_pages: Sequence[int] | None = None,
+    text_mode: str = "text",
+    bbox: str = "fixed",
+    answers_per_page: int = 80,
+    answer_cols: int = 2,
+    **style: object,
+) -> Iterator[Figure]:
+    """
+    Zwraca kolejne strony dokumentu (jak build_pdf) jako gotowe figury Matplotlib, jedna po drugiej.
+
+    problems może być leniwym iteratorem – zadania są pobierane porcjami po cols*rows, więc pamięć
+    nie rośnie z liczbą zadań (poza stroną odpowiedzi, dla której zadania są zachowywane; pomija
+    się ją przez include_answers=False). Pozostałe parametry stylu jak w draw_page. Figury są
+    samodzielne (bez pyplot), np. do pdf.savefig(fig) albo fig.savefig("strona.png").
+    """
+    page_style, answers_style = _page_styles(
+        title,
+        cols,
+        rows,
+        _paper_figsize(paper, custom_size),
+        bbox,
+        show_carries,
+        style,
+        answers_per_page=answers_per_page,
+        answer_cols=answer_cols,
+    )
+    for task in _iter_page_tasks(problems, cols * rows, only_pages, include_answers, answers_per_page):
+        yield _render_figure(_task_spec(task, page_style, answers_style), text_mode)
+
+
+class _StreamOutput:
+    """
+    Obudowa strumienia wyjściowego (stdout, potok, gniazdo, BytesIO) licząca zapisane bajty.
+
+    tell() zwraca pozycję względem początku dokumentu, więc PdfPages pisze wprost do strumienia
+    (zamiast buforować cały plik w pamięci, jak robi dla strumieni bez tell()).
+    """
+
+    def __init__(self, raw: BinaryIO) -> None:
+        self._raw = raw
+        self._pos = 0
+
+    def write(self, data: bytes) -> int:
+        self._raw.write(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        raise io.UnsupportedOperation("seek")
+
+    def flush(self) -> None:
+        self._raw.flush()
+
+
+@contextmanager
+def _open_output(output: Path | str | BinaryIO) -> Iterator[BinaryIO]:
+    """Plik (ścieżka), "-" (stdout) albo dowolny binarny obiekt z write(); obcy strumień nie jest zamykany."""
+    if isinstance(output, str) and output == "-":
+        stream = _StreamOutput(sys.stdout.buffer)
+    elif hasattr(output, "write"):
+        stream = _StreamOutput(output)  # type: ignore[arg-type]
+    else:
+        with open(output, "wb") as fh:  # type: ignore[arg-type]
+            yield fh
+        return
+    yield stream  # type: ignore[misc]
+    stream.flush()
+
+
+def build_pdf(
+    problems: Iterable[Problem],
+    output_path: Path | str | BinaryIO,
+    cols: int,
+    rows: int,
+    include_answers: bool,
+    paper: str,
+    custom_size: Tuple[float, float] | None,
+    title: str,
+    *,
+    problem_fontsize: int,
+    number_fontsize: int,
+    title_fontsize: int,
+    subtitle_fontsize: int,
+    show_subtitle: bool,
+    answer_lines: int,
+    answer_line_spacing: float,
+    answer_line_width: float,
+    answer_line_color: str,
+    answer_line_thickness: float,
+    compact_layout: bool,
+    answer_line_spacing_mm: float,
+    addition_gap_mm: float,
+    post_bar_gap_factor: float,
+    operation_bar_style: str,
+    result_guide_style: str,
+    result_guide_color: str,
+    result_guide_thickness: float,
+    digit_guides: bool,
+    digit_guides_color: str,
+    digit_guides_alpha: float,
+    number_color: str,
+    hide_numbers: bool,
+    show_carries: bool = False,
+    only_pages: Sequence[int] | None = None,
+    text_mode: str = "text",
+    backend: str = "matplotlib",
+    page_template: bool = False,
+    jobs: int = 1,
+    bbox: str = "fixed",
+    answers_per_page: int = 80,
+    answer_cols: int = 2,
+    answers_output: Path | str | BinaryIO | None = None,
+    reproducible: bool = False,
+    page_cache: OutputCache | None = None,
+    carries: tuple[int, int | None] | None = None,
+    carry_columns: Sequence[int] = (),
+) -> None:
+    """
+    Tworzy dokument PDF zawierający karty pracy i (opcjonalnie) stronę z odpowiedziami.
+
+    problems – sekwencja albo leniwy iterator zadań (strony powstają w trakcie czytania, patrz iter_pages).
+    output_path – ścieżka pliku, "-" (stdout) albo binarny obiekt z write() (potok, gniazdo, BytesIO);
+    strony są zapisywane na bieżąco, więc odbiorca może czytać dokument przed końcem generowania.
+    only_pages – numery stron (od 1) do wyrenderowania; pozostałe są pomijane, podobnie jak strona
+    z odpowiedziami. Z ProblemStream liczone są wtedy tylko zadania tych stron.
+    backend – "matplotlib" (domyślnie) albo "native": bezpośredni zapis PDF z czcionkami base-14
+    (Courier/Helvetica) w tym samym układzie i z tym samym obszarem strony; text_mode jest pomijany.
+    page_template – (tylko native) elementy stałe stron zapisywane raz jako wspólny szablon PDF.
+    jobs – liczba procesów renderujących strony (0 = liczba rdzeni). Sekwencja zadań jest wtedy
+    kopiowana raz do pamięci współdzielonej (ProblemSet.share), a procesy dostają tylko jej wycinki.
+    Strony są składane w kolejności; native daje plik identyczny bajt w bajt, Matplotlib –
+    identyczny wizualnie (czcionki powtarzające się we fragmentach są zapisywane raz).
+    bbox – "fixed" (domyślnie): strona ma dokładnie wymiary papieru, a treść mieści się w stałych
+    marginesach; "tight": obszar strony dopasowany do treści (dodatkowy przebieg mierzący w Matplotlib).
+    answers_per_page / answer_cols – klucz odpowiedzi dzielony na strony po answers_per_page zadań
+    w answer_cols kolumnach (0 – wszystkie na jednej stronie, jak dawniej).
+    answers_output – klucz zapisywany do osobnego pliku/strumienia zamiast na końcu dokumentu;
+    dla sekwencji zadań i ścieżki powstaje równolegle z arkuszem (osobny proces).
+    reproducible – te same dane wejściowe dają identyczne bajty: data utworzenia z SOURCE_DATE_EPOCH
+    albo pominięta (Matplotlib domyślnie zapisuje bieżącą). Kolejność obiektów obu backendów jest
+    stała; backend native poza tym trybem nie zapisuje daty wcale.
+    page_cache – (tylko Matplotlib) renderowanie przyrostowe: każda strona jest osobnym wpisem
+    OutputCache o kluczu ze skrótu jej treści i stylu, więc po zmianie części zadań renderowane są
+    tylko zmienione strony, a pozostałe pochodzą z pamięci. Dokument jest sklejany z jednostronicowych
+    PDF (czcionki osadzone osobno na każdej stronie – plik jest większy). Backend native pomija
+    page_cache: jego strona powstaje szybciej niż odczyt z pamięci podręcznej.
+    carries / carry_columns – poziom trudności użyty przy generowaniu zadań (jak w generate_problems);
+    opisuje go podtytuł stron.
+    """
+    figsize = _paper_figsize(paper, custom_size)
+    page_style, answers_style = _page_styles(
+        title,
+        cols,
+        rows,
+        figsize,
+        bbox,
+        show_carries,
+        dict(
+            problem_fontsize=problem_fontsize,
+            number_fontsize=number_fontsize,
+            title_fontsize=title_fontsize,
+            subtitle_fontsize=subtitle_fontsize,
+            show_subtitle=show_subtitle,
+            answer_lines=answer_lines,
+            answer_line_spacing=answer_line_spacing,
+            answer_line_width=answer_line_width,
+            answer_line_color=answer_line_color,
+            answer_line_thickness=answer_line_thickness,
+            compact_layout=compact_layout,
+            answer_line_spacing_mm=answer_line_spacing_mm,
+            addition_gap_mm=addition_gap_mm,
+            post_bar_gap_factor=post_bar_gap_factor,
+            operation_bar_style=operation_bar_style,
+            result_guide_style=result_guide_style,
+            result_guide_color=result_guide_color,
+            result_guide_thickness=result_guide_thickness,
+            digit_guides=digit_guides,
+            digit_guides_color=digit_guides_color,
+            digit_guides_alpha=digit_guides_alpha,
+            number_color=number_color,
+            hide_numbers=hide_numbers,
+            carries=carries,
+            carry_columns=tuple(carry_columns),
+        ),
+        answers_per_page=answers_per_page,
+        answer_cols=answer_cols,
+    )
+    per_page = cols * rows
+    answers_future = None
+    kept: list[Problem] | None = None
+    with ExitStack() as stack:
+        separate = include_answers and answers_output is not None and only_pages is None
+        if jobs != 1 or (separate and isinstance(answers_output, (str, Path)) and answers_output != "-"):
+            # Strony liczone w innych procesach dostają wycinki zestawu z pamięci współdzielonej
+            # (pickle przenosi nazwę bloku), a nie kopie zadań w każdej paczce
+            shared = _shared_problems(problems)
+            if shared is not None:
+                stack.callback(shared.release)
+                problems = shared
+        if separate:
+            # Klucz odpowiedzi jako osobny dokument: dla sekwencji zapisywany równolegle w osobnym
+            # procesie, dla iteratora – po arkuszu, z zadań zebranych w trakcie jego zapisu.
+            include_answers = False
+            answers_kwargs = dict(
+                paper=paper,
+                custom_size=custom_size,
+                title=title,
+                title_fontsize=title_fontsize,
+                show_carries=show_carries,
+                answers_per_page=answers_per_page,
+                answer_cols=answer_cols,
+                text_mode=text_mode,
+                backend=backend,
+                bbox=bbox,
+                reproducible=reproducible,
+                page_cache=page_cache,
+            )
+            if isinstance(problems, Sequence) and isinstance(answers_output, (str, Path)) and answers_output != "-":
+                pool = stack.enter_context(ProcessPoolExecutor(max_workers=1))
+                answers_future = pool.submit(build_answers_pdf, problems, answers_output, **answers_kwargs)
+            else:
+                kept = []
+                problems = _collecting(problems, kept)
+
+        _write_pdf(
+            _iter_page_tasks(problems, per_page, only_pages, include_answers, answers_per_page),
+            output_path,
+            page_style=page_style,
+            answers_style=answers_style,
+            backend=backend,
+            text_mode=text_mode,
+            bbox=bbox,
+            page_template=page_template,
+            jobs=jobs,
+            page_count=math.ceil(len(problems) / per_page) if isinstance(problems, Sequence) else None,
+            reproducible=reproducible,
+            page_cache=page_cache if backend == "matplotlib" else None,
+        )
+        if answers_future is not None:
+            answers_future.result()
+        elif kept is not None:
+            build_answers_pdf(kept, answers_output, **answers_kwargs)
+
+
+def _shared_problems(problems: Iterable[Problem]) -> ProblemSet | None:
+    """
+    Zestaw zadań w pamięci współdzielonej (do zwolnienia przez release()) albo None, gdy nie ma
+    czego współdzielić: iterator, ProblemStream (liczony leniwie), zestaw już współdzielony, pusty
+    albo z liczbami spoza int64.
+    """
+    if not isinstance(problems, Sequence) or isinstance(problems, ProblemStream) or not len(problems):
+        return None
+    ps = problems if isinstance(problems, ProblemSet) else ProblemSet.from_problems(problems)
+    if ps._shm is not None or ps.a.dtype == object:
+        return None
+    return ps.share()
+
+
+def build_answers_pdf(
+    problems: Iterable[Problem],
+    output_path: Path | str | BinaryIO,
+    paper: str,
+    custom_size: Tuple[float, float] | None,
+    title: str,
+    *,
+    title_fontsize: int,
+    show_carries: bool = False,
+    answers_per_page: int = 80,
+    answer_cols: int = 2,
+    text_mode: str = "text",
+    backend: str = "matplotlib",
+    bbox: str = "fixed",
+    jobs: int = 1,
+    reproducible: bool = False,
+    page_cache: OutputCache | None = None,
+) -> None:
+    """
+    Zapisuje sam klucz odpowiedzi jako osobny PDF (strony po answers_per_page zadań w answer_cols
+    kolumnach; 0 – wszystkie na jednej stronie). Parametry jak w build_pdf.
+    """
+    if bbox not in BBOX_MODES:
+        raise ValueError(f"Nieznany tryb obszaru strony: {bbox} (dostępne: {', '.join(BBOX_MODES)}).")
+    answers_style = _answers_style(
+        title, _paper_figsize(paper, custom_size), title_fontsize, show_carries, answers_per_page, answer_cols
+    )
+    if not isinstance(problems, Sequence):
+        problems = list(problems)
+    _write_pdf(
+        _answer_tasks(problems, answers_per_page),
+        output_path,
+        page_style={},
+        answers_style=answers_style,
+        backend=backend,
+        text_mode=text_mode,
+        bbox=bbox,
+        jobs=jobs,
+        reproducible=reproducible,
+        page_cache=page_cache if backend == "matplotlib" else None,
+    )
+
+
+def _collecting(problems: Iterable[Problem], kept: list[Problem]) -> Iterator[Problem]:
+    """Przekazuje zadania dalej, zapamiętując je (klucz odpowiedzi do osobnego pliku)."""
+    for problem in problems:
+        kept.append(problem)
+        yield problem
+
+
+def _write_pdf(
+    tasks: Iterable[_PageTask],
+    output_path: Path | str | BinaryIO,
+    *,
+    page_style: dict,
+    answers_style: dict,
+    backend: str,
+    text_mode: str,
+    bbox: str,
+    page_template: bool = False,
+    jobs: int = 1,
+    page_count: int | None = None,
+    reproducible: bool = False,
+    page_cache: OutputCache | None = None,
+) -> None:
+    """
+    Renderuje zadania stron wybranym backendem (w jobs procesach) i zapisuje je w kolejności.
+    reproducible – metadane bez bieżącej daty; page_cache – strony Matplotlib z pamięci
+    podręcznej (patrz build_pdf).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Nieznany backend: {backend} (dostępne: {', '.join(BACKENDS)}).")
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    metadata = _pdf_metadata(reproducible)
+
+    if backend == "native":
+        # Strony zapisywane wprost jako strumienie PDF (czcionki base-14)
+        prepare = partial(
+            _native_chunk, page_style=page_style, answers_style=answers_style, template=page_template, bbox=bbox
+        )
+        with _open_output(output_path) as fh:
+            writer = _NativePdfWriter(
+                fh, template=page_template, bbox=bbox, creation_date=metadata["CreationDate"] if metadata else None
+            )
+            for prepared in _map_chunks(prepare, tasks, 16, jobs):
+                for page in prepared:
+                    writer.add_prepared(page)
+                fh.flush()
+            writer.close()
+        return
+
+    if page_cache is not None:
+        # Strony z pamięci podręcznej lub renderowane pojedynczo, sklejane w kolejności;
+        # data utworzenia jak w PdfPages (SOURCE_DATE_EPOCH, bieżąca albo żadna przy reproducible)
+        render = partial(
+            _cached_matplotlib_chunk,
+            page_style=page_style,
+            answers_style=answers_style,
+            text_mode=text_mode,
+            bbox=bbox,
+            cache=page_cache,
+        )
+        created = _source_date() or (None if reproducible else datetime.now(timezone.utc))
+        with _open_output(output_path) as fh:
+            pages = chain.from_iterable(_map_chunks(render, tasks, 1 if jobs == 1 else 4, jobs))
+            _merge_pdfs(pages, fh, created, dedupe=True)
+        return
+
+    if jobs > 1:
+        # Każdy proces zapisuje ciągły fragment dokumentu; fragmenty są sklejane w kolejności stron
+        chunk_size = 25
+        if page_count is not None:
+            chunk_size = max(1, min(chunk_size, math.ceil(page_count / jobs)))
+        render = partial(
+            _matplotlib_chunk,
+            page_style=page_style,
+            answers_style=answers_style,
+            text_mode=text_mode,
+            bbox=bbox,
+            metadata=metadata,
+        )
+        with _open_output(output_path) as fh:
+            _merge_pdfs(_map_chunks(render, tasks, chunk_size, jobs), fh, dedupe=True)
+        return
+
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with _open_output(output_path) as fh, PdfPages(fh, metadata=metadata) as pdf:
+        for task in tasks:
+            fig = _render_figure(_task_spec(task, page_style, answers_style), text_mode)
+            pdf.savefig(fig, **_save_kwargs(bbox))
+            fh.flush()
+
+
+# --- Warianty arkusza (--variants) --- #
+def variant_seeds(seed: int, count: int) -> list[int]:
+    """
+    Seedy wariantów 1..count wyprowadzone z seeda arkusza (SHA-256, jak --seed-text): niezależne
+    od siebie i od liczby wariantów, więc wariant k można odtworzyć osobno przez --seed.
+    """
+    return [
+        int.from_bytes(hashlib.sha256(f"{seed}/wariant-{k}".encode()).digest()[:8], "big") & 0xFFFFFFFF
+        for k in range(1, count + 1)
+    ]
+
+
+def build_variants_pdf(
+    variants: Sequence[tuple[str, Sequence[Problem]]],
+    output_path: Path | str | BinaryIO | Sequence[Path | str],
+    *,
+    answers_output: Path | str | BinaryIO | Sequence[Path | str] | None = None,
+    jobs: int = 1,
+    **options: object,
+) -> None:
+    """
+    Zapisuje warianty arkusza (tytuł z nagłówkiem ucznia, zadania) o wspólnym układzie i stylu.
+
+    output_path – jedna ścieżka/strumień: warianty po kolei w jednym PDF (obiekty wspólne dla
+    wariantów, np. czcionki i szablony stron, zapisane raz); lista ścieżek (po jednej na wariant):
+    osobne pliki. answers_output analogicznie – klucze wszystkich wariantów w jednym pliku albo
+    osobno; bez niego klucz każdego wariantu następuje po jego arkuszu.
+    jobs – liczba procesów renderujących warianty (0 = liczba rdzeni); każdy wariant powstaje
+    w całości w jednym procesie, a wyniki są zapisywane w kolejności wariantów.
+    options – pozostałe parametry build_pdf (układ, styl, backend, only_pages, page_cache...).
+    """
+    split = isinstance(output_path, (list, tuple))
+    if split and len(output_path) != len(variants):
+        raise ValueError("Lista plików wyjściowych musi mieć po jednym pliku na wariant.")
+    if answers_output is not None and split != isinstance(answers_output, (list, tuple)):
+        raise ValueError("Klucze odpowiedzi zapisuje się tak jak arkusze: jeden plik albo lista plików.")
+    if split and answers_output is not None and len(answers_output) != len(variants):  # type: ignore[arg-type]
+        raise ValueError("Lista plików kluczy musi mieć po jednym pliku na wariant.")
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    separate = answers_output is not None and bool(options.get("include_answers")) and options.get("only_pages") is None
+    render = partial(_variants_chunk, separate_answers=separate, options=options)
+    results = chain.from_iterable(_map_chunks(render, variants, 1, jobs))
+
+    if split:
+        for index, (document, answers) in enumerate(results):
+            Path(output_path[index]).write_bytes(document)
+            if answers is not None:
+                Path(answers_output[index]).write_bytes(answers)  # type: ignore[index]
+        return
+    keys: list[bytes] = []
+
+    def documents() -> Iterator[bytes]:
+        for document, answers in results:
+            if answers is not None:
+                keys.append(answers)
+            yield document
+
+    with _open_output(output_path) as fh:
+        _merge_pdfs(documents(), fh, dedupe=True)
+    if keys:
+        with _open_output(answers_output) as fh:  # type: ignore[arg-type]
+            _merge_pdfs(keys, fh, dedupe=True)
+
+
+def _variants_chunk(
+    variants: Sequence[tuple[str, Sequence[Problem]]], separate_answers: bool, options: dict
+) -> list[tuple[bytes, bytes | None]]:
+    """Proces roboczy build_variants_pdf: każdy wariant jako kompletny PDF (i osobny klucz)."""
+    results = []
+    for title, problems in variants:
+        document = io.BytesIO()
+        answers = io.BytesIO() if separate_answers else None
+        build_pdf(problems, document, title=title, answers_output=answers, **dict(options, jobs=1))
+        results.append((document.getvalue(), answers.getvalue() if answers is not None else None))
+    return results
+
+
+# --- Podgląd bez renderowania / rozgrzewka Matplotlib --- #
+DUMP_FORMATS = ("text", "json")
+
+
+def dump_problems(
+    problems: Sequence[Problem],
+    out: TextIO,
+    *,
+    fmt: str = "text",
+    per_page: int,
+    only_pages: Sequence[int] | None = None,
+    meta: dict[str, object] | None = None,
+) -> int:
+    """
+    Wypisuje zadania z odpowiedziami bez rysowania stron (--dry-run); nie importuje Matplotlib.
+
+    fmt="text" – wiersze jak na stronie odpowiedzi, poprzedzone nagłówkiem strony; fmt="json" –
+    obiekt {**meta, "problems": [{"number", "page", "a", "op", "b", "answer", "carries"}, ...]}.
+    Zadania są wypisywane po kolei (leniwe zestawy nie są materializowane). only_pages ogranicza
+    wynik do wybranych stron arkusza. Zwraca liczbę wypisanych zadań.
+    """
+    if fmt not in DUMP_FORMATS:
+        raise ValueError(f"Nieznany format: {fmt} (dostępne: {', '.join(DUMP_FORMATS)}).")
+    pages = max(1, math.ceil(len(problems) / per_page))
+    selected = sorted(set(only_pages)) if only_pages else range(1, pages + 1)
+    if selected and selected[-1] > pages:
+        raise ValueError(f"Strona {selected[-1]} poza zakresem (zestaw ma {pages} stron).")
+
+    if fmt == "json":
+        # Nagłówek zapisywany ręcznie, żeby lista zadań mogła być pisana strumieniowo
+        out.write("{")
+        for key, value in (meta or {}).items():
+            out.write(f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}, ")
+        out.write('"problems": [')
+    count = 0
+    for page in selected:
+        start = (page - 1) * per_page
+        if fmt == "text":
+            out.write(f"# Strona {page}\n")
+        for idx, pr in enumerate(problems[start : start + per_page], start=start + 1):
+            if fmt == "json":
+                item = {"number": idx, "page": page, "a": int(pr.a), "op": pr.op, "b": int(pr.b)}
+                item["answer"] = int(pr.answer())
+                item["carries"] = pr.carries
+                out.write((",\n  " if count else "\n  ") + json.dumps(item))
+            else:
+                line = f"{idx:>3}. {pr.a} {pr.op} {pr.b} = {pr.answer()}"
+                out.write(line + (f"  [p={pr.carries}]\n" if pr.carries is not None else "\n"))
+            count += 1
+    if fmt == "json":
+        out.write("\n]}\n" if count else "]}\n")
+    return count
+
+
+def warm_font_cache() -> str:
+    """
+    Przygotowuje Matplotlib do pierwszego renderowania: buduje cache czcionek (fontlist),
+    ładuje backendy PDF/Agg i rysuje próbną stronę w obu trybach tekstu. Przydatne w obrazach
+    kontenerów i CI, gdzie pierwsze uruchomienie płaci za skanowanie czcionek systemowych.
+    Zwraca katalog cache Matplotlib (MPLCONFIGDIR).
+    """
+    import matplotlib
+    from matplotlib import font_manager
+
+    font_manager.findfont(_mono_font(12.0))
+    sample = [Problem(47, 38, "+", 1), Problem(52, 17, "-", 1)]
+    for text_mode in TEXT_MODES:
+        fig = draw_answers_page(sample, "Rozgrzewka", (8.27, 11.69), title_fontsize=18, text_mode=text_mode)
+        fig.savefig(io.BytesIO(), format="pdf")
+    return matplotlib.get_cachedir()
+
+
+# --- Pamięć podręczna gotowych PDF --- #
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    parts INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+@lru_cache(maxsize=1)
+def _generator_version() -> str:
+    """Wersja generatora do kluczy cache: __version__ i skrót źródła (zmiana kodu = nowe klucze)."""
+    try:
+        digest = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+    except OSError:  # pragma: no cover
+        digest = "?"
+    return f"{__version__}+{digest}"
+
+
+@lru_cache(maxsize=1)
+def _matplotlib_version() -> str:
+    """Wersja Matplotlib (z metadanych pakietu, bez importu) – inna wersja może inaczej renderować."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("matplotlib")
+    except PackageNotFoundError:  # pragma: no cover
+        return "?"
+
+
+def _default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "math-worksheets"
+
+
+class OutputCache:
+    """
+    Katalog gotowych PDF adresowanych treścią.
+
+    Klucz to SHA-256 kanonicznego zapisu (JSON, posortowane klucze) wszystkich parametrów
+    generowania i renderowania oraz wersji generatora; wpis to jeden lub kilka plików (arkusz,
+    osobny klucz odpowiedzi). Indeks (rozmiar, ostatnie użycie, trafienia) i liczniki są
+    w SQLite, więc z jednego katalogu mogą korzystać równoległe procesy (--manifest-jobs).
+    Po każdym zapisie najdawniej używane wpisy są usuwane, aż całość zmieści się w max_bytes.
+    """
+
+    INDEX = "index.sqlite"
+
+    def __init__(self, directory: str | Path, max_bytes: int = 500 * 2**20) -> None:
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn, conn:
+            conn.executescript(_CACHE_SCHEMA)
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        return closing(sqlite3.connect(str(self.directory / self.INDEX), timeout=30))
+
+    def _part(self, key: str, index: int) -> Path:
+        return self.directory / key[:2] / f"{key}.{index}.pdf"
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str, step: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, step),
+        )
+
+    @staticmethod
+    def key(params: dict[str, object]) -> str:
+        """Klucz wpisu: skrót parametrów (wartości spoza JSON zapisywane przez str) i wersji generatora."""
+        payload = json.dumps(
+            {"generator": _generator_version(), "params": params}, sort_keys=True, default=str, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def fetch(self, key: str, targets: Sequence[str | Path]) -> bool:
+        """Kopiuje pliki wpisu do targets (w tej kolejności, co przy store); False przy chybieniu."""
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT parts FROM entries WHERE key = ?", (key,)).fetchone()
+            hit = row is not None and row[0] == len(targets)
+            if hit:
+                try:
+                    for index, target in enumerate(targets):
+                        shutil.copyfile(self._part(key, index), target)
+                except FileNotFoundError:  # wpis usunięty przez inny proces
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    hit = False
+            if hit:
+                conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self._count(conn, "hits" if hit else "misses")
+        return hit
+
+    def store(self, key: str, sources: Sequence[str | Path]) -> bool:
+        """
+        Zapisuje kopie plików sources pod kluczem i usuwa najdawniej używane wpisy ponad limit.
+        Wpis większy niż cały limit nie jest zapisywany (zwraca False).
+        """
+        size = sum(Path(src).stat().st_size for src in sources)
+        if size > self.max_bytes:
+            return False
+        for index, src in enumerate(sources):
+            self._publish(key, index, partial(shutil.copyfile, src))
+        self._register(key, len(sources), size)
+        return True
+
+    def get(self, key: str) -> bytes | None:
+        """Treść jednoczęściowego wpisu (strona z --incremental) albo None; liczniki page_hits/page_misses."""
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT parts FROM entries WHERE key = ?", (key,)).fetchone()
+            data = None
+            if row is not None and row[0] == 1:
+                try:
+                    data = self._part(key, 0).read_bytes()
+                except FileNotFoundError:  # wpis usunięty przez inny proces
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if data is not None:
+                conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self._count(conn, "page_hits" if data is not None else "page_misses")
+        return data
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Zapisuje data jako jednoczęściowy wpis (jak store, ale z pamięci zamiast z pliku)."""
+        if len(data) > self.max_bytes:
+            return False
+        self._publish(key, 0, lambda tmp: tmp.write_bytes(data))
+        self._register(key, 1, len(data))
+        return True
+
+    def _publish(self, key: str, index: int, write: Callable[[Path], object]) -> None:
+        part = self._part(key, index)
+        part.parent.mkdir(exist_ok=True)
+        # Zapis przez plik tymczasowy: równoległy odczyt nie zobaczy niepełnego PDF
+        tmp = part.with_name(f"{part.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        write(tmp)
+        os.replace(tmp, part)
+
+    def _register(self, key: str, parts: int, size: int) -> None:
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, parts, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, parts, size, time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, parts, size in conn.execute("SELECT key, parts, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            for index in range(parts):
+                self._part(key, index).unlink(missing_ok=True)
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(conn, "evictions")
+            total -= size
+
+    def stats(self) -> dict[str, object]:
+        """
+        Stan pamięci: liczba wpisów, zajęte bajty, limit oraz liczniki trafień, chybień i usunięć
+        (całe dokumenty i osobno strony z --incremental).
+        """
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "directory": str(self.directory),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "page_hits": counters.get("page_hits", 0),
+            "page_misses": counters.get("page_misses", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+
+# Opcje bez wpływu na treść PDF (lub zastępowane niżej wartością kanoniczną);
+# wszystkie pozostałe – także dodane w przyszłości – trafiają do klucza cache
+_CACHE_IGNORED = frozenset(
+    {
+        "output",
+        "answers_output",
+        "jobs",
+        "manifest",
+        "manifest_jobs",
+        "no_cache",
+        "cache_dir",
+        "cache_size",
+        "cache_stats",
+        "dry_run",
+        "format",
+        "warm_cache",
+        "build_bank",
+        "bank_digits",
+        "bank_size",
+        "seed",
+        "seed_text",
+        "bank",
+        "students",
+    }
+)
+
+
+def _cache_params(args: argparse.Namespace, seed: int) -> dict[str, object]:
+    """Kanoniczne parametry arkusza: opcje CLI, efektywny seed, stan banku/listy uczniów i wersja Matplotlib."""
+    params: dict[str, object] = {k: v for k, v in vars(args).items() if k not in _CACHE_IGNORED}
+    params["seed"] = seed
+    params["answers_separate"] = bool(args.answers_output)
+    if args.reproducible:
+        params["source_date_epoch"] = os.environ.get("SOURCE_DATE_EPOCH")
+    # Pliki wejściowe (bank zadań, lista uczniów) – klucz zmienia się razem z ich zawartością
+    for name in ("bank", "students"):
+        path = getattr(args, name)
+        if path:
+            try:
+                st = Path(path).stat()
+                params[name] = [str(Path(path).resolve()), st.st_size, st.st_mtime_ns]
+            except OSError:
+                params[name] = str(path)
+    if args.backend == "matplotlib":
+        params["matplotlib"] = _matplotlib_version()
+    return params
+
+
+# --- Parser argumentów --- #
+def _carries_arg(text: str) -> tuple[int, int | None]:
+    """
+    Specyfikacja liczby przeniesień/pożyczek: "2" (dokładnie 2), "1-3" (od 1 do 3), "2+" (co najmniej 2).
+    """
+    try:
+        if text.endswith("+"):
+            lo, hi = int(text[:-1]), None
+        elif "-" in text:
+            lo_s, hi_s = text.split("-", 1)
+            lo, hi = int(lo_s), int(hi_s)
+        else:
+            lo = hi = int(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            f"niepoprawna specyfikacja przeniesień: {text!r} (np. 2, 1-3, 2+)"
+        ) from exc
+    if lo < 0 or (hi is not None and hi < lo):
+        raise argparse.ArgumentTypeError(f"niepoprawny zakres przeniesień: {text!r}")
+    return lo, hi
+
+
+def _int_list_arg(text: str) -> tuple[int, ...]:
+    """Lista dodatnich liczb rozdzielona przecinkami, np. "1,3" (kolumny, strony, liczby cyfr)."""
+    try:
+        values = tuple(sorted({int(part) for part in text.split(",") if part.strip()}))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"niepoprawna lista liczb: {text!r} (np. 1,3)") from exc
+    if not values or any(v < 1 for v in values):
+        raise argparse.ArgumentTypeError(f"lista musi zawierać liczby >= 1: {text!r}")
+    return values
+
+
+def _build_parser(exit_on_error: bool = True) -> argparse.ArgumentParser:
+    """Parser opcji CLI; exit_on_error=False zgłasza błędne wartości jako argparse.ArgumentError."""
     parser = argparse.ArgumentParser(
+        exit_on_error=exit_on_error,
         description="Generator kart pracy: działania pisemne (+/-) z przeniesieniem/pożyczką oraz opcjami formatowania."
     )
     parser.add_argument(
@@ -686,7 +3579,7 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         "--max-digits",
         type=int,
         default=2,
-        help="Maksymalna liczba cyfr w składnikach (domyślnie 2).",
+        help="Maksymalna liczba cyfr w składnikach (domyślnie 2; powyżej 9 używany jest silnik digits).",
     )
     parser.add_argument(
         "--min-value",
@@ -716,7 +3609,7 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         "--output",
         "-o",
         default="zeszyt_czysty.pdf",
-        help="Ścieżka wyjściowa pliku PDF.",
+        help="Ścieżka wyjściowa pliku PDF; '-' – zapis na standardowe wyjście (strony wysyłane na bieżąco).",
     )
     parser.add_argument(
         "--no-answers",
@@ -772,6 +3665,9 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         # 12 zadań (więcej powietrza): python main.py -n 12 --rows 6
         # 15 zadań: python main.py -n 15 --rows 8
         # 18 zadań (pełna): python main.py -n 18 --rows 9
+        #
+        # Całą rotację można też opisać jednym manifestem (jeden proces zamiast pięciu uruchomień):
+        # python main.py --manifest tydzien.toml --manifest-jobs 0
     )
 
     # --- Nowe opcje formatowania / linii odpowiedzi ---
@@ -912,6 +3808,132 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         default=0.5,
         help="Ułamek zadań będących dodawaniem w trybie mixed (0..1).",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["auto", "python", "numpy", "digits", "counter"],
+        default="auto",
+        help="Silnik losowania: python (po jednej parze), numpy (paczki wektorowe – szybki dla dużych zestawów), "
+        "digits (cyfra po cyfrze, bez limitu cyfr), counter (dostęp swobodny: zadanie i zależy tylko od seeda i i), "
+        "auto (domyślnie: python do 9 cyfr, powyżej digits).",
+    )
+    parser.add_argument(
+        "--carries",
+        type=_carries_arg,
+        default=None,
+        help="Liczba przeniesień (dodawanie) / pożyczek (odejmowanie) w każdym zadaniu: 2 (dokładnie), "
+        "1-3 (zakres), 2+ (co najmniej). Domyślnie co najmniej 1.",
+    )
+    parser.add_argument(
+        "--carry-columns",
+        type=_int_list_arg,
+        default=(),
+        help="Kolumny, w których musi wystąpić przeniesienie/pożyczka, np. 1,3 (1 = jedności).",
+    )
+    parser.add_argument(
+        "--answers-show-carries",
+        action="store_true",
+        help="Na stronie odpowiedzi pokaż liczbę przeniesień/pożyczek każdego zadania.",
+    )
+    parser.add_argument(
+        "--answers-per-page",
+        type=int,
+        default=80,
+        help="Liczba odpowiedzi na stronę klucza (domyślnie 80); większe zestawy dostają kolejne strony. "
+        "0 = wszystkie odpowiedzi na jednej stronie.",
+    )
+    parser.add_argument(
+        "--answer-cols",
+        type=int,
+        default=2,
+        help="Liczba kolumn na stronie klucza odpowiedzi (domyślnie 2).",
+    )
+    parser.add_argument(
+        "--answers-output",
+        default=None,
+        help="Zapisz klucz odpowiedzi do osobnego pliku PDF (tworzony równolegle z arkuszem) zamiast na końcu "
+        "dokumentu.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="matplotlib",
+        help="Silnik zapisu PDF: matplotlib (domyślnie) albo native (bezpośredni zapis PDF czcionkami "
+        "Courier/Helvetica, wielokrotnie szybszy, ten sam układ stron).",
+    )
+    parser.add_argument(
+        "--page-template",
+        action="store_true",
+        help="(z --backend native) Tytuły, kreski i prowadnice zapisz raz jako wspólny szablon stron "
+        "(Form XObject) – mniejszy plik i szybszy zapis długich zestawów.",
+    )
+    parser.add_argument(
+        "--text-mode",
+        choices=TEXT_MODES,
+        default="text",
+        help="Sposób rysowania cyfr zadań i odpowiedzi: text (obiekty tekstowe, domyślnie) albo glyphs "
+        "(ścieżki glifów liczone raz na rozmiar czcionki – szybsze renderowanie, wektorowy PDF).",
+    )
+    parser.add_argument(
+        "--bbox",
+        choices=BBOX_MODES,
+        default="fixed",
+        help="Obszar strony PDF: fixed (domyślnie) – dokładnie wymiary papieru, treść w stałych marginesach; "
+        "tight – przycięty do treści jak dawniej (wolniejszy zapis, rozmiar strony zależy od zawartości).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Liczba procesów renderujących strony (domyślnie 1, 0 = wszystkie rdzenie). Strony są składane "
+        "w kolejności – wynik jak przy renderowaniu sekwencyjnym.",
+    )
+    parser.add_argument(
+        "--pages",
+        type=_int_list_arg,
+        default=None,
+        help="Renderuj tylko wybrane strony, np. 2,5 (bez strony odpowiedzi). Z --engine counter liczone są "
+        "tylko zadania tych stron.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Nie twórz PDF – wypisz na stdout wygenerowane zadania z odpowiedziami (bez ładowania Matplotlib; "
+        "z --pages tylko wybrane strony).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=DUMP_FORMATS,
+        default="text",
+        help="(z --dry-run) Format wypisywanych zadań: text (domyślnie) albo json.",
+    )
+    parser.add_argument(
+        "--bank",
+        default=None,
+        help="Plik banku zadań (SQLite). Zadania są losowane z banku, jeśli pokrywa parametry; inaczej generowane.",
+    )
+    parser.add_argument(
+        "--build-bank",
+        action="store_true",
+        help="Zbuduj / odśwież bank zadań wskazany przez --bank i zakończ (bez tworzenia PDF).",
+    )
+    parser.add_argument(
+        "--bank-digits",
+        type=_int_list_arg,
+        default=None,
+        help="Liczby cyfr zapisywane w banku, np. 2,3,4 (domyślnie --max-digits).",
+    )
+    parser.add_argument(
+        "--bank-size",
+        type=int,
+        default=100_000,
+        help="Liczba zadań w banku na operator i liczbę cyfr (domyślnie 100000).",
+    )
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="Zbuduj cache czcionek Matplotlib i wyrenderuj próbną stronę, po czym zakończ (np. przy budowie "
+        "obrazu kontenera) – pierwsze właściwe renderowanie nie płaci za skanowanie czcionek.",
+    )
     parser.add_argument(
         "--compact-layout",
         action="store_true",
@@ -923,13 +3945,101 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         default=None,
         help="Tekstowy seed (SHA256 → liczba) jako alternatywa dla --seed; pozwala używać słów/etykiet.",
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="Powtarzalny PDF: te same opcje dają identyczne bajty (data utworzenia z SOURCE_DATE_EPOCH "
+        "albo pominięta zamiast bieżącej).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Nie korzystaj z pamięci podręcznej gotowych PDF (zawsze generuj i renderuj od nowa).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Katalog pamięci podręcznej (domyślnie $XDG_CACHE_HOME/math-worksheets lub ~/.cache/math-worksheets).",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=500,
+        help="Limit pamięci podręcznej w MiB; najdawniej używane PDF są usuwane (domyślnie 500).",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Wypisz statystyki pamięci podręcznej (wpisy, rozmiar, trafienia/chybienia) i zakończ.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="(Matplotlib) Renderowanie przyrostowe: strony zapamiętywane pojedynczo w pamięci podręcznej; "
+        "po zmianie części zadań renderowane są tylko zmienione strony, reszta jest sklejana z pamięci.",
+    )
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=0,
+        help="Liczba wariantów arkusza (np. po jednym dla każdego ucznia): ten sam układ i poziom, niezależne "
+        "seedy wyprowadzone z --seed; wszystkie w jednym PDF z nagłówkiem wariantu (albo osobno, "
+        "--variants-split), renderowane równolegle w --jobs procesach.",
+    )
+    parser.add_argument(
+        "--students",
+        default=None,
+        help="Plik z imionami uczniów (po jednym w wierszu, # – komentarz) do nagłówków wariantów; "
+        "bez --variants liczba wariantów = liczba imion.",
+    )
+    parser.add_argument(
+        "--variants-distinct",
+        action="store_true",
+        help="(z --variants) Żadne zadanie nie powtarza się w dwóch wariantach.",
+    )
+    parser.add_argument(
+        "--variants-split",
+        action="store_true",
+        help="(z --variants) Każdy wariant w osobnym pliku: NAZWA_01.pdf, NAZWA_02.pdf... (klucze z "
+        "--answers-output tak samo).",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="Plik JSON/TOML z listą arkuszy (każdy z własnym seedem, trybem i układem) budowanych w jednym "
+        "procesie; pozostałe opcje wiersza poleceń są wartościami domyślnymi dla wszystkich arkuszy.",
+    )
+    parser.add_argument(
+        "--manifest-jobs",
+        type=int,
+        default=1,
+        help="(z --manifest) Liczba procesów budujących arkusze równolegle (domyślnie 1, 0 = wszystkie rdzenie).",
+    )
+    return parser
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    return _build_parser().parse_args(argv)
 
 
 # --- Funkcja główna --- #
-def main(argv: Sequence[str] | None = None) -> int:
-    args = parse_args(argv or sys.argv[1:])
+def _output_arg(text: str) -> Path | str:
+    """Ścieżka wyjściowa z CLI (katalogi tworzone w razie potrzeby) albo "-" dla stdout."""
+    if text == "-":
+        return "-"
+    path = Path(text).expanduser().resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def run(args: argparse.Namespace, *, quiet: bool = False, output: BinaryIO | None = None) -> int:
+    """
+    Buduje jeden arkusz według sparsowanych opcji CLI i zwraca kod wyjścia (0 = sukces).
 
+    quiet pomija komunikaty [INFO]/[OK] (tryb --manifest wypisuje własne podsumowanie);
+    ostrzeżenia i błędy zawsze trafiają na stderr. output – strumień binarny, do którego
+    trafia PDF zamiast pliku args.output (tryb serve).
+    """
     if args.paper == "custom":
         if args.custom_width is None or args.custom_height is None:
             print(
@@ -959,47 +4069,330 @@ def main(argv: Sequence[str] | None = None) -> int:
     if args.post_bar_gap_factor <= 0:
         print("--post-bar-gap-factor musi być dodatnie.", file=sys.stderr)
         return 1
+    if args.jobs < 0:
+        print("--jobs nie może być ujemne.", file=sys.stderr)
+        return 1
+    if args.answers_per_page < 0:
+        print("--answers-per-page nie może być ujemne.", file=sys.stderr)
+        return 1
+    if args.answer_cols < 1:
+        print("--answer-cols musi być >= 1.", file=sys.stderr)
+        return 1
+    if args.cache_size < 0:
+        print("--cache-size nie może być ujemne.", file=sys.stderr)
+        return 1
+    if args.variants < 0:
+        print("--variants nie może być ujemne.", file=sys.stderr)
+        return 1
+    if args.reproducible:
+        try:
+            _source_date()
+        except ValueError as e:
+            print(f"Błąd parametrów: {e}", file=sys.stderr)
+            return 1
+    try:
+        titles = _variant_titles(args)
+    except (OSError, ValueError) as e:
+        print(f"Błąd parametrów: {e}", file=sys.stderr)
+        return 1
+    split = bool(titles) and args.variants_split
+    if split and (output is not None or "-" in (args.output, args.answers_output)):
+        print("--variants-split zapisuje osobne pliki – podaj -o NAZWA.pdf zamiast stdout.", file=sys.stderr)
+        return 2
+
+    if args.page_template and args.backend != "native":
+        print("[WARN] --page-template działa tylko z --backend native – pomijam.", file=sys.stderr)
+    if args.incremental and (args.backend != "matplotlib" or args.no_cache):
+        print("[WARN] --incremental działa tylko z --backend matplotlib i bez --no-cache – pomijam.", file=sys.stderr)
+    if args.answers_output and (args.no_answers or args.pages):
+        print("[WARN] --answers-output bez klucza odpowiedzi (--no-answers / --pages) – pomijam.", file=sys.stderr)
+    if args.format != "text" and not args.dry_run:
+        print("[WARN] --format dotyczy tylko --dry-run – pomijam.", file=sys.stderr)
+    if (args.variants_distinct or args.variants_split) and not titles:
+        print("[WARN] --variants-distinct / --variants-split bez --variants – pomijam.", file=sys.stderr)
+
+    if args.warm_cache:
+        try:
+            cache_dir = warm_font_cache()
+        except Exception as e:  # pragma: no cover
+            print(f"[ERROR] Rozgrzewanie Matplotlib nie powiodło się: {e}", file=sys.stderr)
+            return 3
+        print(f"[OK] Cache czcionek Matplotlib gotowy: {cache_dir}")
+        return 0
+
+    if args.build_bank:
+        if not args.bank:
+            print("--build-bank wymaga podania pliku przez --bank.", file=sys.stderr)
+            return 2
+        digits = args.bank_digits or (args.max_digits,)
+        try:
+            rows = build_bank(args.bank, digits, size=args.bank_size, seed=args.seed)
+        except ValueError as e:
+            print(f"Błąd parametrów: {e}", file=sys.stderr)
+            return 1
+        print(f"[OK] Bank {args.bank}: zapisano {rows} zadań (cyfry: {', '.join(map(str, digits))}).")
+        return 0
+
+    if args.cache_stats:
+        try:
+            stats = _open_cache(args).stats()
+        except (OSError, sqlite3.Error) as e:
+            print(f"[ERROR] Pamięć podręczna niedostępna: {e}", file=sys.stderr)
+            return 1
+        print(f"[INFO] Pamięć podręczna: {stats['directory']}")
+        print(f"  wpisy     : {stats['entries']} ({stats['bytes'] / 2**20:.1f} z {stats['max_bytes'] / 2**20:.0f} MiB)")
+        print(f"  trafienia : {stats['hits']}")
+        print(f"  chybienia : {stats['misses']}")
+        print(f"  strony    : {stats['page_hits']} trafień, {stats['page_misses']} chybień (--incremental)")
+        print(f"  usunięte  : {stats['evictions']}")
+        return 0
+
+    # Wyliczenie efektywnego seed: liczbowy lub z tekstu
+    if args.seed_text:
+        seed_int = int.from_bytes(hashlib.sha256(args.seed_text.encode("utf-8")).digest()[:8], "big") & 0xFFFFFFFF
+    else:
+        seed_int = args.seed
 
+    # Przy zapisie na stdout komunikaty trafiają na stderr, żeby nie psuć strumienia PDF
+    log = sys.stderr if "-" in (args.output, args.answers_output) else sys.stdout
+    if quiet:
+        log = io.StringIO()
+
+    # Powtórzony arkusz (te same parametry) to kopia pliku z pamięci podręcznej – bez generowania
+    # i renderowania. Dotyczy zapisu do plików; stdout i strumienie (serve) zawsze renderują.
+    cache: OutputCache | None = None
+    cache_key = ""
+    targets = [] if args.dry_run else _output_targets(args, len(titles) if split else 0)
+    if not (args.no_cache or args.dry_run or output is not None or "-" in (args.output, args.answers_output)):
+        try:
+            cache = _open_cache(args)
+            cache_key = cache.key(_cache_params(args, seed_int))
+            if cache.fetch(cache_key, targets):
+                print(f"[OK] Gotowe – z pamięci podręcznej ({cache_key[:12]}): {targets[0]}", file=log)
+                return 0
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARN] Pamięć podręczna niedostępna ({e}) – renderuję bez niej.", file=sys.stderr)
+            cache = None
+
+    # --incremental: strony Matplotlib zapamiętywane pojedynczo (także przy zapisie do strumienia)
+    page_cache: OutputCache | None = None
+    if args.incremental and args.backend == "matplotlib" and not (args.no_cache or args.dry_run):
+        try:
+            page_cache = cache or _open_cache(args)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARN] Pamięć podręczna niedostępna ({e}) – renderuję wszystkie strony.", file=sys.stderr)
+
+    # Arkusze do zbudowania: (tytuł, seed, zadania) – jeden albo po jednym na wariant
+    seeds = variant_seeds(seed_int, len(titles))
     try:
-        # Wyliczenie efektywnego seed: liczbowy lub z tekstu
-        if args.seed_text:
-            seed_int = int.from_bytes(hashlib.sha256(args.seed_text.encode("utf-8")).digest()[:8], "big") & 0xFFFFFFFF
+        if titles:
+            sheets = list(zip(titles, seeds, _variant_problems(args, seeds)))
         else:
-            seed_int = args.seed
-        problems = generate_problems(
-            n=args.problems,
-            min_value=args.min_value,
-            max_digits=args.max_digits,
-            unique=args.unique,
-            seed=seed_int,
-            mode=args.mode,
-            mixed_ratio=args.mixed_ratio,
-        )
+            sheets = [(args.title, seed_int, _generate_problems(args, seed_int))]
     except ValueError as e:
         print(f"Błąd parametrów: {e}", file=sys.stderr)
         return 1
 
-    output_path = Path(args.output).expanduser().resolve()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if args.dry_run:
+        # Warianty: nagłówek przed każdym (text) albo lista obiektów (json)
+        if titles and args.format == "json":
+            sys.stdout.write("[")
+        try:
+            for k, (title, seed, problems) in enumerate(sheets, start=1):
+                meta = {"count": len(problems), "seed": seed, "mode": args.mode, "max_digits": args.max_digits}
+                if titles:
+                    meta = {"variant": k, "title": title, **meta}
+                    if args.format == "text":
+                        sys.stdout.write(f"## {title} (seed {seed})\n")
+                    elif k > 1:
+                        sys.stdout.write(",")
+                dump_problems(
+                    problems, sys.stdout, fmt=args.format, per_page=args.cols * args.rows, only_pages=args.pages, meta=meta
+                )
+        except ValueError as e:
+            print(f"Błąd parametrów: {e}", file=sys.stderr)
+            return 1
+        if titles and args.format == "json":
+            sys.stdout.write("]\n")
+        return 0
 
-    print(
-        f"[INFO] Generuję {len(problems)} zadań (max {args.max_digits} cyfry), zapis do: {output_path}"
-    )
+    output_path: Path | str | BinaryIO = output if output is not None else _output_arg(args.output)
+    destination = "stdout" if output_path == "-" else output_path
+    if split:
+        destination = f"{targets[0]} … {targets[len(titles) - 1]}"
+    if titles:
+        print(
+            f"[INFO] Generuję {len(titles)} wariantów po {args.problems} zadań (max {args.max_digits} cyfry), "
+            f"zapis do: {destination}",
+            file=log,
+        )
+        for title, seed, _problems in sheets:
+            print(f"[INFO]   {title}: seed {seed}", file=log)
+    else:
+        print(
+            f"[INFO] Generuję {len(sheets[0][2])} zadań (max {args.max_digits} cyfry), zapis do: {destination}",
+            file=log,
+        )
     if args.answer_lines:
         print(
-            f"[INFO] Linie odpowiedzi: {args.answer_lines} (spacing={args.answer_line_spacing}, width={args.answer_line_width})"
+            f"[INFO] Linie odpowiedzi: {args.answer_lines} (spacing={args.answer_line_spacing}, width={args.answer_line_width})",
+            file=log,
         )
 
+    answers_output = _output_arg(args.answers_output) if args.answers_output else None
     try:
-        build_pdf(
-        problems=problems,
-        output_path=output_path,
+        if titles:
+            build_variants_pdf(
+                [(title, problems) for title, _seed, problems in sheets],
+                targets[: len(titles)] if split else output_path,
+                answers_output=(targets[len(titles) :] or None) if split else answers_output,
+                page_cache=page_cache,
+                **_pdf_options(args, custom_size),
+            )
+        else:
+            build_pdf(
+                sheets[0][2],
+                output_path,
+                title=args.title,
+                answers_output=answers_output,
+                page_cache=page_cache,
+                **_pdf_options(args, custom_size),
+            )
+    except Exception as e:  # pragma: no cover
+        print(f"[ERROR] Generowanie PDF nie powiodło się: {e}", file=sys.stderr)
+        return 3
+
+    if cache is not None:
+        try:
+            cache.store(cache_key, targets)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARN] Nie zapisano PDF w pamięci podręcznej: {e}", file=sys.stderr)
+    print("[OK] Gotowe.", file=log)
+    return 0
+
+
+def _output_targets(args: argparse.Namespace, split: int = 0) -> list[Path | str]:
+    """Pliki wynikowe: arkusz i osobny klucz odpowiedzi; split > 0 – po jednym na każdy z split wariantów."""
+    outputs = [_output_arg(args.output)]
+    if args.answers_output and not (args.no_answers or args.pages):
+        outputs.append(_output_arg(args.answers_output))
+    if not split:
+        return outputs
+    width = max(2, len(str(split)))
+    return [
+        Path(out).with_name(f"{Path(out).stem}_{k:0{width}d}{Path(out).suffix}")
+        for out in outputs
+        for k in range(1, split + 1)
+    ]
+
+
+def _variant_titles(args: argparse.Namespace) -> list[str]:
+    """
+    Nagłówki wariantów: tytuł z imieniem ucznia (--students) albo z numerem wariantu;
+    pusta lista bez --variants/--students. OSError/ValueError przy błędnej liście uczniów.
+    """
+    if not args.students:
+        return [f"{args.title} – wariant {k}" for k in range(1, args.variants + 1)]
+    text = Path(args.students).expanduser().read_text(encoding="utf-8")
+    names = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    if not names:
+        raise ValueError(f"Plik {args.students} nie zawiera imion.")
+    if args.variants and args.variants != len(names):
+        raise ValueError(f"--variants {args.variants} nie zgadza się z liczbą imion w {args.students} ({len(names)}).")
+    return [f"{args.title} – {name}" for name in names]
+
+
+def _variant_problems(args: argparse.Namespace, seeds: Sequence[int]) -> list[Sequence[Problem]]:
+    """
+    Zestawy zadań wariantów, każdy z własnego seeda. Z --variants-distinct zadanie (a, op, b)
+    z wcześniejszego wariantu nie trafia do kolejnych: powtórzenie jest zastępowane, na tym samym
+    miejscu, zadaniem tego samego działania z dodatkowych losowań (seed pochodny, te same opcje –
+    ten sam poziom trudności), więc liczby dodawań i odejmowań wariantu się nie zmieniają.
+    Przy --unique a + b i b + a to to samo zadanie (jak w generatorze).
+    """
+    if not args.variants_distinct:
+        return [_generate_problems(args, seed) for seed in seeds]
+
+    def key(problem: Problem) -> tuple[int, str, int]:
+        a, b = int(problem.a), int(problem.b)
+        if args.unique and problem.op == "+" and a > b:
+            a, b = b, a
+        return a, problem.op, b
+
+    used: set[tuple[int, str, int]] = set()
+    sets: list[Sequence[Problem]] = []
+    for seed in seeds:
+        problems: list[Problem] = list(_generate_problems(args, seed))
+        own: set[tuple[int, str, int]] = set()
+        # Miejsca powtórzeń do uzupełnienia, osobno dla każdego działania
+        missing: dict[str, deque[int]] = {"+": deque(), "-": deque()}
+        for index, problem in enumerate(problems):
+            k = key(problem)
+            if k in used or (args.unique and k in own):
+                missing[problem.op].append(index)
+            else:
+                own.add(k)
+        extra_seeds = iter(variant_seeds(seed, 20))
+        while missing["+"] or missing["-"]:
+            extra_seed = next(extra_seeds, None)
+            if extra_seed is None:
+                left = len(missing["+"]) + len(missing["-"])
+                raise ValueError(
+                    f"Za mało różnych zadań na {len(seeds)} wariantów po {args.problems} bez powtórzeń "
+                    f"(wariant {len(sets) + 1}: {len(problems) - left}) – zwiększ --max-digits "
+                    "albo zmniejsz -n / --variants."
+                )
+            for problem in _generate_problems(args, extra_seed):
+                k = key(problem)
+                if not missing[problem.op] or k in used or (args.unique and k in own):
+                    continue
+                problems[missing[problem.op].popleft()] = problem
+                own.add(k)
+        used |= own
+        sets.append(problems)
+    return sets
+
+
+def _generate_problems(args: argparse.Namespace, seed: int) -> Sequence[Problem]:
+    """Zestaw zadań arkusza według opcji CLI dla podanego seeda (ValueError przy złych parametrach)."""
+    if args.engine == "counter":
+        # Leniwy zestaw: liczone są tylko zadania renderowanych stron
+        return ProblemStream(
+            n=args.problems,
+            min_value=args.min_value,
+            max_digits=args.max_digits,
+            unique=args.unique,
+            seed=seed,
+            mode=args.mode,
+            mixed_ratio=args.mixed_ratio,
+            carries=args.carries,
+            carry_columns=args.carry_columns,
+        )
+    # Silnik numpy: zwarty ProblemSet bez tworzenia obiektów Problem
+    generate = generate_problem_set if args.engine == "numpy" else generate_problems
+    return generate(
+        n=args.problems,
+        min_value=args.min_value,
+        max_digits=args.max_digits,
+        unique=args.unique,
+        seed=seed,
+        mode=args.mode,
+        mixed_ratio=args.mixed_ratio,
+        engine=args.engine,
+        carries=args.carries,
+        carry_columns=args.carry_columns,
+        bank=args.bank,
+    )
+
+
+def _pdf_options(args: argparse.Namespace, custom_size: Tuple[float, float] | None) -> dict[str, object]:
+    """Parametry build_pdf z opcji CLI (bez zadań, wyjścia, tytułu, osobnego klucza i pamięci stron)."""
+    return dict(
         cols=args.cols,
         rows=args.rows,
         include_answers=not args.no_answers,
         paper=args.paper,
         custom_size=custom_size,
-        title=args.title,
         problem_fontsize=args.problem_fontsize,
         number_fontsize=args.number_fontsize,
         title_fontsize=args.title_fontsize,
@@ -1023,14 +4416,545 @@ def main(argv: Sequence[str] | None = None) -> int:
         digit_guides_alpha=args.digit_guides_alpha,
         number_color=args.number_color,
         hide_numbers=args.hide_numbers,
+        show_carries=args.answers_show_carries,
+        only_pages=args.pages,
+        text_mode=args.text_mode,
+        backend=args.backend,
+        page_template=args.page_template,
+        jobs=args.jobs,
+        bbox=args.bbox,
+        answers_per_page=args.answers_per_page,
+        answer_cols=args.answer_cols,
+        reproducible=args.reproducible,
+        carries=args.carries,
+        carry_columns=args.carry_columns or (),
     )
+
+
+def _open_cache(args: argparse.Namespace) -> OutputCache:
+    directory = Path(args.cache_dir).expanduser() if args.cache_dir else _default_cache_dir()
+    return OutputCache(directory, max_bytes=args.cache_size * 2**20)
+
+
+# --- Tryb wsadowy (--manifest) --- #
+# Opcje, których nie można ustawiać dla pojedynczego arkusza w manifeście
+_MANIFEST_FORBIDDEN = frozenset({"manifest", "manifest_jobs", "build_bank", "warm_cache", "cache_stats"})
+# Ścieżki w manifeście są względne wobec katalogu manifestu (nie bieżącego katalogu)
+_MANIFEST_PATHS = frozenset({"output", "answers_output", "bank", "cache_dir", "students"})
+
+
+def _load_manifest(path: Path) -> tuple[dict, list[dict]]:
+    """Wczytuje manifest JSON/TOML: opcjonalna tabela "defaults" i niepusta lista "jobs"."""
+    raw = path.read_bytes()
+    if path.suffix.lower() == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib  # type: ignore[no-redef]
+            except ImportError:
+                raise ValueError("manifest TOML wymaga Pythona 3.11+ albo pakietu tomli (lub użyj JSON).") from None
+        data = tomllib.loads(raw.decode("utf-8"))
+    else:
+        data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("manifest musi być obiektem z kluczem 'jobs'.")
+    defaults, jobs = data.get("defaults", {}), data.get("jobs")
+    if not isinstance(defaults, dict):
+        raise ValueError("'defaults' musi być tabelą opcji.")
+    if not isinstance(jobs, list) or not jobs or not all(isinstance(job, dict) for job in jobs):
+        raise ValueError("'jobs' musi być niepustą listą tabel opcji.")
+    return defaults, jobs
+
+
+def _option_tokens(
+    options: dict,
+    actions: dict[str, argparse.Action],
+    base_dir: Path,
+    forbidden: frozenset[str] = _MANIFEST_FORBIDDEN,
+) -> tuple[list[str], dict[str, bool]]:
+    """
+    Zamienia opcje arkusza z manifestu lub żądania serve (nazwy jak w CLI, z '-' lub '_')
+    na argumenty parsera; wartości logiczne flag są zwracane osobno, żeby false mogło
+    wyłączyć flagę włączoną w wierszu poleceń lub w "defaults".
+    """
+    tokens: list[str] = []
+    flags: dict[str, bool] = {}
+    for key, value in options.items():
+        dest = str(key).replace("-", "_")
+        action = actions.get(dest)
+        if action is None or not action.option_strings:
+            raise ValueError(f"nieznana opcja {key!r}.")
+        if dest in forbidden:
+            raise ValueError(f"opcja {key!r} nie jest tu dozwolona.")
+        if action.nargs == 0:
+            if not isinstance(value, bool):
+                raise ValueError(f"opcja {key!r} przyjmuje true/false.")
+            flags[dest] = value
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ",".join(map(str, value))
+        elif dest in _MANIFEST_PATHS and value != "-":
+            value = base_dir / Path(str(value)).expanduser()
+        tokens += [max(action.option_strings, key=len), str(value)]
+    return tokens, flags
+
+
+def _manifest_jobs(args: argparse.Namespace, path: Path) -> list[argparse.Namespace]:
+    """
+    Opcje wszystkich arkuszy manifestu: wiersz poleceń < "defaults" < opcje arkusza.
+    Całość jest sprawdzana przed zbudowaniem pierwszego arkusza.
+    """
+    defaults, jobs = _load_manifest(path)
+    parser = _build_parser(exit_on_error=False)
+    actions = {action.dest: action for action in parser._actions}
+    result: list[argparse.Namespace] = []
+    outputs: set[Path] = set()
+    for number, job in enumerate(jobs, start=1):
+        options = {**defaults, **job}
+        try:
+            tokens, flags = _option_tokens(options, actions, path.parent)
+        except ValueError as e:
+            raise ValueError(f"arkusz {number}: {e}") from e
+        # Nie-domyślne wartości z wiersza poleceń zostają, parser nadpisuje tylko podane opcje
+        namespace = argparse.Namespace(**vars(args))
+        namespace.manifest = None
+        if any(k.replace("-", "_") == "seed" for k in job) and not any(
+            k.replace("-", "_") == "seed_text" for k in job
+        ):
+            namespace.seed_text = None
+        try:
+            namespace = parser.parse_args(tokens, namespace=namespace)
+        except argparse.ArgumentError as e:
+            raise ValueError(f"arkusz {number}: {e}") from e
+        vars(namespace).update(flags)
+        if not any(k.replace("-", "_") == "output" for k in options) or namespace.output == "-":
+            raise ValueError(f"arkusz {number}: każdy arkusz wymaga własnego pliku 'output'.")
+        target = Path(namespace.output).expanduser().resolve()
+        if target in outputs:
+            raise ValueError(f"arkusz {number}: plik {target} występuje w manifeście więcej niż raz.")
+        outputs.add(target)
+        result.append(namespace)
+    return result
+
+
+def _manifest_job(args: argparse.Namespace) -> tuple[int, float]:
+    """Proces roboczy --manifest: buduje jeden arkusz, zwraca (kod wyjścia, czas w sekundach)."""
+    start = time.perf_counter()
+    try:
+        code = run(args, quiet=True)
     except Exception as e:  # pragma: no cover
-        print(f"[ERROR] Generowanie PDF nie powiodło się: {e}", file=sys.stderr)
-        return 3
+        print(f"[ERROR] {args.output}: {e}", file=sys.stderr)
+        code = 3
+    return code, time.perf_counter() - start
+
+
+def run_manifest(args: argparse.Namespace) -> int:
+    """
+    Buduje wszystkie arkusze manifestu w jednym procesie (albo w --manifest-jobs procesach),
+    współdzieląc importy, czcionki i układy stron, i wypisuje podsumowanie arkusz po arkuszu.
+    Zwraca 0, gdy wszystkie arkusze powstały, 1 przy błędzie któregokolwiek, 2 przy błędnym manifeście.
+    """
+    path = Path(args.manifest).expanduser()
+    if args.build_bank or args.warm_cache:
+        print("--manifest nie łączy się z --build-bank / --warm-cache.", file=sys.stderr)
+        return 2
+    if args.manifest_jobs < 0:
+        print("--manifest-jobs nie może być ujemne.", file=sys.stderr)
+        return 1
+    try:
+        jobs = _manifest_jobs(args, path)
+    except (OSError, ValueError) as e:
+        print(f"Błąd manifestu {path}: {e}", file=sys.stderr)
+        return 2
+
+    workers = min(args.manifest_jobs or os.cpu_count() or 1, len(jobs))
+    # --dry-run wypisuje zadania na stdout – arkusze po kolei, podsumowanie na stderr
+    log = sys.stderr if args.dry_run else sys.stdout
+    if args.dry_run:
+        workers = 1
+    print(f"[INFO] Manifest {path}: {len(jobs)} arkuszy, procesy: {workers}", file=log)
+    start = time.perf_counter()
+    failed = 0
+    with ExitStack() as stack:
+        if workers > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(workers))
+            results: Iterable[tuple[int, float]] = pool.map(_manifest_job, jobs)
+        else:
+            results = map(_manifest_job, jobs)
+        for number, (job, (code, seconds)) in enumerate(zip(jobs, results), start=1):
+            failed += code != 0
+            status = "OK" if code == 0 else f"BŁĄD ({code})"
+            print(
+                f"  [{number}/{len(jobs)}] {status:<9} {job.output} – {job.problems} zadań, {seconds:.2f} s",
+                file=log,
+            )
+    elapsed = time.perf_counter() - start
+    status = "OK" if not failed else "ERROR"
+    print(f"[{status}] Manifest: {len(jobs) - failed}/{len(jobs)} arkuszy w {elapsed:.2f} s", file=log)
+    return 0 if not failed else 1
+
+
+# --- Usługa HTTP (serve) --- #
+# Opcje, których klient usługi nie ustawia: pliki po stronie serwera, tryby wsadowe, procesy
+_SERVE_FORBIDDEN = _MANIFEST_FORBIDDEN | {
+    "output",
+    "answers_output",
+    "bank",
+    "jobs",
+    "cache_dir",
+    "cache_size",
+    "incremental",
+    "students",
+    "variants_split",
+}
+_SERVE_MAX_BODY = 64 * 1024
+# Najdłuższe składniki w usłudze – koszt przestrzeni par (PairSpace) i układu strony rośnie z liczbą cyfr
+_SERVE_MAX_DIGITS = 18
+
+
+def _serve_worker_init() -> None:
+    """Start procesu roboczego serve: Matplotlib i czcionki ładowane przed pierwszym żądaniem."""
+    # Ctrl+C trafia do całej grupy procesów – pulę zamyka proces główny
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    warm_font_cache()
+
+
+def _serve_job(args: argparse.Namespace) -> tuple[int, bytes, str]:
+    """
+    Proces roboczy serve: buduje arkusz w pamięci (z --dry-run – wypisuje zadania).
+    Zwraca (kod wyjścia run, treść odpowiedzi, komunikaty ze stderr).
+    """
+    pdf, text, errors = io.BytesIO(), io.StringIO(), io.StringIO()
+    with redirect_stdout(text), redirect_stderr(errors):
+        try:
+            code = run(args, quiet=True, output=pdf)
+        except Exception as e:  # pragma: no cover
+            print(f"[ERROR] {e}", file=sys.stderr)
+            code = 3
+    body = text.getvalue().encode("utf-8") if args.dry_run else pdf.getvalue()
+    return code, body, errors.getvalue()
+
+
+class WorksheetService:
+    """
+    Budowanie arkuszy na żądanie w puli rozgrzanych procesów (rdzeń usługi `serve`).
+
+    Opcje żądania to obiekt JSON z nazwami jak w CLI / manifeście; defaults – argumenty CLI
+    stosowane przed opcjami żądania (domyślny backend usługi to native). Najwyżej `workers` arkuszy powstaje naraz, kolejne
+    `queue_size` czeka w kolejce; nadmiarowe żądania dostają 503, a niezakończone w `timeout`
+    sekund – 504 (procesy puli są wtedy kończone, a pula zastępowana nową). Obiekt jest
+    bezpieczny dla wątków (jeden na serwer HTTP).
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 2,
+        queue_size: int = 16,
+        timeout: float = 30.0,
+        max_problems: int = 2000,
+        defaults: Sequence[str] = (),
+    ) -> None:
+        if workers < 1 or queue_size < 0 or timeout <= 0 or max_problems < 1:
+            raise ValueError("workers i max_problems muszą być >= 1, queue_size >= 0, a timeout dodatni.")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_problems = max_problems
+        self._parser = _build_parser(exit_on_error=False)
+        self._actions = {action.dest: action for action in self._parser._actions}
+        self._defaults = self._parser.parse_args(["--backend", "native", *defaults])
+        self._lock = threading.Lock()
+        # Zastępowanie puli (rozgrzewanie nowej trwa) – inne wątki czekają, a nie budują kolejnej
+        self._restart_lock = threading.Lock()
+        self._pending = 0
+        # Arkusze zajmujące miejsce w kolejce – miejsce zwalnia się raz (koniec pracy albo timeout)
+        self._active: set[Future] = set()
+        self._served = 0
+        self._rejected = 0
+        self._pool = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(self.workers, initializer=_serve_worker_init)
+        # Procesy startują (i ładują Matplotlib) od razu, a nie przy pierwszych żądaniach
+        try:
+            for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        return pool
+
+    def job_args(self, options: dict) -> argparse.Namespace:
+        """
+        Opcje arkusza z żądania: defaults usługi < opcje żądania. ValueError przy błędach,
+        także przy warunkach, których nie spełnia żadna para (sprawdzane przed wysłaniem do puli).
+        """
+        tokens, flags = _option_tokens(options, self._actions, Path("."), _SERVE_FORBIDDEN)
+        namespace = argparse.Namespace(**vars(self._defaults))
+        try:
+            namespace = self._parser.parse_args(tokens, namespace=namespace)
+        except argparse.ArgumentError as e:
+            raise ValueError(str(e)) from e
+        vars(namespace).update(flags)
+        if namespace.problems * max(1, namespace.variants) > self.max_problems:
+            raise ValueError(
+                f"najwyżej {self.max_problems} zadań na żądanie (podano {namespace.problems}"
+                + (f" × {namespace.variants} wariantów)." if namespace.variants > 1 else ").")
+            )
+        if namespace.max_digits > _SERVE_MAX_DIGITS:
+            raise ValueError(f"najwyżej {_SERVE_MAX_DIGITS} cyfr w składnikach (podano {namespace.max_digits}).")
+        # ProblemStream liczy przestrzenie par bez losowania: niemożliwy zakres (np. odejmowanie
+        # z min_value 99 przy 2 cyfrach) albo za mało unikalnych par to 400, a nie zajęty proces
+        _resolve_engine(
+            namespace.engine,
+            namespace.max_digits,
+            namespace.mode,
+            namespace.mixed_ratio,
+            namespace.unique,
+            namespace.carries,
+            namespace.carry_columns or (),
+        )
+        ProblemStream(
+            n=namespace.problems,
+            min_value=namespace.min_value,
+            max_digits=namespace.max_digits,
+            unique=namespace.unique,
+            mode=namespace.mode,
+            mixed_ratio=namespace.mixed_ratio,
+            carries=namespace.carries,
+            carry_columns=namespace.carry_columns or (),
+        )
+        namespace.jobs = 1
+        return namespace
+
+    def _submit(self, args: argparse.Namespace) -> tuple[Future, ProcessPoolExecutor] | None:
+        """Kolejkuje arkusz (zwraca go razem z pulą) albo zwraca None, gdy kolejka jest pełna."""
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self._rejected += 1
+                return None
+            self._pending += 1
+            pool = self._pool
+        try:
+            future = pool.submit(_serve_job, args)
+        except BrokenProcessPool:
+            self._release(None)
+            self._restart(pool)
+            raise
+        with self._lock:
+            self._active.add(future)
+        # Miejsce w kolejce zwalnia koniec pracy procesu albo przekroczenie timeout (co pierwsze)
+        future.add_done_callback(self._release)
+        return future, pool
+
+    def _release(self, future: Future | None) -> None:
+        with self._lock:
+            if future is not None:
+                if future not in self._active:
+                    return
+                self._active.discard(future)
+            self._pending -= 1
+
+    def _restart(self, broken: ProcessPoolExecutor, *, terminate: bool = False) -> None:
+        """
+        Zastępuje pulę, w której zginął proces roboczy (raz, nawet przy wielu wątkach).
+        terminate=True – najpierw kończy jej procesy: arkusz po przekroczeniu timeout nie zajmuje
+        już rdzenia, a pozostałe arkusze tej puli kończą się błędem BrokenProcessPool.
+        Nowa pula jest rozgrzewana (_start_pool), zanim zastąpi starą.
+        """
+        if terminate:
+            for process in list((broken._processes or {}).values()):
+                process.terminate()
+        with self._restart_lock:
+            if self._pool is not broken:
+                return
+            pool = self._start_pool()
+            with self._lock:
+                self._pool = pool
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "served": self._served,
+                "rejected": self._rejected,
+            }
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, str, bytes]:
+        """
+        Obsługuje żądanie: POST /worksheet (opcje JSON → PDF albo, z "dry_run", zadania
+        w formacie "format"), GET /health (stan kolejki). Zwraca (status HTTP, Content-Type, treść).
+        """
+        path = path.split("?", 1)[0]
+        if path == "/health" and method == "GET":
+            return 200, "application/json", json.dumps(self.stats()).encode("utf-8")
+        if path != "/worksheet":
+            return _json_error(404, f"nieznana ścieżka {path} (dostępne: POST /worksheet, GET /health).")
+        if method != "POST":
+            return _json_error(405, "/worksheet przyjmuje tylko POST z opcjami JSON.")
+        try:
+            options = json.loads(body or b"{}")
+            if not isinstance(options, dict):
+                raise ValueError("oczekiwano obiektu JSON z opcjami arkusza.")
+            args = self.job_args(options)
+        except ValueError as e:
+            return _json_error(400, str(e))
+
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                submitted = self._submit(args)
+                if submitted is None:
+                    return _json_error(503, "kolejka żądań jest pełna – spróbuj ponownie za chwilę.")
+                future, pool = submitted
+                code, content, errors = future.result(timeout=self.timeout)
+                break
+            except FutureTimeoutError:
+                if not future.cancel():
+                    # Trwającego arkusza nie da się anulować – kończymy procesy puli
+                    self._restart(pool, terminate=True)
+                self._release(future)
+                return _json_error(504, f"arkusz nie powstał w {self.timeout:g} s.")
+            except (BrokenProcessPool, CancelledError):
+                # Pulę zastąpił już inny wątek (np. po timeout innego arkusza) – arkusz idzie do nowej puli
+                if attempt == 0 and self._pool is not pool:
+                    continue
+                self._restart(pool)
+                return _json_error(500, "proces roboczy zakończył się nieoczekiwanie.")
+        if code != 0:
+            lines = errors.strip().splitlines()
+            return _json_error(400 if code in (1, 2) else 500, lines[-1] if lines else f"kod wyjścia {code}")
+        with self._lock:
+            self._served += 1
+        if not args.dry_run:
+            return 200, "application/pdf", content
+        return 200, "application/json" if args.format == "json" else "text/plain; charset=utf-8", content
+
+    def close(self) -> None:
+        """Zamyka pulę: oczekujące arkusze są anulowane, trwające – dokończone."""
+        self._pool.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> WorksheetService:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _json_error(status: int, message: str) -> tuple[int, str, bytes]:
+    return status, "application/json", json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+
+
+def make_server(service: WorksheetService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """
+    Serwer HTTP (wątek na połączenie, keep-alive) przekazujący żądania do service.handle.
+    Port 0 wybiera wolny port (server.server_address). Uruchomienie: server.serve_forever().
+    """
+    # http.server ładowany dopiero tutaj – nie spowalnia startu zwykłego generowania
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        timeout = 60  # bezczynne połączenia keep-alive nie blokują wątków bez końca
+        disable_nagle_algorithm = True  # nagłówki i PDF idą osobno – bez czekania na ACK klienta
+
+        def _dispatch(self) -> None:
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if not 0 <= length <= _SERVE_MAX_BODY:
+                self.close_connection = True
+                message = f"opcje JSON mogą mieć najwyżej {_SERVE_MAX_BODY} bajtów."
+                status, content_type, body = _json_error(413, message)
+            else:
+                status, content_type, body = service.handle(self.command, self.path, self.rfile.read(length))
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if status == 503:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = _dispatch
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
 
-    print("[OK] Gotowe.")
+def serve_main(argv: Sequence[str]) -> int:
+    """Wejście `python main.py serve ...`: lokalna usługa HTTP z pulą rozgrzanych procesów."""
+    parser = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Lokalna usługa HTTP: POST /worksheet z opcjami arkusza w JSON (nazwy jak w CLI) zwraca PDF.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Adres nasłuchu (domyślnie tylko localhost).")
+    parser.add_argument("--port", type=int, default=8765, help="Port (domyślnie 8765, 0 = dowolny wolny).")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Liczba rozgrzanych procesów = arkuszy budowanych naraz (domyślnie liczba rdzeni, najwyżej 4).",
+    )
+    parser.add_argument("--queue", type=int, default=16, help="Ile żądań może czekać na wolny proces (domyślnie 16).")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Limit czasu jednego arkusza w s (domyślnie 30).")
+    parser.add_argument("--max-problems", type=int, default=2000, help="Najwięcej zadań na arkusz (domyślnie 2000).")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="native",
+        help="Domyślny backend arkuszy (domyślnie native – kilka ms na stronę; żądanie może wybrać matplotlib).",
+    )
+    args = parser.parse_args(argv)
+
+    # SIGTERM (np. systemd, docker stop) kończy usługę tak jak Ctrl+C – także w trakcie startu
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        service = WorksheetService(
+            workers=args.workers,
+            queue_size=args.queue,
+            timeout=args.timeout,
+            max_problems=args.max_problems,
+            defaults=["--backend", args.backend],
+        )
+    except ValueError as e:
+        print(f"Błąd parametrów: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    with service:
+        try:
+            server = make_server(service, args.host, args.port)
+        except OSError as e:
+            print(f"[ERROR] Nie można nasłuchiwać na {args.host}:{args.port}: {e}", file=sys.stderr)
+            return 1
+        host, port = server.server_address[:2]
+        print(f"[INFO] Usługa: http://{host}:{port}/worksheet (procesy: {args.workers}, kolejka: {args.queue})")
+        with server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
     return 0
 
 
+def main(argv: Sequence[str] | None = None) -> int:
+    argv = list(argv or sys.argv[1:])
+    if argv[:1] == ["serve"]:
+        return serve_main(argv[1:])
+    args = parse_args(argv)
+    if args.manifest:
+        return run_manifest(args)
+    return run(args)
+
+
 if __name__ == "__main__":
     sys.exit(main())
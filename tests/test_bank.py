@@ -0,0 +1,54 @@
+"""Bank zadań (SQLite): losowanie z banku respektuje parametry, a gdy ich nie pokrywa – generator liczy sam."""
+
+from __future__ import annotations
+
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+import main as worksheet
+
+
+@pytest.fixture(scope="module")
+def bank(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    path = tmp_path_factory.mktemp("bank") / "bank.sqlite"
+    worksheet.build_bank(path, (3,), size=3000, seed=5)
+    return path
+
+
+def _bank_pairs(path: Path) -> set[tuple[str, int, int]]:
+    with closing(sqlite3.connect(str(path))) as conn:
+        return set(conn.execute("SELECT op, a, b FROM problems"))
+
+
+@pytest.mark.parametrize("mode", ["addition", "subtraction", "mixed"])
+def test_bank_honours_min_value_and_carries(bank: Path, mode: str) -> None:
+    problems = worksheet.generate_problems(
+        60, min_value=150, max_digits=3, mode=mode, carries=(2, 2), bank=bank, seed=1
+    )
+    stored = _bank_pairs(bank)
+    assert len(problems) == 60
+    for p in problems:
+        assert (p.op, p.a, p.b) in stored
+        assert min(p.a, p.b) >= 150
+        count = worksheet.count_carries(p.a, p.b) if p.op == "+" else worksheet.count_borrows(p.a, p.b)
+        assert p.carries == count == 2
+
+
+def test_bank_honours_unique(bank: Path) -> None:
+    problems = worksheet.generate_problems(
+        400, max_digits=3, mode="mixed", unique=True, bank=bank, seed=2
+    )
+    assert {(p.op, p.a, p.b) for p in problems} <= _bank_pairs(bank)
+    keys = {(p.op, *sorted((p.a, p.b))) if p.op == "+" else (p.op, p.a, p.b) for p in problems}
+    assert len(keys) == len(problems)
+
+
+def test_bank_without_matching_rows_falls_back_to_generator(bank: Path) -> None:
+    # Bank przechowuje tylko zadania z przeniesieniem, więc carries=(0, 0) liczy generator
+    options = dict(max_digits=3, carries=(0, 0), seed=3)
+    problems = worksheet.generate_problems(30, bank=bank, **options)
+    assert problems == worksheet.generate_problems(30, **options)
+    assert all(p.carries == 0 for p in problems)
@@ -0,0 +1,44 @@
+"""--manifest: wczytywanie opcji arkuszy i odrzucanie opcji niedozwolonych w manifeście."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import main as worksheet
+
+
+def _write_manifest(tmp_path: Path, jobs: list[dict], defaults: dict | None = None) -> Path:
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"defaults": defaults or {}, "jobs": jobs}), encoding="utf-8")
+    return path
+
+
+def test_manifest_jobs_layer_defaults_and_resolve_paths(tmp_path: Path) -> None:
+    path = _write_manifest(
+        tmp_path,
+        [{"output": "a.pdf", "seed": 3}, {"output": "b.pdf", "problems": 12, "digit-guides": False}],
+        defaults={"problems": 24, "digit_guides": True},
+    )
+    args = worksheet.parse_args(["--manifest", str(path), "--max-digits", "3"])
+    first, second = worksheet._manifest_jobs(args, path)
+    assert (first.problems, first.seed, first.digit_guides, first.max_digits) == (24, 3, True, 3)
+    assert (second.problems, second.digit_guides) == (12, False)
+    assert Path(first.output) == tmp_path / "a.pdf"
+
+
+@pytest.mark.parametrize("key", sorted(worksheet._MANIFEST_FORBIDDEN))
+def test_manifest_rejects_forbidden_option(tmp_path: Path, key: str, capsys: pytest.CaptureFixture) -> None:
+    option = key.replace("_", "-")
+    path = _write_manifest(tmp_path, [{"output": "a.pdf"}, {"output": "b.pdf", option: True}])
+    args = worksheet.parse_args(["--manifest", str(path)])
+    with pytest.raises(ValueError, match=f"arkusz 2: opcja '{option}' nie jest tu dozwolona") as info:
+        worksheet._manifest_jobs(args, path)
+    assert isinstance(info.value.__cause__, ValueError)
+
+    # Manifest jest sprawdzany w całości, zanim powstanie pierwszy arkusz
+    assert worksheet.run_manifest(args) == 2
+    assert "nie jest tu dozwolona" in capsys.readouterr().err
+    assert not (tmp_path / "a.pdf").exists()
@@ -0,0 +1,51 @@
+"""OutputCache: trafienie daje te same bajty co nowe budowanie, a limit usuwa najdawniej używane wpisy."""
+
+from __future__ import annotations
+
+import itertools
+from pathlib import Path
+
+import pytest
+
+import main as worksheet
+
+SHEET_ARGS = ["-n", "30", "--mode", "mixed", "--seed", "5", "--reproducible"]
+
+
+def _build(tmp_path: Path, name: str, *extra: str) -> tuple[bytes, bytes]:
+    out, answers = tmp_path / f"{name}.pdf", tmp_path / f"{name}_odp.pdf"
+    argv = [*SHEET_ARGS, "--answers-output", str(answers), "-o", str(out), *extra]
+    assert worksheet.main(argv) == 0
+    return out.read_bytes(), answers.read_bytes()
+
+
+def test_cache_hit_is_byte_identical_to_fresh_build(tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    fresh = _build(tmp_path, "fresh", "--no-cache")
+    first = _build(tmp_path, "first", "--cache-dir", str(cache_dir))
+    second = _build(tmp_path, "second", "--cache-dir", str(cache_dir))
+    assert first == second == fresh
+
+    stats = worksheet.OutputCache(cache_dir).stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_eviction_removes_least_recently_used(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Kolejne wywołania time.time() rosną o 1 – kolejność użycia jest jednoznaczna
+    clock = itertools.count(1_000_000)
+    monkeypatch.setattr(worksheet.time, "time", lambda: float(next(clock)))
+    cache = worksheet.OutputCache(tmp_path, max_bytes=250)
+    cache.put("a" * 64, b"A" * 100)
+    cache.put("b" * 64, b"B" * 100)
+    assert cache.get("a" * 64) == b"A" * 100  # a jest teraz używany później niż b
+    cache.put("c" * 64, b"C" * 100)
+
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) == b"A" * 100
+    assert cache.get("c" * 64) == b"C" * 100
+    assert not any(tmp_path.glob("bb/*.pdf"))
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 200, 1)
+    # Wpis większy niż cały limit nie jest zapisywany i niczego nie usuwa
+    assert not cache.put("d" * 64, b"D" * 300)
+    assert cache.stats()["entries"] == 2
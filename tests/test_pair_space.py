@@ -0,0 +1,102 @@
+"""PairSpace (programowanie dynamiczne po cyfrach) porównany z pełnym przeglądem par."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+import main as worksheet
+
+
+def _carry_columns(op: str, a: int, b: int) -> frozenset[int]:
+    """Kolumny (1 = jedności) z przeniesieniem (dodawanie) albo pożyczką (odejmowanie)."""
+    columns = set()
+    carry = 0
+    column = 1
+    while a or b:
+        if op == "+":
+            carry = 1 if a % 10 + b % 10 + carry >= 10 else 0
+        else:
+            carry = 1 if a % 10 - carry < b % 10 else 0
+        if carry:
+            columns.add(column)
+        a, b, column = a // 10, b // 10, column + 1
+    return frozenset(columns)
+
+
+def _brute_force(
+    op: str,
+    min_value: int,
+    max_digits: int,
+    min_carries: int = 1,
+    max_carries: int | None = None,
+    carry_columns: frozenset[int] = frozenset(),
+    unordered: bool = False,
+) -> set[tuple[int, int]]:
+    values = range(min_value, 10**max_digits)
+    pairs = set()
+    for a in values:
+        for b in values:
+            if (op == "-" and a < b) or (unordered and a > b):
+                continue
+            columns = _carry_columns(op, a, b)
+            carries = len(columns)
+            if carries < min_carries or (max_carries is not None and carries > max_carries):
+                continue
+            if carry_columns <= columns:
+                pairs.add((a, b))
+    return pairs
+
+
+CASES = [
+    # op, min_value, max_digits, min_carries, max_carries, carry_columns, unordered
+    ("+", 12, 2, 1, None, frozenset(), False),
+    ("-", 12, 2, 1, None, frozenset(), False),
+    ("+", 0, 2, 0, 0, frozenset(), False),
+    ("-", 0, 2, 0, 0, frozenset(), False),
+    ("+", 10, 2, 2, None, frozenset(), False),
+    ("-", 37, 2, 1, 1, frozenset({2}), False),
+    ("+", 45, 2, 1, None, frozenset({1}), True),
+    ("+", 5, 2, 0, None, frozenset(), True),
+    ("-", 99, 2, 1, None, frozenset(), False),
+    ("+", 100, 2, 1, None, frozenset(), False),
+    ("+", 700, 3, 2, 2, frozenset(), False),
+    ("-", 650, 3, 1, None, frozenset({1, 3}), False),
+    ("+", 820, 3, 1, None, frozenset({2}), True),
+]
+
+
+@pytest.mark.parametrize("case", CASES, ids=str)
+def test_count_and_unrank_match_brute_force(case: tuple) -> None:
+    space = worksheet.PairSpace(*case)
+    expected = _brute_force(*case)
+    assert space.count == len(expected)
+    ranked = [space.unrank(i) for i in range(space.count)]
+    assert len(set(ranked)) == space.count
+    assert set(ranked) == expected
+
+
+@pytest.mark.parametrize("case", [c for c in CASES if c[2] == 2], ids=str)
+def test_sample_and_iter_unique_stay_in_space(case: tuple) -> None:
+    space = worksheet.PairSpace(*case)
+    expected = _brute_force(*case)
+    rng = random.Random(7)
+    if not expected:
+        with pytest.raises(ValueError):
+            list(space.iter_unique(1, rng))
+        return
+    assert all(space.sample(rng) in expected for _ in range(200))
+
+    drawn = list(space.iter_unique(space.count, rng))
+    # Przestrzeń unordered zwraca pary w losowej kolejności składników
+    normalized = [tuple(sorted(p)) if space.unordered else p for p in drawn]
+    assert sorted(normalized) == sorted(expected)
+    with pytest.raises(ValueError):
+        space.iter_unique(space.count + 1, rng)
+
+
+def test_unrank_rejects_index_outside_space() -> None:
+    space = worksheet.PairSpace("+", 12, 2)
+    with pytest.raises(IndexError):
+        space.unrank(space.count)
@@ -0,0 +1,45 @@
+"""Zgodność układu backendu native z Matplotlib (bench.py --parity) jako test."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+
+pytest.importorskip("pymupdf")
+
+import bench
+import main as worksheet
+
+PARITY_OPTIONS = (
+    [],
+    ["--mode", "mixed", "--answer-lines", "2", "--digit-guides"],
+    ["--cols", "3", "--rows", "6", "--compact-layout", "--bbox", "fixed", "--max-digits", "4"],
+    ["--paper", "Letter", "--hide-numbers", "--operation-bar-style", "vector", "--no-subtitle"],
+)
+
+
+@pytest.mark.parametrize("options", PARITY_OPTIONS, ids=lambda o: " ".join(o) or "domyślne")
+def test_native_layout_matches_matplotlib(options: list[str]) -> None:
+    assert bench.check_parity(worksheet.parse_args(options), pages=2) <= 0.5
+
+
+@pytest.mark.parametrize("mono, bold", [(False, False), (False, True), (True, False), (True, True)])
+def test_text_width_matches_pdf_fonts(mono: bool, bold: bool) -> None:
+    # Wszystkie znaki kodowania poza sterującymi i niewidocznymi, które PyMuPDF pomija lub zamienia
+    text = "".join(ch for ch in worksheet._PDF_ENCODING if ch.isprintable() and ch not in "\xa0\xad")
+    spec = worksheet._PageSpec(
+        figsize=(8.27, 11.69),
+        texts=(worksheet._Text(0.02, 0.5, text, 4, "left", "baseline", mono=mono, bold=bold),),
+        lines=(),
+    )
+    buffer = io.BytesIO()
+    writer = worksheet._NativePdfWriter(buffer, bbox="fixed")
+    writer.add_page(spec)
+    writer.close()
+
+    [(drawn, x0, x1)] = bench._text_spans(buffer.getvalue())[0]
+    x, _, width = worksheet._place_text(spec.texts[0], worksheet._page_transform(spec))
+    assert drawn == text
+    assert x0 == pytest.approx(x, abs=0.01)
+    assert x1 == pytest.approx(x + width, abs=0.01)
@@ -0,0 +1,35 @@
+"""ProblemSet w pamięci współdzielonej: zestaw i jego wycinki przechodzą do innych procesów bez zmian."""
+
+from __future__ import annotations
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import main as worksheet
+
+
+def _read(ps: worksheet.ProblemSet) -> tuple[list[worksheet.Problem], list[int]]:
+    # Uruchamiane w procesie roboczym: zestaw przychodzi jako nazwa bloku pamięci
+    return list(ps), ps.answers().tolist()
+
+
+def _problems() -> list[worksheet.Problem]:
+    return worksheet.generate_problems(40, max_digits=5, mode="mixed", seed=8)
+
+
+def test_shared_problem_set_round_trip() -> None:
+    problems = _problems()
+    shared = worksheet.ProblemSet.from_problems(problems).share()
+    try:
+        payload = pickle.dumps(shared)
+        # Zamiast tablic pickle przenosi tylko nazwę bloku i zakres widoku
+        assert len(payload) < 200
+        assert list(pickle.loads(payload)) == problems
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            whole, part = pool.map(_read, [shared, shared[10:25]])
+        assert whole == (problems, [p.answer() for p in problems])
+        assert part == (problems[10:25], [p.answer() for p in problems[10:25]])
+    finally:
+        shared.release()
+    # Po release zestaw ma własne kopie tablic
+    assert list(shared) == problems
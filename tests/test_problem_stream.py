@@ -0,0 +1,37 @@
+"""ProblemStream: dowolna strona liczona osobno zgadza się z pełnym przebiegiem."""
+
+from __future__ import annotations
+
+import pytest
+
+import main as worksheet
+
+CASES = [
+    dict(n=50, max_digits=3, seed=4),
+    dict(n=50, max_digits=3, seed=4, mode="mixed", mixed_ratio=0.3),
+    dict(n=50, max_digits=2, seed=9, mode="mixed", unique=True),
+    dict(n=40, max_digits=12, seed=1, mode="subtraction", carries=(2, 3), carry_columns=(1,)),
+]
+
+
+@pytest.mark.parametrize("params", CASES, ids=str)
+@pytest.mark.parametrize("per_page", [1, 7, 12])
+def test_page_slices_match_full_run(params: dict, per_page: int) -> None:
+    full = list(worksheet.ProblemStream(**params))
+    assert len(full) == params["n"]
+    # Każda strona z osobnego obiektu – tak jak w procesach roboczych przy --jobs
+    pages = [
+        worksheet.ProblemStream(**params)[start : start + per_page]
+        for start in range(0, params["n"], per_page)
+    ]
+    assert [p for page in pages for p in page] == full
+    stream = worksheet.ProblemStream(**params)
+    assert [stream[i] for i in reversed(range(params["n"]))] == full[::-1]
+    assert stream[-1] == full[-1]
+
+
+def test_counter_engine_matches_stream() -> None:
+    params = dict(max_digits=3, seed=4, mode="mixed")
+    assert worksheet.generate_problems(30, engine="counter", **params) == list(
+        worksheet.ProblemStream(30, **params)
+    )
@@ -0,0 +1,16 @@
+"""--reproducible: dwa budowania z tymi samymi opcjami dają identyczne bajty (bench.py --reproducible)."""
+
+from __future__ import annotations
+
+import pytest
+
+import bench
+
+# Kilka stron i osobny klucz odpowiedzi – przy --jobs 2 dokument powstaje z kilku fragmentów
+WORKSHEET_ARGS = ("-n", "60", "--answer-lines", "2", "--answers-per-page", "40")
+
+
+@pytest.mark.parametrize("variant", bench.REPRO_VARIANTS, ids=" ".join)
+def test_reproducible_build_is_byte_identical(variant: tuple[str, ...]) -> None:
+    first, second = bench.reproducible_digests(WORKSHEET_ARGS, variant)
+    assert first == second
@@ -0,0 +1,38 @@
+"""Podtytuł strony zgodny z poziomem trudności (--carries / --carry-columns)."""
+
+from __future__ import annotations
+
+import pytest
+
+import main as worksheet
+
+
+@pytest.mark.parametrize(
+    "carries, columns, rule",
+    [
+        (None, (), "każde zadanie ma przeniesienie"),
+        ((0, 0), (), "zadania bez przeniesienia"),
+        ((0, None), (), "zadania z przeniesieniem i bez przeniesienia"),
+        ((2, 2), (), "każde zadanie ma dokładnie 2 przeniesienia"),
+        ((5, 5), (), "każde zadanie ma dokładnie 5 przeniesień"),
+        ((0, 1), (), "każde zadanie ma najwyżej 1 przeniesienie"),
+        ((1, 3), (), "każde zadanie ma od 1 do 3 przeniesień"),
+        ((3, None), (), "każde zadanie ma co najmniej 3 przeniesienia"),
+        (None, (2,), "każde zadanie ma przeniesienie, zawsze w kolumnie dziesiątek"),
+        (None, (1, 3), "każde zadanie ma co najmniej 2 przeniesienia, zawsze w kolumnach jedności i setek"),
+    ],
+)
+def test_subtitle_describes_carries(carries: tuple | None, columns: tuple, rule: str) -> None:
+    assert worksheet._subtitle(3, carries, columns) == f"Dodawanie sposobem pisemnym (do 3 cyfr) — {rule}."
+
+
+def test_page_without_carries_says_so() -> None:
+    args = worksheet.parse_args(["-n", "6", "--carries", "0"])
+    problems = worksheet.generate_problems(6, max_digits=args.max_digits, carries=args.carries, seed=1)
+    assert all(p.carries == 0 for p in problems)
+    options = worksheet._pdf_options(args, None)
+    for key in ("backend", "page_template", "jobs", "reproducible"):
+        del options[key]  # opcje zapisu build_pdf, których iter_pages nie przyjmuje
+    fig = next(worksheet.iter_pages(problems, title="Karta", **options))
+    texts = [t.get_text() for t in fig.axes[0].texts]
+    assert "Dodawanie sposobem pisemnym (do 2 cyfr) — zadania bez przeniesienia." in texts
@@ -0,0 +1,46 @@
+"""--variants-distinct: warianty bez wspólnych zadań, z zachowaniem liczby dodawań i odejmowań."""
+
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+
+import main as worksheet
+
+
+def _variants(*argv: str) -> tuple[list[list[worksheet.Problem]], list[list[worksheet.Problem]]]:
+    """Warianty z --variants-distinct i bez (te same seedy)."""
+    args = worksheet.parse_args([*argv, "--seed", "11", "--variants-distinct"])
+    seeds = worksheet.variant_seeds(args.seed, args.variants)
+    distinct = [list(problems) for problems in worksheet._variant_problems(args, seeds)]
+    args.variants_distinct = False
+    plain = [list(problems) for problems in worksheet._variant_problems(args, seeds)]
+    return distinct, plain
+
+
+@pytest.mark.parametrize(
+    ("argv", "additions"),
+    [
+        (("-n", "18", "--mode", "mixed", "--mixed-ratio", "0.5", "--min-value", "40", "--variants", "6"), 9),
+        (("-n", "20", "--mode", "mixed", "--mixed-ratio", "0.3", "--min-value", "30", "--variants", "5"), 6),
+        (("-n", "24", "--mode", "mixed", "--max-digits", "3", "--engine", "counter", "--variants", "4"), 12),
+    ],
+    ids=str,
+)
+def test_distinct_variants_keep_operation_counts(argv: tuple[str, ...], additions: int) -> None:
+    distinct, plain = _variants(*argv)
+    seen: set[tuple[int, str, int]] = set()
+    for variant, base in zip(distinct, plain):
+        assert Counter(p.op for p in variant) == {"+": additions, "-": len(variant) - additions}
+        # Zastępstwa trafiają na miejsca powtórzeń: działania na kolejnych pozycjach się nie zmieniają
+        assert [p.op for p in variant] == [p.op for p in base]
+        keys = {(p.a, p.op, p.b) for p in variant}
+        assert not keys & seen
+        seen |= keys
+
+
+def test_distinct_unique_variants_treat_swapped_addition_as_repeat() -> None:
+    distinct, _ = _variants("-n", "30", "--min-value", "60", "--unique", "--variants", "4")
+    keys = [tuple(sorted((p.a, p.b))) for variant in distinct for p in variant]
+    assert len(keys) == len(set(keys)) == 120